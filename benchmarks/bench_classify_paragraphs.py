@@ -0,0 +1,112 @@
+"""
+Benchmark of the paragraph classification of ParsedDocument, against the previous per-paragraph functions.
+
+The markdown sample (a converted UN resolution, or any document of the markdown cache given with
+--markdown) is repeated up to the requested number of paragraphs. classify_paragraphs and the
+previous is_separator_or_note, is_complete_sentence and numbered paragraph pattern, kept below as
+reference, label the same paragraphs, and their SEPARATOR, COMPLETE and NUMBERED labels must match.
+
+Usage:
+    python benchmarks/bench_classify_paragraphs.py [--markdown FILE] [--paragraphs 32000] [--repeat 5]
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from termseeker.parseddoc import SEPARATOR, COMPLETE, NUMBERED
+from termseeker.utils import classify_paragraphs
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "data", "unep_ea_resolution.md")
+
+_NUMBER_PATTERN = re.compile(r'\s*(\d+)\.\s')
+
+
+def previous_is_separator_or_note(paragraph):
+    """is_separator_or_note before the patterns were compiled in a single alternation."""
+    # Check if paragraph is empty
+    if len(paragraph.strip()) == 0:
+        return True
+
+    # Check for different types of notes or separators
+    is_page_number = re.match(r'\s*\*\*\d+\*\*\s*', paragraph)
+    is_footnote = re.match(r'\s*K\d{7}\s\d{6}\s*', paragraph)
+    is_othernote = re.match(r'^(?:\*\*.*\/.*\*\*|\*\*.*\/.*\d$|\d.*\/.*\*\*)$', paragraph)
+    is_separator = re.match(r'\s*-+\s*', paragraph)
+
+    return bool(is_page_number or is_footnote or is_othernote or is_separator)
+
+
+def previous_is_complete_sentence(text):
+    """is_complete_sentence before the endings were checked with a single endswith call."""
+    text = text.strip()
+    if not text:
+        return False
+
+    # Common sentence-ending punctuation in multiple languages
+    ending_punctuation = ['.', '!', '?', '.)', '.', '».', '.")', ':]', '؟', '।', '。', '．']
+
+    # Check for these ending characters
+    for punct in ending_punctuation:
+        if text.endswith(punct):
+            return True
+
+    return False
+
+
+def previous_classify_paragraphs(paragraphs):
+    """Labels of ParsedDocument.from_text before classify_paragraphs."""
+    n = len(paragraphs)
+    flags = np.zeros(n, dtype=np.uint8)
+    numbers = np.full(n, -1, dtype=np.int32)
+    for i, paragraph in enumerate(paragraphs):
+        stripped = paragraph.strip()
+        if previous_is_separator_or_note(stripped):
+            flags[i] |= SEPARATOR
+        if previous_is_complete_sentence(stripped):
+            flags[i] |= COMPLETE
+        number = _NUMBER_PATTERN.match(stripped)
+        if number:
+            flags[i] |= NUMBERED
+            numbers[i] = min(int(number.group(1)), np.iinfo(np.int32).max)
+    return flags, numbers
+
+
+def best_time(function, paragraphs, repeat) -> float:
+    """Best wall time of a number of runs, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(paragraphs)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--markdown", default=SAMPLE_PATH, help="Markdown document to classify")
+    parser.add_argument("--paragraphs", type=int, default=32000, help="Number of paragraphs, the document is repeated up to it")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each implementation, the best is reported")
+    args = parser.parse_args()
+
+    with open(args.markdown, encoding="utf-8") as f:
+        sample = f.read().split('\n\n')
+    paragraphs = (sample * (args.paragraphs // len(sample) + 1))[:args.paragraphs]
+
+    previous_flags, previous_numbers = previous_classify_paragraphs(paragraphs)
+    flags, numbers = classify_paragraphs(paragraphs)
+    if not (np.array_equal(previous_flags, flags & (SEPARATOR | COMPLETE | NUMBERED))
+            and np.array_equal(previous_numbers, numbers)):
+        raise SystemExit("Labels differ")
+
+    previous = best_time(previous_classify_paragraphs, paragraphs, args.repeat)
+    current = best_time(classify_paragraphs, paragraphs, args.repeat)
+    print(f"{len(paragraphs)} paragraphs of {os.path.basename(args.markdown)}: "
+          f"previous {previous:.1f} ms, classify_paragraphs {current:.1f} ms ({previous / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Benchmark of consolidate_results on synthetic results, against the previous implementation.
+
+The previous implementation (dictionaries updated result by result) is kept below as reference.
+Both are run on the same synthetic results, in several term group sizes, with missing keys, None
+and empty values. Their outputs must be equal, except that the previous one omits the keys a term
+has no value for (None in the current one) and gives the synonyms in set order.
+
+Usage:
+    python benchmarks/bench_consolidate_results.py [--rows 100000] [--repeat 3] [--seed 0]
+"""
+
+import argparse
+import copy
+import random
+import time
+
+from termseeker.utils import consolidate_results
+
+LANGUAGES = ["French", "Spanish", "Russian", "Chinese", "Arabic"]
+
+
+def previous_consolidate_results(metadataCleaned) -> list:
+    """consolidate_results before the Polars implementation, without the Excel export."""
+    if not metadataCleaned:
+        return []
+
+    # Group by EnglishTerm
+    consolidated = {}
+    for item in metadataCleaned:
+        english_term = item.get('EnglishTerm', '')
+        if not english_term:
+            continue
+
+        if english_term not in consolidated:
+            consolidated[english_term] = {}
+
+        # Get source information for this specific item
+        doc_symbol = item.get('docSymbol', 'Unknown')
+        pub_date = item.get('publicationDate', 'Unknown')
+
+        for key, value in item.items():
+            # Skip docURLs
+            if key == 'docURLs':
+                continue
+
+            # Process Term keys
+            if key.endswith('Term') and key != 'EnglishTerm':  # Skip EnglishTerm as that's our grouping key
+                lang = key.replace('Term', '')  # Extract language prefix (e.g., "Spanish" from "SpanishTerm")
+                synonyms_key = f"{lang}Synonyms"  # Create corresponding synonyms key
+
+                if key not in consolidated[english_term]:
+                    # First occurrence - set as the primary term
+                    consolidated[english_term][key] = value
+                else:
+                    # This is a subsequent term value - add it to synonyms
+                    if value:  # Just check if value exists, don't compare with primary term
+                        # Initialize synonyms list if needed
+                        if synonyms_key not in consolidated[english_term]:
+                            consolidated[english_term][synonyms_key] = []
+
+                        # Add to synonyms list (as a singleton list or directly)
+                        if isinstance(value, list):
+                            if synonyms_key in consolidated[english_term]:
+                                consolidated[english_term][synonyms_key].extend(value)
+                            else:
+                                consolidated[english_term][synonyms_key] = value
+                        else:
+                            if synonyms_key in consolidated[english_term]:
+                                consolidated[english_term][synonyms_key].append(value)
+                            else:
+                                consolidated[english_term][synonyms_key] = [value]
+
+                        # Remove duplicates
+                        consolidated[english_term][synonyms_key] = list(set(consolidated[english_term][synonyms_key]))
+
+
+            # Process Synonyms keys
+            elif key.endswith('Synonyms'):
+                if value is None:
+                    continue
+                if key not in consolidated[english_term]:
+                    consolidated[english_term][key] = value if isinstance(value, list) else [value]
+                else:
+                    if isinstance(value, list):
+                        consolidated[english_term][key].extend(value)
+                    else:
+                        consolidated[english_term][key].append(value)
+                    # Remove duplicates
+                    consolidated[english_term][key] = list(set(consolidated[english_term][key]))
+
+            # Process Paragraphs keys
+            elif key.endswith('Paragraphs'):
+                if value is None:
+                    continue
+
+                # Format paragraphs with source information
+                formatted_paragraphs = []
+                if isinstance(value, list):
+                    for paragraph in value:
+                        if isinstance(paragraph, str):
+                            formatted_paragraphs.append(f"{paragraph} (Source: {doc_symbol} on {pub_date})")
+                        elif isinstance(paragraph, tuple) and len(paragraph) >= 1:
+                            formatted_paragraphs.append(f"{paragraph[0]} (Source: {doc_symbol} on {pub_date})")
+
+                # Join paragraphs with double newlines
+                formatted_text = "\n\n".join(formatted_paragraphs) if formatted_paragraphs else ""
+
+                if key not in consolidated[english_term]:
+                    consolidated[english_term][key] = formatted_text
+                elif formatted_text:  # Only add if there's actual text
+                    consolidated[english_term][key] += "\n\n" + formatted_text
+
+            # Other metadata keys
+            elif key in ['docSymbol', 'publicationDate', 'docType', 'docTitle']:
+                if key not in consolidated[english_term]:
+                    consolidated[english_term][key] = value
+                elif value and value != consolidated[english_term][key]:
+                    if isinstance(consolidated[english_term][key], str):
+                        consolidated[english_term][key] += "\n" + str(value)
+                    else:
+                        consolidated[english_term][key] = str(consolidated[english_term][key]) + "\n" + str(value)
+
+    # Convert to list and sort keys in the desired order
+    result = []
+    for term, data in consolidated.items():
+        # Create a new dictionary with ordered keys
+        ordered_data = {}
+
+        # 1. EnglishTerm
+        ordered_data['EnglishTerm'] = term
+
+        # 2. Other Term keys
+        term_keys = sorted([k for k in data.keys() if k.endswith('Term') and k != 'EnglishTerm'])
+        for key in term_keys:
+            ordered_data[key] = data[key]
+
+        # 3. Synonyms keys
+        synonym_keys = sorted([k for k in data.keys() if k.endswith('Synonyms')])
+        for key in synonym_keys:
+            ordered_data[key] = data[key]
+
+        # 4. EnglishParagraphs
+        if 'EnglishParagraphs' in data:
+            ordered_data['EnglishParagraphs'] = data['EnglishParagraphs']
+
+        # 5. Other Paragraph keys
+        para_keys = sorted([k for k in data.keys() if k.endswith('Paragraphs') and k != 'EnglishParagraphs'])
+        for key in para_keys:
+            ordered_data[key] = data[key]
+
+        # 6. Metadata keys
+        meta_keys = ['docSymbol', 'publicationDate', 'docType', 'docTitle']
+        for key in meta_keys:
+            if key in data:
+                ordered_data[key] = data[key]
+
+        result.append(ordered_data)
+
+    return result
+
+
+def _maybe(rng, value, empty):
+    """The value, sometimes replaced by None or an empty value."""
+    draw = rng.random()
+    if draw < 0.03:
+        return None
+    if draw < 0.06:
+        return empty
+    return value
+
+
+def synthetic_results(terms, rows_per_term, seed=0) -> list:
+    """Results of getCandidates for a number of terms, with missing keys, None and empty values."""
+    rng = random.Random(seed)
+    results = []
+    for row in range(terms * rows_per_term):
+        term = f"term {row % terms}"
+        symbol = f"A/RES/{rng.randint(1, 80)}/{rng.randint(1, 300)}"
+        item = {"EnglishTerm": term,
+                "docSymbol": _maybe(rng, symbol, ""),
+                "publicationDate": _maybe(rng, f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}", ""),
+                "docType": _maybe(rng, rng.choice(["Resolution", "Report", "Decision"]), ""),
+                "docTitle": _maybe(rng, f"Title of {symbol}", ""),
+                "docURLs": {"English": f"https://documents.un.org/{symbol}"},
+                "EnglishParagraphs": _maybe(rng, [f"Paragraph {rng.randint(0, 10 ** 6)} about {term}."
+                                                  for _ in range(rng.randint(0, 2))], [])}
+        for language in LANGUAGES:
+            if rng.random() < 0.9:
+                item[f"{language}Term"] = _maybe(rng, f"{language} {term} {rng.randint(0, 3)}", "")
+                # Unique synonyms in each result, as parse_term_equivalents gives them
+                item[f"{language}Synonyms"] = _maybe(rng, [f"{language} synonym {i}" for i in rng.sample(range(6), rng.randint(0, 2))], [])
+                item[f"{language}Paragraphs"] = _maybe(rng, [(f"{language} paragraph {rng.randint(0, 10 ** 6)}.", rng.random())], [])
+        # Keys missing from some results
+        for key in rng.sample(sorted(item), rng.choice([0, 0, 0, 1, 2])):
+            if key != "EnglishTerm":
+                del item[key]
+        results.append(item)
+    return results
+
+
+def compare(previous, current) -> str:
+    """Description of the first difference between the outputs of both implementations, or None if they are equal."""
+    if len(previous) != len(current):
+        return f"{len(previous)} terms != {len(current)} terms"
+    for previous_item, current_item in zip(previous, current):
+        if set(previous_item) - set(current_item):
+            return f"{current_item['EnglishTerm']}: missing keys {set(previous_item) - set(current_item)}"
+        for key, value in current_item.items():
+            expected = previous_item.get(key)
+            if key.endswith("Synonyms") and expected is not None and value is not None:
+                expected, value = sorted(expected), sorted(value)
+            if value != expected:
+                return f"{current_item['EnglishTerm']} {key}: {expected!r} != {value!r}"
+    return None
+
+
+def best_time(function, results, repeat) -> float:
+    """Best wall time of a number of runs on copies of the results, in seconds."""
+    times = []
+    for _ in range(repeat):
+        # The previous implementation extends the synonym lists of the results
+        copied = copy.deepcopy(results)
+        start = time.perf_counter()
+        function(copied)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of result rows")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each implementation, the best is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'terms x rows per term':>24} | {'previous':>9} | {'polars':>9} | speedup")
+    for rows_per_term in (20, 1000, 10000):
+        terms = max(1, args.rows // rows_per_term)
+        results = synthetic_results(terms, rows_per_term, args.seed)
+        previous = best_time(previous_consolidate_results, results, args.repeat)
+        current = best_time(consolidate_results, results, args.repeat)
+        difference = compare(previous_consolidate_results(copy.deepcopy(results)), consolidate_results(copy.deepcopy(results)))
+        if difference is not None:
+            raise SystemExit(f"Outputs differ for {terms} terms x {rows_per_term} rows: {difference}")
+        print(f"{f'{terms} x {rows_per_term}':>24} | {previous:8.2f}s | {current:8.2f}s | {previous / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
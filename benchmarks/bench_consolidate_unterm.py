@@ -0,0 +1,192 @@
+"""
+Benchmark of consolidate_UNTermResults on the recorded UNTERM fixtures, against the previous implementation.
+
+The previous implementation (one pass over the rows per priority) is kept below as reference. The rows of
+each fixture of tests/fixtures/unterm are repeated up to the requested number of rows, with numbered
+target terms so that the synonym lists grow, and both implementations must give the same result.
+
+Usage:
+    python benchmarks/bench_consolidate_unterm.py [--rows 500] [--repeat 20]
+"""
+
+import argparse
+import copy
+import json
+import os
+import time
+
+from termseeker.askTermBases import consolidate_UNTermResults
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "fixtures", "unterm")
+
+
+def previous_consolidate_UNTermResults(data, TEXT_TO_SEARCH):
+    """consolidate_UNTermResults before the rows were classified once."""
+    # Initialize result dictionary with empty values
+    result = {
+        "English": "",
+        "French": "",
+        "Spanish": "",
+        "Russian": "",
+        "Chinese": "",
+        "Arabic": "",
+        "UNTerm_Source": None
+    }
+
+    # Initialize synonyms dictionaries for each non-English language
+    for lang in ["French", "Spanish", "Russian", "Chinese", "Arabic"]:
+        result[f"{lang}Synonyms"] = {
+            "Synonyms": [],
+            "Similar": []
+        }
+
+    # Track which languages have been filled in main entries
+    filled_languages = set()
+
+    # Process priority_1 and priority_2 to fill main language keys
+    priority_functions_main = [
+        # Priority 1: Exact match & UNHQ source
+        lambda row: ("English" in row and
+                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and
+                    row["UNTerm_Source"]["source"] == "UNHQ"),
+
+        # Priority 2: Exact match & specific sources
+        lambda row: ("English" in row and
+                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and
+                    row["UNTerm_Source"]["source"] in ["UNON", "UNEP", "UNOG"])
+    ]
+
+    # Fill main language fields using only priority 1 and 2
+    for priority_func in priority_functions_main:
+        if len(filled_languages) == len(result) - 1:  # All language fields filled (-1 for UNTerm_Source)
+            break
+
+        for row in data:
+            if priority_func(row):
+                # This row matches priority 1 or 2 - fill main language fields
+                for lang in ["English", "French", "Spanish", "Russian", "Chinese", "Arabic"]:
+                    if lang in filled_languages:
+                        continue
+
+                    if lang in row:
+                        # First try preferred terms
+                        if row[lang].get("preferred"):
+                            result[lang] = row[lang]["preferred"][0]
+                            filled_languages.add(lang)
+                        # Then try admitted terms
+                        elif row[lang].get("admitted"):
+                            result[lang] = row[lang]["admitted"][0]
+                            filled_languages.add(lang)
+
+                # Record source info if we haven't already and at least one language was filled
+                if not result["UNTerm_Source"] and filled_languages:
+                    result["UNTerm_Source"] = row["UNTerm_Source"]
+
+    # Define all priority check functions (for collecting synonyms)
+    priority_functions_all = [
+        # Priority 1 (same as above)
+        lambda row: ("English" in row and
+                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and
+                    row["UNTerm_Source"]["source"] == "UNHQ"),
+
+        # Priority 2 (same as above)
+        lambda row: ("English" in row and
+                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and
+                    row["UNTerm_Source"]["source"] in ["UNON", "UNEP", "UNOG"]),
+
+        # Priority 3: Contains search term & UNHQ source
+        lambda row: ("English" in row and
+                    any(TEXT_TO_SEARCH.lower() in term.lower() for term in row["English"].get("preferred", []) if term) and
+                    row["UNTerm_Source"]["source"] == "UNHQ"),
+
+        # Priority 4: Contains search term & (specific sources OR environment tags)
+        lambda row: ("English" in row and
+                    any(TEXT_TO_SEARCH.lower() in term.lower()
+                        for term_type in ["preferred", "admitted"]
+                        for term in row["English"].get(term_type, []) if term) and
+                    (row["UNTerm_Source"]["source"] in ["UNON", "UNEP", "UNOG"] or
+                     any(("Environment" in tag or "UNEP" in tag)
+                         for tag in row["UNTerm_Source"].get("tags", [])))),
+
+        # Priority 5: Any exact match
+        lambda row: ("English" in row and
+                    any(term.lower() == TEXT_TO_SEARCH.lower()
+                        for term_type in ["preferred", "admitted"]
+                        for term in row["English"].get(term_type, []) if term))
+    ]
+
+    # Collect synonyms from all rows based on priority levels
+    for priority_idx, priority_func in enumerate(priority_functions_all, 1):
+        for row in data:
+            if priority_func(row):
+                # For priority 1-2, collect admitted terms as synonyms
+                if priority_idx <= 2:
+                    for lang in ["French", "Spanish", "Russian", "Chinese", "Arabic"]:
+                        if lang in row:
+                            # Add admitted terms as synonyms (excluding the main term)
+                            for term in row[lang].get("admitted", []):
+                                if term and term != result[lang] and term not in result[f"{lang}Synonyms"]["Synonyms"]:
+                                    result[f"{lang}Synonyms"]["Synonyms"].append(term)
+
+                # For priority 3-5, collect all terms as similar
+                else:
+                    for lang in ["French", "Spanish", "Russian", "Chinese", "Arabic"]:
+                        if lang in row:
+                            # Collect both preferred and admitted as similar terms
+                            for term_type in ["preferred", "admitted"]:
+                                for term in row[lang].get(term_type, []):
+                                    if (term and term != result[lang] and
+                                        term not in result[f"{lang}Synonyms"]["Similar"] and
+                                        term not in result[f"{lang}Synonyms"]["Synonyms"]):
+                                        result[f"{lang}Synonyms"]["Similar"].append(term)
+
+    return result
+
+
+def scaled_rows(rows, count) -> list:
+    """The rows repeated up to count rows, the target terms of each repetition numbered."""
+    scaled = []
+    for index in range(count):
+        row = copy.deepcopy(rows[index % len(rows)])
+        repetition = index // len(rows)
+        if repetition:
+            for lang, terms in row.items():
+                if lang not in ("English", "UNTerm_Source"):
+                    for term_type in terms:
+                        terms[term_type] = [f"{term} {repetition}" if term else term for term in terms[term_type]]
+        scaled.append(row)
+    return scaled
+
+
+def time_per_call(function, rows, query, repeat) -> float:
+    """Best wall time of a call, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(rows, query)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="Number of UNTERM rows per call")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls of each implementation, the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'fixture':>24} | {'rows':>5} | {'previous':>10} | {'current':>10} | speedup")
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            fixture = json.load(f)
+        if not fixture["rows"]:
+            continue
+        rows = scaled_rows(fixture["rows"], args.rows)
+        if previous_consolidate_UNTermResults(rows, fixture["query"]) != consolidate_UNTermResults(rows, fixture["query"]):
+            raise SystemExit(f"Results differ for {name}")
+        previous = time_per_call(previous_consolidate_UNTermResults, rows, fixture["query"], args.repeat)
+        current = time_per_call(consolidate_UNTermResults, rows, fixture["query"], args.repeat)
+        print(f"{name[:-len('.json')]:>24} | {len(rows):>5} | {previous:8.2f}ms | {current:8.2f}ms | {previous / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,50 @@ This package provides functionality for:
 
 __version__ = '0.1.0'
 
-# Make sure these files exist at these paths
-from .getcandidates import getCandidates, getTermsAndCandidates
-from .convert import convert_pdf_to_markdown
-from .searchlibrary import access_un_library_by_term_and_symbol, adv_search_un_library, extract_metadata_UNLib
-from .utils import find_similar_paragraph_in_target, askLLM_term_equivalents, consolidate_results
-from .askTermBases import queryUNTerm, consolidate_UNTermResults, report_missing_translations
-from .queryHFdatasets import query_dataset_by_term_and_symbol, HUGGINGFACE_TOKEN
+import importlib
+import importlib.util
+
+# Public names of the package and the submodule defining each of them. The submodules are
+# imported on first access, so "import termseeker" does not load torch, Groq, Selenium or Polars.
+_LAZY_ATTRIBUTES = {
+    ".getcandidates": ["getCandidates", "getTermsAndCandidates"],
+    ".batch": ["getCandidatesBatch", "read_term_list"],
+    ".convert": ["convert_pdf_to_markdown"],
+    ".searchlibrary": ["access_un_library_by_term_and_symbol", "adv_search_un_library", "extract_metadata_UNLib",
+                       "search_un_library", "get_search_cache_stats"],
+    ".utils": ["find_similar_paragraph_in_target", "align_paragraphs_in_target", "askLLM_term_equivalents", "consolidate_results"],
+    ".askTermBases": ["queryUNTerm", "consolidate_UNTermResults", "report_missing_translations"],
+    ".parseddoc": ["ParsedDocument", "parse_document"],
+    ".extraction": ["ExtractionQueue"],
+    ".llmcache": ["LLMResponseCache", "get_llm_cache"],
+    ".webdriverpool": ["WebDriverPool", "get_driver_pool"],
+    ".transport": ["get_transport", "get_transport_stats"],
+    ".pagewaits": ["get_lookup_timings"],
+    ".termstore": ["TermStore", "get_term_store"],
+    ".resultsink": ["ResultSink"],
+    ".journal": ["RunJournal", "get_run_journal"],
+    ".modelregistry": ["ModelRegistry", "get_model_registry", "configure_models", "benchmark_model_variants"],
+    ".modelserver": ["ModelServer", "ModelClient", "get_model_client", "serve_models"],
+    ".paragraphindex": ["ParagraphIndex", "get_paragraph_index", "index_markdown_cache", "find_translations"],
+    ".queryHFdatasets": ["query_dataset_by_term_and_symbol", "HUGGINGFACE_TOKEN"],
+}
+_ATTRIBUTE_MODULES = {name: module for module, names in _LAZY_ATTRIBUTES.items() for name in names}
+
+
+def __getattr__(name):
+    """Import the submodule of a public name (or a submodule itself) on first access."""
+    if name in _ATTRIBUTE_MODULES:
+        value = getattr(importlib.import_module(_ATTRIBUTE_MODULES[name], __name__), name)
+    elif not name.startswith("__") and importlib.util.find_spec(f"{__name__}.{name}") is not None:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_ATTRIBUTE_MODULES))
 
 # Define what gets imported with "from termseeker import *"
 __all__ = [
@@ -25,12 +62,43 @@ __all__ = [
     'access_un_library_by_term_and_symbol',
     'adv_search_un_library', 
     'extract_metadata_UNLib',
+    'search_un_library',
+    'get_search_cache_stats',
     'find_similar_paragraph_in_target',
+    'align_paragraphs_in_target',
     'askLLM_term_equivalents',
     'consolidate_results',
     'queryUNTerm',
     'consolidate_UNTermResults',
     'report_missing_translations',
     'getTermsAndCandidates',
-    'query_dataset_by_term_and_symbol'
+    'getCandidatesBatch',
+    'query_dataset_by_term_and_symbol',
+    'ParsedDocument',
+    'parse_document',
+    'ExtractionQueue',
+    'LLMResponseCache',
+    'get_llm_cache',
+    'WebDriverPool',
+    'get_driver_pool',
+    'get_transport',
+    'get_transport_stats',
+    'get_lookup_timings',
+    'TermStore',
+    'get_term_store',
+    'ResultSink',
+    'RunJournal',
+    'get_run_journal',
+    'ModelServer',
+    'ModelClient',
+    'get_model_client',
+    'serve_models',
+    'ModelRegistry',
+    'get_model_registry',
+    'configure_models',
+    'benchmark_model_variants',
+    'ParagraphIndex',
+    'get_paragraph_index',
+    'index_markdown_cache',
+    'find_translations'
 ]
@@ -1,10 +1,13 @@
 import argparse
-import polars as pl
 from .convert import convert_pdf_to_markdown
 from .searchlibrary import access_un_library_by_term_and_symbol, adv_search_un_library, extract_metadata_UNLib
 from .utils import cleanSymbols, get_un_document_urls, find_paragraphs_with_merge, \
                         find_similar_paragraph_in_target, askLLM_term_equivalents, getEquivalents_from_response
 from .getcandidates import getCandidates
+from .batch import getCandidatesBatch, read_term_list
+from .resultsink import ResultSink
+from .modelserver import serve_models, get_model_client
+from .modelregistry import MODEL_BACKENDS, configure_models
 
 #########################################
 # Main function not tested, just a placeholder
@@ -19,19 +22,58 @@ def getterms():
     parser.add_argument('--sources', type=int, default=1, help='Number of sources to retrieve')
     parser.add_argument('--paragraphs', type=int, default=1, help='Paragraphs per document')
     parser.add_argument('--erase-drafts', action='store_true', help='Erase draft documents')
+    parser.add_argument('--terms-file', type=str, help='File with one search term per line (bulk mode)')
+    parser.add_argument('--output', type=str, help='JSON Lines file where the results are appended, a rerun resumes from it')
+    parser.add_argument('--excel', type=str, help='Excel workbook written from the consolidated results of --output at the end')
+    parser.add_argument('--groq-token', type=str, default=None, help='API key for the Groq inference server')
+    parser.add_argument('--serve-models', action='store_true', help='Run the model server keeping the embedding model and language detector loaded for the next runs')
+    parser.add_argument('--stop-models', action='store_true', help='Stop the running model server')
+    parser.add_argument('--model-backend', choices=MODEL_BACKENDS, default=None, help='Backend of the embedding model (quantized and ONNX variants run on CPU)')
+    parser.add_argument('--batch-size', type=int, default=None, help='Number of paragraphs embedded together')
+    parser.add_argument('--threads', type=int, default=None, help='Number of torch threads')
     
     args = parser.parse_args()
+    configure_models(backend=args.model_backend, batch_size=args.batch_size, threads=args.threads)
     
-    if args.search:
+    if args.serve_models:
+        serve_models()
+    elif args.stop_models:
+        client = get_model_client()
+        if client is None:
+            print("No model server is running")
+        else:
+            info = client.shutdown()
+            print(f"Stopped the model server (pid {info['pid']}, {info['stats']['texts']} texts processed)")
+    elif args.terms_file:
+        results = getCandidatesBatch(
+            read_term_list(args.terms_file),
+            args.languages,
+            args.symbols,
+            args.sources,
+            args.paragraphs,
+            args.erase_drafts,
+            groqToken=args.groq_token,
+            output_path=args.output
+        )
+        print(f"Processed {len(results)} terms, {sum(len(r) for r in results.values())} results")
+        if args.output and args.excel:
+            with ResultSink(args.output) as sink:
+                sink.export_excel(args.excel)
+    elif args.search:
         results = getCandidates(
             args.search, 
             args.languages, 
             args.symbols, 
             args.sources, 
             args.paragraphs, 
-            args.erase_drafts
+            args.erase_drafts,
+            groqToken=args.groq_token,
+            output_path=args.output
         )
         print(results)
+        if args.output and args.excel:
+            with ResultSink(args.output) as sink:
+                sink.export_excel(args.excel)
     else:
         parser.print_help()
 
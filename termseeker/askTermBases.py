@@ -1,161 +1,298 @@
-import os
 
 import time
+import urllib.parse
 from bs4 import BeautifulSoup
 
+from .transport import http_get
+from .webdriverpool import get_driver_pool
+from .pagewaits import POLL_INTERVAL, StageTimer, get_adaptive_timeout, wait_until, wait_for_stable_count
 
-def queryUNTerm(TEXT_TO_SEARCH):
+# Languages of the UNTERM results table, in column order
+UNTERM_LANGUAGES = ["English", "French", "Spanish", "Russian", "Chinese", "Arabic"]
 
-    from selenium import webdriver
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.common.keys import Keys
+# Language codes of the UNTERM search parameters
+UNTERM_LANGUAGE_CODES = {"English": "en", "French": "fr", "Spanish": "es", "Russian": "ru", "Chinese": "zh",
+                         "Arabic": "ar", "Portuguese": "pt"}
 
-    # Create a new directory for the user data
-    user_data_dir = "/tmp/chrome_user_data"
-    os.makedirs(user_data_dir, exist_ok=True)
+# UNTERM sources preferred after UNHQ by consolidate_UNTermResults
+UNTERM_UNEP_SOURCES = ("UNON", "UNEP", "UNOG")
 
-    # Set up Chrome options for Google Colab
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument(f'--user-data-dir={user_data_dir}')
-    options.add_argument('--profile-directory=Profile 3')
+# Message of the UNTERM search page for a search without results, shown instead of the results table
+UNTERM_NO_RESULTS_XPATH = ("//*[not(*) and (starts-with(translate(normalize-space(.), 'NORESULTS', 'noresults'), 'no results')"
+                           " or starts-with(translate(normalize-space(.), 'NORECDS', 'norecds'), 'no records'))]")
 
-    # Initialize the WebDriver
-    driver = webdriver.Chrome(options=options)
 
-    try:
-        # Step 1: Open the settings page and activate the Spanish checkbox
-        driver.get("https://unterm.un.org/unterm2/settings?displayIn=es&searchin=ar&searchin=en&searchin=es&searchin=fr&searchin=ru&searchin=zh")
-        wait = WebDriverWait(driver, 1)  # Increase wait time to 5 seconds
+def is_offline(store, offline=None) -> bool:
+    """Whether a lookup only reads the local terminology store: the offline argument if given, else the setting of the store."""
+    if offline is not None:
+        return offline
+    return store is not None and store.offline
 
-        # Print the raw HTML of the settings page
-        page_source = driver.page_source
-        #print(page_source)
 
-        # Check if the Spanish checkbox is present in the HTML
-        if "title=\"Spanish\" type=\"checkbox\" name=\"displayIn\"" not in page_source:
-            print("Spanish checkbox not found in the HTML.")
+def build_unterm_search_url(TEXT_TO_SEARCH, display_languages=tuple(UNTERM_LANGUAGE_CODES)) -> str:
+    """
+    Build the URL of an UNTERM search, displaying the results in the given languages.
 
-        # Retry mechanism to ensure the checkbox is clickable
-        retries = 0
-        for attempt in range(retries):
-            try:
-                spanish_checkbox = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@title='Spanish' and @name='displayIn']")))
-                spanish_checkbox.click()
-                print("Spanish checkbox clicked.")
-                break
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {e}")
-                time.sleep(2)  # Wait before retrying
+    Args:
+        TEXT_TO_SEARCH (str): The term to search for
+        display_languages (list): Languages of the results table
+
+    Returns:
+        str: The search URL
+    """
+    params = [("searchTerm", TEXT_TO_SEARCH), ("searchType", "0")]
+    params += [("searchLanguages", code) for code in ["ar", "en", "es", "fr", "ru", "zh"]]
+    params += [("languagesDisplay", UNTERM_LANGUAGE_CODES[lang]) for lang in display_languages]
+    params += [("acronymSearch", "true"), ("localDBSearch", "true"), ("termTitleSearch", "true"),
+               ("phraseologySearch", "false"), ("footnoteSearch", "false"), ("fullTextSearch", "false"),
+               ("facetedSearch", "false"), ("buildSubjectList", "true")]
+    return "https://unterm.un.org/unterm2/en/search?" + urllib.parse.urlencode(params)
+
+
+def parse_unterm_table(table_html) -> list:
+    """
+    Convert the HTML of an UNTERM results table to the rows used by consolidate_UNTermResults.
+
+    Each row maps each language to its terms grouped by term class, e.g.
+    {"English": {"preferred": ["climate change"], "admitted": []}, ..., "UNTerm_Source": {"source": "UNHQ", "tags": [...]}}
+
+    Args:
+        table_html (str): HTML of the results table
+
+    Returns:
+        list: One dictionary per record of the table
+    """
+    soup = BeautifulSoup(table_html, 'html.parser')
+    rows = soup.find_all('tr')
+    data = []
+    for row in rows:
+        cols = row.find_all('td')
+        if len(cols) > 0:
+            row_data = {}
+            for col, lang in zip(cols[1:], UNTERM_LANGUAGES):
+                terms = {"preferred": [], "admitted": []}
+                ul = col.find('ul', class_='search-result')
+                if ul:
+                    for li in ul.find_all('li'):
+                        span = li.find('span', class_=True, lang=True)
+                        if span:
+                            term = span.get_text(strip=False)
+                            term_class = span['class'][0]
+                            terms.setdefault(term_class, []).append(term)
+                row_data[lang] = terms
+
+            # Extract source information
+            source_div = cols[-1].find('div', class_='record-info')
+            if source_div:
+                source = source_div.find('h5').get_text(strip=False)
+                tags = [li.get_text(strip=False) for li in source_div.find_all('li')]
+                row_data["UNTerm_Source"] = {"source": source, "tags": tags}
             else:
-                print("Exception(\"Failed to click the Spanish checkbox after multiple attempts.\")")
+                row_data["UNTerm_Source"] = {"source": "", "tags": []}
 
-        time.sleep(1)  # Wait for the checkbox to be activated
+            data.append(row_data)
+    return data
 
-        # Click the "Update Default Settings" button
-        try:
+
+def queryUNTerm_http(TEXT_TO_SEARCH):
+    """
+    Query UNTERM over plain HTTP, without a browser.
+
+    Args:
+        TEXT_TO_SEARCH (str): The term to search for
+
+    Returns:
+        list: The rows of the results table (see parse_unterm_table), or None if the
+              page could not be fetched or does not contain a results table
+    """
+    try:
+        response = http_get(build_unterm_search_url(TEXT_TO_SEARCH), headers={"Accept": "text/html"})
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Failed to fetch the UNTERM search page: {e}")
+        return None
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+    table = soup.find('table')
+    if table is None:
+        print("No results table in the UNTERM search page.")
+        return None
+    return parse_unterm_table(str(table))
+
+
+def queryUNTerm(TEXT_TO_SEARCH, backend="auto", store=None, offline=None):
+    """
+    Query the UN Terminology Database (UNTERM) for a term.
+    With a local terminology store, the store is queried first and the fetched rows are stored in it.
+
+    Args:
+        TEXT_TO_SEARCH (str): The term to search for
+        backend (str): "http" to fetch the results page over plain HTTP, "selenium" to use a headless
+                       Chrome, or "auto" to use HTTP and fall back to Selenium if it fails. Defaults to "auto".
+        store (TermStore, optional): Local terminology store (e.g. get_term_store(cache_dir)). Defaults to None, no store.
+        offline (bool, optional): If True, only the store is queried. Defaults to the offline setting of the store.
+
+    Returns:
+        list: The rows of the results table (see parse_unterm_table), or None on error
+    """
+    offline = is_offline(store, offline)
+    if store is not None:
+        data = store.get_unterm(TEXT_TO_SEARCH, offline)
+        if data is not None:
+            return data
+    if offline:
+        print(f"'{TEXT_TO_SEARCH}' is not in the local terminology store (offline mode).")
+        return []
+
+    if backend in ("auto", "http"):
+        data = queryUNTerm_http(TEXT_TO_SEARCH)
+        if data is None and backend == "auto":
+            print("Falling back to Selenium...")
+            data = queryUNTerm_selenium(TEXT_TO_SEARCH)
+    else:
+        data = queryUNTerm_selenium(TEXT_TO_SEARCH)
+
+    if store is not None and data is not None:
+        store.put_unterm(TEXT_TO_SEARCH, data)
+    return data
+
+
+def apply_unterm_settings(driver):
+    """
+    Set the default display languages of UNTERM in a browser. The settings are kept in the
+    browser profile, so this runs once per browser of the WebDriver pool.
+
+    Args:
+        driver (WebDriver): The browser
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    timer = StageTimer("unterm")
+    timeout = get_adaptive_timeout("unterm/settings", default=5.0, minimum=1.0)
+    try:
+        # Open the settings page with Spanish as display language
+        with timer.stage("settings", timeout):
+            driver.get("https://unterm.un.org/unterm2/settings?displayIn=es&searchin=ar&searchin=en&searchin=es&searchin=fr&searchin=ru&searchin=zh")
+
+            # Click the "Update Default Settings" button as soon as it is clickable
+            wait = WebDriverWait(driver, timeout.value, poll_frequency=POLL_INTERVAL)
             update_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[@type='submit' and contains(text(), 'Update Default Settings')]")))
             update_button.click()
             print("Update Default Settings button clicked.")
-        except Exception as e:
-            print(f"Failed to click the Update Default Settings button: {e}")
 
+            # The settings are saved once the page is reloaded
+            try:
+                wait.until(EC.staleness_of(update_button))
+            except Exception:
+                pass
     except Exception as e:
-        print(f"An error occurred: {e}")
-    finally:
         # Continue even if it fails
-        pass
+        print(f"Failed to update the UNTERM settings: {e}")
+    print(timer.summary())
 
-    try:
-        # Step 1: Go to the search URL with the specified parameters
-        search_url = f"https://unterm.un.org/unterm2/en/search?searchTerm={TEXT_TO_SEARCH}&searchType=0&searchLanguages=ar&searchLanguages=en&searchLanguages=es&searchLanguages=fr&searchLanguages=ru&searchLanguages=zh&languagesDisplay=en&languagesDisplay=es&acronymSearch=true&localDBSearch=true&termTitleSearch=true&phraseologySearch=false&footnoteSearch=false&fullTextSearch=false&facetedSearch=false&buildSubjectList=true"
-        driver.get(search_url)
-        wait = WebDriverWait(driver, 10)  # Increase wait time to 10 seconds
 
-        # Step 2: Click on Advanced Settings
+def queryUNTerm_selenium(TEXT_TO_SEARCH, pool=None):
+    """
+    Query UNTERM with a headless Chrome, clicking the display language buttons of the search page.
+    Each stage waits for the elements it needs rather than a fixed time, and the stage durations
+    are printed (see pagewaits.get_lookup_timings for all the lookups).
+
+    Args:
+        TEXT_TO_SEARCH (str): The term to search for
+        pool (WebDriverPool, optional): Pool of the browser to use. Defaults to the shared pool.
+
+    Returns:
+        list: The rows of the results table (see parse_unterm_table), or None on error
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    pool = pool or get_driver_pool()
+    table_html = None
+    no_results = False
+    timer = StageTimer("unterm")
+    page_timeout = get_adaptive_timeout("unterm/search page")
+    buttons_timeout = get_adaptive_timeout("unterm/display buttons", default=5.0, minimum=1.0)
+    table_timeout = get_adaptive_timeout("unterm/table")
+
+    with pool.driver("unterm", apply_unterm_settings) as driver:
         try:
-            advanced_search_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.btn.text-dark.text-nowrap.btn-link.collapsed")))
-            advanced_search_button.click()
-        except Exception as e:
-            print(f"CSS Failed to search-click the Advanced search button: {e}")
-            #driver.save_screenshot("/content/screenshot_ERROR_filters.png")
+            # Step 1: Go to the search URL with the specified parameters
+            with timer.stage("search page", page_timeout):
+                driver.get(build_unterm_search_url(TEXT_TO_SEARCH, ["English", "Spanish"]))
+                wait = WebDriverWait(driver, page_timeout.value, poll_frequency=POLL_INTERVAL)
 
-        time.sleep(2)  # Wait for the advanced search options to be visible
+                # Step 2: Click on Advanced Settings
+                try:
+                    advanced_search_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button.btn.text-dark.text-nowrap.btn-link.collapsed")))
+                    advanced_search_button.click()
+                except Exception as e:
+                    print(f"CSS Failed to search-click the Advanced search button: {e}")
+
+            # Step 3: Activate the Display in: "Spanish" button and other languages,
+            # as soon as the display buttons are shown
+            languages = ["Spanish", "Russian", "Chinese", "Arabic", "Portuguese"]
+            try:
+                with timer.stage("display buttons", buttons_timeout):
+                    wait_until(lambda: driver.find_elements(By.XPATH, "//button[starts-with(@id, 'ds-')]"), buttons_timeout.value)
+            except TimeoutError as e:
+                print(f"Display in buttons not found: {e}")
+            with timer.stage("display clicks"):
+                for lang in languages:
+                    # Buttons already pressed (e.g. by the default settings) are left as they are
+                    for lang_button in driver.find_elements(By.XPATH, f"//button[@id='ds-{lang}' and @aria-pressed='false']"):
+                        try:
+                            lang_button.click()
+                            print(f"Display in {lang} button clicked.")
+                        except Exception as e:
+                            print(f"Failed to click the Display in {lang} button: {e}")
 
-        # Step 3: Activate the Display in: "Spanish" button and other languages
-        languages = ["Spanish", "Russian", "Chinese", "Arabic",
-                     "Portuguese"]
-        for lang in languages:
+            # Step 4: Wait for the table rows and language columns to be rendered, then scrape its HTML content.
+            # A search without results shows its marker instead of the table and is answered at once
             try:
-                lang_button = wait.until(EC.element_to_be_clickable((By.XPATH, f"//button[@id='ds-{lang}' and @aria-pressed='false']")))
-                lang_button.click()
-                print(f"Display in {lang} button clicked.")
+                start = time.monotonic()
+                with timer.stage("table"):
+                    shown = wait_until(lambda: ("table" if driver.find_elements(By.XPATH, "//table//tr") else
+                                                "no results" if driver.find_elements(By.XPATH, UNTERM_NO_RESULTS_XPATH) else None),
+                                       table_timeout.value)
+                    if shown == "table":
+                        wait_for_stable_count(lambda: (len(driver.find_elements(By.XPATH, "//table//tr")),
+                                                       len(driver.find_elements(By.XPATH, "//table//tr/*"))),
+                                              max(table_timeout.value - (time.monotonic() - start), POLL_INTERVAL))
+                        table = driver.find_element(By.XPATH, "//table")
+                        table_html = table.get_attribute('outerHTML')
+                if shown == "no results":
+                    no_results = True
+                    print(f"No UNTERM results for '{TEXT_TO_SEARCH}'.")
+                else:
+                    # Only the searches with results feed the timeout of the table
+                    table_timeout.record(time.monotonic() - start)
+                    print("Table HTML content retrieved.")
             except Exception as e:
-                print(f"Failed to click the Display in {lang} button: {e}")
+                print(f"Failed to retrieve the table HTML content: {e}")
 
-        #driver.save_screenshot("/content/screenshot_filters.png")
-
-        # Step 4: Wait for the table to be visible and scrape its HTML content
-        try:
-            table = wait.until(EC.visibility_of_element_located((By.XPATH, "//table")))
-            table_html = table.get_attribute('outerHTML')
-            print("Table HTML content retrieved.")
         except Exception as e:
-            print(f"Failed to retrieve the table HTML content: {e}")
+            print(f"An error occurred: {e}")
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-    finally:
-        # Close the WebDriver
-        driver.quit()
+    if no_results:
+        print(timer.summary())
+        return []
+    if table_html is None:
+        print(timer.summary())
+        return None
 
     # Step 5: Convert the table HTML to a dictionary
     try:
-        soup = BeautifulSoup(table_html, 'html.parser')
-        rows = soup.find_all('tr')
-        data = []
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) > 0:
-                row_data = {}
-                for col, lang in zip(cols[1:], ["English", "French", "Spanish", "Russian", "Chinese", "Arabic"]):
-                    terms = []
-                    ul = col.find('ul', class_='search-result')
-                    if ul:
-                        for li in ul.find_all('li'):
-                            span = li.find('span', class_=True, lang=True)
-                            if span:
-                                term = span.get_text(strip=False)
-                                term_class = span['class'][0]
-                                terms.append({"term": term, "termClass": term_class})
-                    row_data[lang] = terms
-
-                # Extract source information
-                source_div = cols[-1].find('div', class_='record-info')
-                if source_div:
-                    source = source_div.find('h5').get_text(strip=False)
-                    tags = [li.get_text(strip=False) for li in source_div.find_all('li')]
-                    row_data["UNTerm_Source"] = {"source": source, "tags": tags}
-                else:
-                    row_data["UNTerm_Source"] = {"source": "", "tags": []}
-
-                data.append(row_data)
-        #table_html_io = StringIO(table_html)
-        #df = pd.read_html(table_html_io)[0]
-        #markdown_table = df.to_markdown(index=False)
-        #print(markdown_table)
-        #data_df = pd.DataFrame(data)
-
-        #return [data, markdown_table, table_html, df, data_df]
-        return data
+        with timer.stage("parse"):
+            data = parse_unterm_table(table_html)
     except Exception as e:
         print(f"Failed to convert the table HTML to a dictionary: {e}")
-        #return table_html
-        return None
+        data = None
+    print(timer.summary())
+    return data
     
 
 def report_missing_translations(consolidated_data):
@@ -189,146 +326,139 @@ def report_missing_translations(consolidated_data):
     
     return result
 
+def _unterm_row_priorities(row, search_lower) -> list:
+    """
+    Priorities (1 to 5, see consolidate_UNTermResults) matched by an UNTERM row.
+    The English terms of the row are lowercased once for all the priorities.
+    """
+    if "English" not in row:
+        return []
+
+    english = row["English"]
+    preferred = [term.lower() for term in english.get("preferred", []) if term]
+    admitted = [term.lower() for term in english.get("admitted", []) if term]
+    exact_preferred = search_lower in preferred
+    exact_any = exact_preferred or search_lower in admitted
+    contains_preferred = exact_preferred or any(search_lower in term for term in preferred)
+    contains_any = contains_preferred or any(search_lower in term for term in admitted)
+
+    source_info = row["UNTerm_Source"]
+    is_unhq = source_info["source"] == "UNHQ"
+    is_unep_source = source_info["source"] in UNTERM_UNEP_SOURCES
+
+    priorities = []
+    if exact_preferred and is_unhq:
+        priorities.append(1)
+    if exact_preferred and is_unep_source:
+        priorities.append(2)
+    if contains_preferred and is_unhq:
+        priorities.append(3)
+    if contains_any and (is_unep_source or any(("Environment" in tag or "UNEP" in tag)
+                                               for tag in source_info.get("tags", []))):
+        priorities.append(4)
+    if exact_any:
+        priorities.append(5)
+    return priorities
+
+
 def consolidate_UNTermResults(data, TEXT_TO_SEARCH):
     """
     Consolidate UNTERM results into a single dictionary based on specified term selection priorities.
     Main language keys are only filled from priority_1 and priority_2 matches.
     Other priority levels only populate synonym collections.
-    
+
+    Priorities:
+        1. Exact English preferred term & UNHQ source
+        2. Exact English preferred term & UNON, UNEP or UNOG source
+        3. English preferred term containing the search term & UNHQ source
+        4. Any English term containing the search term & (UNON, UNEP or UNOG source or environment tags)
+        5. Any exact English term
+
+    Each row is classified once into all the priorities it matches, then the rows are
+    processed priority by priority, in their original order.
+
     Args:
         data: List of row data from search_term_and_extract_data
         TEXT_TO_SEARCH: The original search term
-        
+
     Returns:
         dict: Consolidated dictionary with best terms for each language plus synonyms
     """
     # Initialize result dictionary with empty values
-    result = {
-        "English": "",
-        "French": "",
-        "Spanish": "",
-        "Russian": "",
-        "Chinese": "",
-        "Arabic": "",
-        "UNTerm_Source": None
-    }
-    
+    result = {lang: "" for lang in UNTERM_LANGUAGES}
+    result["UNTerm_Source"] = None
+
     # Initialize synonyms dictionaries for each non-English language
-    for lang in ["French", "Spanish", "Russian", "Chinese", "Arabic"]:
+    target_languages = UNTERM_LANGUAGES[1:]
+    for lang in target_languages:
         result[f"{lang}Synonyms"] = {
             "Synonyms": [],
             "Similar": []
         }
-    
-    # Track which languages have been filled in main entries
-    filled_languages = set()
-    
-    # Process priority_1 and priority_2 to fill main language keys
-    priority_functions_main = [
-        # Priority 1: Exact match & UNHQ source
-        lambda row: ("English" in row and 
-                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and 
-                    row["UNTerm_Source"]["source"] == "UNHQ"),
-        
-        # Priority 2: Exact match & specific sources
-        lambda row: ("English" in row and 
-                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and 
-                    row["UNTerm_Source"]["source"] in ["UNON", "UNEP", "UNOG"])
-    ]
-    
+
+    # Classify each row into the priorities it matches
+    search_lower = TEXT_TO_SEARCH.lower()
+    rows_by_priority = {priority: [] for priority in range(1, 6)}
+    for row in data:
+        for priority in _unterm_row_priorities(row, search_lower):
+            rows_by_priority[priority].append(row)
+
     # Fill main language fields using only priority 1 and 2
-    for priority_func in priority_functions_main:
-        if len(filled_languages) == len(result) - 1:  # All language fields filled (-1 for UNTerm_Source)
-            break
-            
-        for row in data:
-            if priority_func(row):
-                # This row matches priority 1 or 2 - fill main language fields
-                for lang in ["English", "French", "Spanish", "Russian", "Chinese", "Arabic"]:
-                    if lang in filled_languages:
-                        continue
-                        
-                    if lang in row:
-                        # First try preferred terms
-                        if row[lang].get("preferred"):
-                            result[lang] = row[lang]["preferred"][0]
-                            filled_languages.add(lang)
-                        # Then try admitted terms
-                        elif row[lang].get("admitted"):
-                            result[lang] = row[lang]["admitted"][0]
-                            filled_languages.add(lang)
-                
-                # Record source info if we haven't already and at least one language was filled
-                if not result["UNTerm_Source"] and filled_languages:
-                    result["UNTerm_Source"] = row["UNTerm_Source"]
-    
-    # Define all priority check functions (for collecting synonyms)
-    priority_functions_all = [
-        # Priority 1 (same as above)
-        lambda row: ("English" in row and 
-                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and 
-                    row["UNTerm_Source"]["source"] == "UNHQ"),
-        
-        # Priority 2 (same as above)
-        lambda row: ("English" in row and 
-                    any(term.lower() == TEXT_TO_SEARCH.lower() for term in row["English"].get("preferred", []) if term) and 
-                    row["UNTerm_Source"]["source"] in ["UNON", "UNEP", "UNOG"]),
-        
-        # Priority 3: Contains search term & UNHQ source
-        lambda row: ("English" in row and 
-                    any(TEXT_TO_SEARCH.lower() in term.lower() for term in row["English"].get("preferred", []) if term) and 
-                    row["UNTerm_Source"]["source"] == "UNHQ"),
-        
-        # Priority 4: Contains search term & (specific sources OR environment tags)
-        lambda row: ("English" in row and 
-                    any(TEXT_TO_SEARCH.lower() in term.lower() 
-                        for term_type in ["preferred", "admitted"] 
-                        for term in row["English"].get(term_type, []) if term) and
-                    (row["UNTerm_Source"]["source"] in ["UNON", "UNEP", "UNOG"] or
-                     any(("Environment" in tag or "UNEP" in tag) 
-                         for tag in row["UNTerm_Source"].get("tags", [])))),
-        
-        # Priority 5: Any exact match
-        lambda row: ("English" in row and 
-                    any(term.lower() == TEXT_TO_SEARCH.lower() 
-                        for term_type in ["preferred", "admitted"] 
-                        for term in row["English"].get(term_type, []) if term))
-    ]
-    
-    # Collect synonyms from all rows based on priority levels
-    for priority_idx, priority_func in enumerate(priority_functions_all, 1):
-        for row in data:
-            if priority_func(row):
-                # For priority 1-2, collect admitted terms as synonyms
-                if priority_idx <= 2:
-                    for lang in ["French", "Spanish", "Russian", "Chinese", "Arabic"]:
-                        if lang in row:
-                            # Add admitted terms as synonyms (excluding the main term)
-                            for term in row[lang].get("admitted", []):
-                                if term and term != result[lang] and term not in result[f"{lang}Synonyms"]["Synonyms"]:
-                                    result[f"{lang}Synonyms"]["Synonyms"].append(term)
-                                    
-                # For priority 3-5, collect all terms as similar
-                else:
-                    for lang in ["French", "Spanish", "Russian", "Chinese", "Arabic"]:
-                        if lang in row:
-                            # Collect both preferred and admitted as similar terms
-                            for term_type in ["preferred", "admitted"]:
-                                for term in row[lang].get(term_type, []):
-                                    if (term and term != result[lang] and 
-                                        term not in result[f"{lang}Synonyms"]["Similar"] and
-                                        term not in result[f"{lang}Synonyms"]["Synonyms"]):
-                                        result[f"{lang}Synonyms"]["Similar"].append(term)
-    
+    filled_languages = set()
+    for row in rows_by_priority[1] + rows_by_priority[2]:
+        for lang in UNTERM_LANGUAGES:
+            if lang in filled_languages or lang not in row:
+                continue
+            # First try preferred terms, then admitted terms
+            if row[lang].get("preferred"):
+                result[lang] = row[lang]["preferred"][0]
+                filled_languages.add(lang)
+            elif row[lang].get("admitted"):
+                result[lang] = row[lang]["admitted"][0]
+                filled_languages.add(lang)
+
+        # Record source info of the first row filling a language
+        if not result["UNTerm_Source"] and filled_languages:
+            result["UNTerm_Source"] = row["UNTerm_Source"]
+
+    # Collect synonyms, the sets keep the lists free of duplicates without scanning them
+    for lang in target_languages:
+        synonyms = result[f"{lang}Synonyms"]["Synonyms"]
+        similar = result[f"{lang}Synonyms"]["Similar"]
+        seen = {result[lang]}
+
+        # For priority 1-2, collect admitted terms as synonyms (excluding the main term)
+        for priority in (1, 2):
+            for row in rows_by_priority[priority]:
+                if lang in row:
+                    for term in row[lang].get("admitted", []):
+                        if term and term not in seen:
+                            seen.add(term)
+                            synonyms.append(term)
+
+        # For priority 3-5, collect both preferred and admitted terms as similar
+        for priority in (3, 4, 5):
+            for row in rows_by_priority[priority]:
+                if lang in row:
+                    for term_type in ["preferred", "admitted"]:
+                        for term in row[lang].get(term_type, []):
+                            if term and term not in seen:
+                                seen.add(term)
+                                similar.append(term)
+
     return result
 
 
 
-def queryFAOTerm(TEXT_TO_SEARCH):
+def queryFAOTerm(TEXT_TO_SEARCH, pool=None, store=None, offline=None):
     """
     Queries the FAO Term database for the given text and retrieves search results.
+    With a local terminology store, the store is queried first and the fetched results are stored in it.
     Args:
         TEXT_TO_SEARCH (str): The text to search for in the FAO Term database.
+        pool (WebDriverPool, optional): Pool of the browser to use. Defaults to the shared pool.
+        store (TermStore, optional): Local terminology store (e.g. get_term_store(cache_dir)). Defaults to None, no store.
+        offline (bool, optional): If True, only the store is queried. Defaults to the offline setting of the store.
     Returns:
         list: A list of search results, where each result is a list containing:
             - term (str): The term found.
@@ -340,203 +470,235 @@ def queryFAOTerm(TEXT_TO_SEARCH):
     Raises:
         Exception: If an error occurs during the web scraping process.
     """
-    from selenium import webdriver
     from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
     from selenium.webdriver.common.keys import Keys
-    
-    # Create a new directory for the user data
-    user_data_dir = "/tmp/chrome_user_data"
-    os.makedirs(user_data_dir, exist_ok=True)
 
-    # Set up Chrome options for Google Colab
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument(f'--user-data-dir={user_data_dir}')
-    options.add_argument('--profile-directory=Profile 3')
+    offline = is_offline(store, offline)
+    if store is not None:
+        stored = store.get_faoterm(TEXT_TO_SEARCH, offline)
+        if stored is not None:
+            return stored
+    if offline:
+        print(f"'{TEXT_TO_SEARCH}' is not in the local terminology store (offline mode).")
+        return []
 
-    # Initialize the WebDriver
-    driver = webdriver.Chrome(options=options)
+    pool = pool or get_driver_pool()
+    timer = StageTimer("faoterm")
+    table_timeout = get_adaptive_timeout("faoterm/results table")
+    rows_timeout = get_adaptive_timeout("faoterm/result rows", default=5.0, minimum=1.0)
 
     tableHTML = False
     tableMarkDown = False
+    results = []
+    failed = False
+    partial = False
 
-    try:
-        # Open the website
-        driver.get("https://faoterm.fao.org/index.html?language=en")
-
-        # Find the search box and enter the search query
-        search_box = driver.find_element(By.ID, "searchBox")
-        search_box.send_keys(TEXT_TO_SEARCH)
-        search_box.send_keys(Keys.RETURN)
-
-        # Wait for the results to load (adjust the wait time if necessary)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "searchResultTable"))
-        )
-        time.sleep(5)  # Additional wait time to ensure all results are loaded
-
-        # Get all available search results
-        results = []
-        i = 0
-        while True:
+    with pool.driver() as driver:
+        try:
+            # Open the website
+            with timer.stage("search page"):
+                driver.get("https://faoterm.fao.org/index.html?language=en")
+
+                # Find the search box and enter the search query
+                search_box = driver.find_element(By.ID, "searchBox")
+                search_box.send_keys(TEXT_TO_SEARCH)
+                search_box.send_keys(Keys.RETURN)
+
+            # Wait for the results table, then until its rows stop being added
+            with timer.stage("results table", table_timeout):
+                WebDriverWait(driver, table_timeout.value, poll_frequency=POLL_INTERVAL).until(
+                    EC.presence_of_element_located((By.ID, "searchResultTable"))
+                )
             try:
-                result_row = driver.find_element(By.ID, f"searchResultRow_{i}")
-                term_hidden_link = result_row.find_element(By.NAME, "searchResHiddenLink")
-                term = term_hidden_link.get_attribute("alt")
-                term_cell = result_row.find_element(By.CLASS_NAME, "searchResultLink")
-                entryID = term_cell.get_attribute("alt")
-                isEnglishObsolete = bool(term_cell.find_elements(By.CLASS_NAME, "obsoleteTermLabel"))
-                language = result_row.find_element(By.CLASS_NAME, "langColumn").text
-                subject = result_row.find_element(By.CLASS_NAME, "subject").text
-                collection = result_row.find_element(By.CLASS_NAME, "collColumn").text
-                results.append([term, entryID, isEnglishObsolete, language, subject, collection])
-                i += 1
-            except Exception as e:
-                break
-
-        # Generate HTML and Markdown tables if results are found
-        avoid = False
-        if avoid:
-            tableHTML = "<table><tr><th>Term</th><th>Entry ID</th><th>isEnglishObsolete</th><th>Language</th><th>Subject</th><th>Collection</th></tr>"
-            tableMarkDown = "| Term | Entry ID | isEnglishObsolete | Language | Subject | Collection |\n|------|----------|------------------|----------|---------|------------|\n"
-            for result in results:
-                tableHTML += f"<tr><td>{result[0]}</td><td>{result[1]}</td><td>{result[2]}</td><td>{result[3]}</td><td>{result[4]}</td><td>{result[5]}</td></tr>"
-                tableMarkDown += f"| {result[0]} | {result[1]} | {result[2]} | {result[3]} | {result[4]} | {result[5]} |\n"
-            tableHTML += "</table>"
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+                with timer.stage("result rows", rows_timeout):
+                    wait_for_stable_count(lambda: len(driver.find_elements(By.XPATH, "//*[starts-with(@id, 'searchResultRow_')]")),
+                                          rows_timeout.value, stable_for=0.5)
+            except TimeoutError as e:
+                print(f"FAOTERM results still loading or empty: {e}")
+                partial = True
+
+            # Get all available search results
+            with timer.stage("scrape"):
+                results = []
+                i = 0
+                while True:
+                    try:
+                        result_row = driver.find_element(By.ID, f"searchResultRow_{i}")
+                        term_hidden_link = result_row.find_element(By.NAME, "searchResHiddenLink")
+                        term = term_hidden_link.get_attribute("alt")
+                        term_cell = result_row.find_element(By.CLASS_NAME, "searchResultLink")
+                        entryID = term_cell.get_attribute("alt")
+                        isEnglishObsolete = bool(term_cell.find_elements(By.CLASS_NAME, "obsoleteTermLabel"))
+                        language = result_row.find_element(By.CLASS_NAME, "langColumn").text
+                        subject = result_row.find_element(By.CLASS_NAME, "subject").text
+                        collection = result_row.find_element(By.CLASS_NAME, "collColumn").text
+                        results.append([term, entryID, isEnglishObsolete, language, subject, collection])
+                        i += 1
+                    except Exception as e:
+                        break
+
+            # Generate HTML and Markdown tables if results are found
+            avoid = False
+            if avoid:
+                tableHTML = "<table><tr><th>Term</th><th>Entry ID</th><th>isEnglishObsolete</th><th>Language</th><th>Subject</th><th>Collection</th></tr>"
+                tableMarkDown = "| Term | Entry ID | isEnglishObsolete | Language | Subject | Collection |\n|------|----------|------------------|----------|---------|------------|\n"
+                for result in results:
+                    tableHTML += f"<tr><td>{result[0]}</td><td>{result[1]}</td><td>{result[2]}</td><td>{result[3]}</td><td>{result[4]}</td><td>{result[5]}</td></tr>"
+                    tableMarkDown += f"| {result[0]} | {result[1]} | {result[2]} | {result[3]} | {result[4]} | {result[5]} |\n"
+                tableHTML += "</table>"
 
-    finally:
-        # Close the WebDriver
-        driver.quit()
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            failed = True
 
+    print(timer.summary())
+    if store is not None and not failed:
+        # Results scraped before the rows finished loading are stored as stale
+        store.put_faoterm(TEXT_TO_SEARCH, results, complete=not partial)
     return results
 
-def getFAOtermsByEntry(entryID: str, getMetadata=True) -> dict:
-    # Create a new directory for the user data
-    user_data_dir = "/tmp/chrome_user_data"
-    os.makedirs(user_data_dir, exist_ok=True)
+def getFAOtermsByEntry(entryID: str, getMetadata=True, pool=None, store=None, offline=None) -> dict:
+    """
+    Get the terms, sources, related terms and remarks of a FAOTERM entry in each language.
+
+    Args:
+        entryID (str): The entry ID (see queryFAOTerm)
+        getMetadata (bool): Whether to get the subject, status, category, source and reliability of the entry
+        pool (WebDriverPool, optional): Pool of the browser to use. Defaults to the shared pool.
+        store (TermStore, optional): Local terminology store, queried first (e.g. get_term_store(cache_dir)).
+                                     Defaults to None, no store.
+        offline (bool, optional): If True, only the store is queried. Defaults to the offline setting of the store.
+
+    Returns:
+        dict: The entry metadata and the details of each language ("ESTerm", "ESSource", "ESRelated", "ESRemarks", ...)
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
 
-    # Set up Chrome options for Google Colab
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument(f'--user-data-dir={user_data_dir}')
-    options.add_argument('--profile-directory=Profile 3')
+    offline = is_offline(store, offline)
+    if store is not None:
+        stored = store.get_faoterm_entry(entryID, getMetadata, offline)
+        if stored is not None:
+            return stored
+    if offline:
+        print(f"FAOTERM entry {entryID} is not in the local terminology store (offline mode).")
+        return {"entryID": entryID}
 
-    # Initialize the WebDriver
-    driver = webdriver.Chrome(options=options)
+    pool = pool or get_driver_pool()
+    timer = StageTimer("faoterm entry")
+    page_timeout = get_adaptive_timeout("faoterm entry/entry page")
 
     data = {
         "entryID": entryID,
         "Subject": "",
         "Status": "", "Category": "", "MetadataSource": "", "Reliability": ""
     }
+    failed = False
+    partial = False
 
-    try:
-        # Open the entry detail page
-        driver.get(f"https://faoterm.fao.org/viewEntry.html?entryId={entryID}")
-
-        # Wait for the entry detail table to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "entryDetailTable"))
-        )
-
-        # Get the metadata if required
-        if getMetadata:
-            metadata_table = driver.find_element(By.ID, "entryDetailTable")
-            try:
-                data["Subject"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Subject')]/span").text.strip()
-            except:
-                print("Subject not found")
-            try:
-                data["Status"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Status')]/span").text.strip()
-            except:
-                print("Status not found")
-            try:
-                data["MetadataSource"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Source') and @class='lastColumn']/span").text.strip()
-            except:
-                print("Source not found")
-            try:
-                data["Category"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Category')]/span").text.strip()
-            except:
-                print("Category not found")
-            try:
-                data["Reliability"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Reliability')]/span").text.strip()
-            except:
-                print("Reliability not found")
-
-        # Get the term details for each language
-        languages = {
-            "AR": {"panel_id": "AR_panel", "term_source_texts": ["مصدر المصطلح"], "remarks_texts": ["ملاحظات"]},
-            "EN": {"panel_id": "EN_panel", "term_source_texts": ["Term source"], "remarks_texts": ["Remarks"]},
-            "ES": {"panel_id": "ES_panel", "term_source_texts": ["Fuente del término"], "remarks_texts": ["Observaciones"]},
-            "RU": {"panel_id": "RU_panel", "term_source_texts": ["Источник (термина)"], "remarks_texts": ["Примечания"]},
-            "ZH": {"panel_id": "ZH_panel", "term_source_texts": ["术语来源"], "remarks_texts": ["备注"]},
-            "FR": {"panel_id": "FR_panel", "term_source_texts": ["Source du terme"], "remarks_texts": ["Remarques"]},
-            "PT": {"panel_id": "PT_panel", "term_source_texts": ["Term source"], "remarks_texts": ["Remarks"]}
-        }
-
-        for lang, details in languages.items():
-            try:
-                panel = driver.find_element(By.ID, details["panel_id"])
-                terms = panel.find_elements(By.CLASS_NAME, "termName")
-                term_names = [term.text for term in terms]
-                data[f"{lang}Term"] = "; ".join(term_names)
-
-                # Get the term sources for each term name
-                term_sources = []
-                for term in terms:
-                    sources = []
-                    for term_source_text in details["term_source_texts"]:
-                        try:
-                            source_elements = term.find_elements(By.XPATH, f".//following-sibling::h4[text()='{term_source_text}']/following-sibling::p")
-                            while source_elements:
-                                sources.extend([source.text for source in source_elements])
-                                source_elements = source_elements[0].find_elements(By.XPATH, "./following-sibling::p")
-                        except:
-                            pass
-                    term_sources.append((term.text, sources))
-                data[f"{lang}Source"] = str(term_sources)
-
-                # Get the related terms
+    with pool.driver() as driver:
+        try:
+            # Open the entry detail page and wait for the entry detail table to load
+            with timer.stage("entry page", page_timeout):
+                driver.get(f"https://faoterm.fao.org/viewEntry.html?entryId={entryID}")
+                WebDriverWait(driver, page_timeout.value, poll_frequency=POLL_INTERVAL).until(
+                    EC.presence_of_element_located((By.ID, "entryDetailTable"))
+                )
+
+            # Get the metadata if required
+            if getMetadata:
+                metadata_table = driver.find_element(By.ID, "entryDetailTable")
                 try:
-                    related_terms = panel.find_elements(By.XPATH, ".//p[starts-with(@name, 'relatedTerm')]/a[@class='relatedTerm']")
-                    related_terms_list = []
-                    for term in related_terms:
-                        onclick_attr = term.get_attribute('onclick')
-                        term_id = onclick_attr.split("'")[1]
-                        term_lang = onclick_attr.split("'")[3]
-                        related_terms_list.append(f"{term.text} | ('{term_id}','{term_lang}')")
-                    data[f"{lang}Related"] = str(related_terms_list)
+                    data["Subject"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Subject')]/span").text.strip()
                 except:
-                    pass
-
-                # Get the remarks
-                remarks_list = []
-                for remarks_text in details["remarks_texts"]:
+                    print("Subject not found")
+                try:
+                    data["Status"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Status')]/span").text.strip()
+                except:
+                    print("Status not found")
+                try:
+                    data["MetadataSource"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Source') and @class='lastColumn']/span").text.strip()
+                except:
+                    print("Source not found")
+                try:
+                    data["Category"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Category')]/span").text.strip()
+                except:
+                    print("Category not found")
+                try:
+                    data["Reliability"] = metadata_table.find_element(By.XPATH, ".//th[contains(text(), 'Reliability')]/span").text.strip()
+                except:
+                    print("Reliability not found")
+
+            # Get the term details for each language
+            languages = {
+                "AR": {"panel_id": "AR_panel", "term_source_texts": ["مصدر المصطلح"], "remarks_texts": ["ملاحظات"]},
+                "EN": {"panel_id": "EN_panel", "term_source_texts": ["Term source"], "remarks_texts": ["Remarks"]},
+                "ES": {"panel_id": "ES_panel", "term_source_texts": ["Fuente del término"], "remarks_texts": ["Observaciones"]},
+                "RU": {"panel_id": "RU_panel", "term_source_texts": ["Источник (термина)"], "remarks_texts": ["Примечания"]},
+                "ZH": {"panel_id": "ZH_panel", "term_source_texts": ["术语来源"], "remarks_texts": ["备注"]},
+                "FR": {"panel_id": "FR_panel", "term_source_texts": ["Source du terme"], "remarks_texts": ["Remarques"]},
+                "PT": {"panel_id": "PT_panel", "term_source_texts": ["Term source"], "remarks_texts": ["Remarks"]}
+            }
+
+            for lang, details in languages.items():
+                try:
+                    panel = driver.find_element(By.ID, details["panel_id"])
+                    terms = panel.find_elements(By.CLASS_NAME, "termName")
+                    term_names = [term.text for term in terms]
+                    data[f"{lang}Term"] = "; ".join(term_names)
+
+                    # Get the term sources for each term name
+                    term_sources = []
+                    for term in terms:
+                        sources = []
+                        for term_source_text in details["term_source_texts"]:
+                            try:
+                                source_elements = term.find_elements(By.XPATH, f".//following-sibling::h4[text()='{term_source_text}']/following-sibling::p")
+                                while source_elements:
+                                    sources.extend([source.text for source in source_elements])
+                                    source_elements = source_elements[0].find_elements(By.XPATH, "./following-sibling::p")
+                            except:
+                                pass
+                        term_sources.append((term.text, sources))
+                    data[f"{lang}Source"] = str(term_sources)
+
+                    # Get the related terms
                     try:
-                        remarks_elements = panel.find_elements(By.XPATH, f".//h4[text()='{remarks_text}']/following-sibling::p")
-                        remarks_list.extend([remark.text for remark in remarks_elements])
+                        related_terms = panel.find_elements(By.XPATH, ".//p[starts-with(@name, 'relatedTerm')]/a[@class='relatedTerm']")
+                        related_terms_list = []
+                        for term in related_terms:
+                            onclick_attr = term.get_attribute('onclick')
+                            term_id = onclick_attr.split("'")[1]
+                            term_lang = onclick_attr.split("'")[3]
+                            related_terms_list.append(f"{term.text} | ('{term_id}','{term_lang}')")
+                        data[f"{lang}Related"] = str(related_terms_list)
                     except:
                         pass
-                data[f"{lang}Remarks"] = "; ".join(remarks_list)
-
-            except Exception as e:
-                print(f"An error occurred while processing {lang}: {e}")
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        print(driver.page_source)  # Print the source HTML code of the page
+                    # Get the remarks
+                    remarks_list = []
+                    for remarks_text in details["remarks_texts"]:
+                        try:
+                            remarks_elements = panel.find_elements(By.XPATH, f".//h4[text()='{remarks_text}']/following-sibling::p")
+                            remarks_list.extend([remark.text for remark in remarks_elements])
+                        except:
+                            pass
+                    data[f"{lang}Remarks"] = "; ".join(remarks_list)
 
-    finally:
-        # Close the WebDriver
-        driver.quit()
+                except Exception as e:
+                    print(f"An error occurred while processing {lang}: {e}")
+                    partial = True
 
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            print(driver.page_source)  # Print the source HTML code of the page
+            failed = True
+
+    print(timer.summary())
+    if store is not None and not failed:
+        # Entries with a language that could not be read are stored as stale
+        store.put_faoterm_entry(entryID, data, getMetadata, complete=not partial)
     return data
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""
+Bulk term-list mode for TermSeeker
+
+This module processes a whole glossary in one run, sharing work between terms:
+- Each UN Digital Library document found for several terms is downloaded and converted once
+- Each English document is scanned once for all the terms that found it
+- Each target language document is aligned once against the English paragraphs of all those terms
+- The embedding model is loaded once, and results are streamed to a file as each term completes,
+  so an interrupted run resumes after the last completed term
+"""
+
+from .prefetch import DocumentPrefetcher
+from .extraction import ExtractionQueue
+from .llmcache import get_llm_cache
+from .resultsink import ResultSink
+from .utils import get_un_document_urls, find_paragraphs_for_terms, encode_paragraphs, align_paragraphs_anchored
+from .parseddoc import parse_document
+from .getcandidates import UNEP_LANGUAGES, ALIGNMENT_MODEL, CACHE_DIR, standardize_languages, search_library_metadata, \
+                           select_target_paragraphs, collect_target_terms, report_extraction_stats, \
+                           sanitize_filename, index_target_document
+
+
+def read_term_list(path) -> list:
+    """
+    Read a term list file with one term per line.
+    Empty lines and lines starting with '#' are ignored, and duplicated terms are kept once.
+
+    Args:
+        path (str): Path of the term list file
+
+    Returns:
+        list: The terms, in file order
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        terms = [line.strip() for line in f]
+    return list(dict.fromkeys(term for term in terms if term and not term.startswith('#')))
+
+
+class SharedDocuments:
+    """
+    Documents shared by the terms of a batch: English paragraph matches and target language
+    alignments are computed once per document for all the terms that found it, and released
+    once every term that found the document is processed.
+
+    Args:
+        prefetcher (DocumentPrefetcher): Prefetcher downloading and converting the documents
+        doc_terms (dict): Mapping of each document symbol to the terms whose search found it
+    """
+
+    def __init__(self, prefetcher, doc_terms):
+        self.prefetcher = prefetcher
+        self.doc_terms = doc_terms
+        self._remaining_terms = {docSymbol: set(terms) for docSymbol, terms in doc_terms.items()}
+        self._english_paragraphs = {}
+        self._english_embeddings = {}
+        self._english_docs = {}
+        self._alignments = {}
+        self._target_docs = {}
+
+    def prefetch(self, metadata_items, input_lang):
+        """
+        Schedule the download and conversion of the language versions of documents that are
+        not resolved yet (already scanned or aligned versions are never read again).
+
+        Args:
+            metadata_items (list): Metadata dictionaries of the documents to prefetch (with docSymbol)
+            input_lang (list): Target languages
+        """
+        for item in metadata_items:
+            docSymbol = item["docSymbol"]
+            docURLs = get_un_document_urls(docSymbol)
+            if docSymbol not in self._english_paragraphs:
+                self.prefetcher.prefetch(docURLs["English"])
+            for lang in input_lang:
+                if lang != "English" and lang in docURLs and (docSymbol, lang) not in self._alignments:
+                    self.prefetcher.prefetch(docURLs[lang], f"{sanitize_filename(docSymbol)}_{lang}.txt")
+
+    def release_term(self, term, docSymbols):
+        """
+        Record that a term is processed, and release the documents no remaining term found:
+        their paragraphs, embeddings, parsed documents, alignments and prefetched versions.
+
+        Args:
+            term (str): The processed term
+            docSymbols (list): Symbols of the documents found for the term
+        """
+        for docSymbol in docSymbols:
+            remaining = self._remaining_terms.get(docSymbol)
+            if remaining is None:
+                continue
+            remaining.discard(term)
+            if remaining:
+                continue
+            del self._remaining_terms[docSymbol]
+            self._english_paragraphs.pop(docSymbol, None)
+            self._english_embeddings.pop(docSymbol, None)
+            self._english_docs.pop(docSymbol, None)
+            docURLs = get_un_document_urls(docSymbol)
+            self.prefetcher.discard(docURLs["English"])
+            for lang, url in docURLs.items():
+                self._alignments.pop((docSymbol, lang), None)
+                self._target_docs.pop((docSymbol, lang), None)
+                if lang != "English":
+                    self.prefetcher.discard(url, f"{sanitize_filename(docSymbol)}_{lang}.txt")
+
+    def english_paragraphs(self, docSymbol, term) -> list:
+        """Get all the English paragraphs of a document containing a term."""
+        if docSymbol not in self._english_paragraphs:
+            englishMD = self.prefetcher.get(get_un_document_urls(docSymbol)["English"])
+            # The parsed English document gives the structural anchors of the paragraphs
+            self._english_docs[docSymbol] = parse_document(englishMD, CACHE_DIR) if englishMD else None
+            # Scan the document once for all the terms that found it
+            self._english_paragraphs[docSymbol] = find_paragraphs_for_terms(englishMD, self.doc_terms[docSymbol],
+                                                                            cache_dir=CACHE_DIR)
+        return self._english_paragraphs[docSymbol].get(term, [])
+
+    def _all_english_paragraphs(self, docSymbol) -> list:
+        """English paragraphs of a document matched by any term, without duplicates."""
+        paragraphs = {}
+        for term_paragraphs in self._english_paragraphs.get(docSymbol, {}).values():
+            paragraphs.update(dict.fromkeys(term_paragraphs))
+        return list(paragraphs)
+
+    def alignments(self, docSymbol, targetLang, english_paragraphs):
+        """
+        Get the alignments of English paragraphs of a document in a target language.
+        The target document is aligned once against the paragraphs of all the terms that found it.
+
+        Returns:
+            tuple: (parsed target document, one list of (segment index, score) per English paragraph)
+        """
+        key = (docSymbol, targetLang)
+        sanitized_docSymbol = sanitize_filename(docSymbol)
+
+        if key not in self._alignments:
+            all_paragraphs = self._all_english_paragraphs(docSymbol)
+            if docSymbol not in self._english_embeddings:
+                self._english_embeddings[docSymbol] = encode_paragraphs(all_paragraphs, ALIGNMENT_MODEL, CACHE_DIR,
+                                                                        f"{sanitized_docSymbol}_English")
+            langMD = self.prefetcher.get(get_un_document_urls(docSymbol)[targetLang],
+                                         f"{sanitized_docSymbol}_{targetLang}.txt")
+            self._target_docs[key] = parse_document(langMD, CACHE_DIR)
+            # Get top 2 similar paragraphs to have alternatives, near the numbered paragraph anchors
+            aligned = align_paragraphs_anchored(all_paragraphs, self._target_docs[key],
+                                                model_name=ALIGNMENT_MODEL,
+                                                top_k=2,
+                                                source_embeddings=self._english_embeddings[docSymbol],
+                                                cache_dir=CACHE_DIR,
+                                                doc_key=f"{sanitized_docSymbol}_{targetLang}",
+                                                source_doc=self._english_docs.get(docSymbol))
+            index_target_document(self._target_docs[key], docSymbol, targetLang)
+            self._alignments[key] = dict(zip(all_paragraphs, aligned))
+
+        return self._target_docs[key], [self._alignments[key].get(paragraph, []) for paragraph in english_paragraphs]
+
+
+def _process_term(term, metadataCleaned, shared, extraction, input_lang, sourcesQuantity, paragraphsPerDoc,
+                  prefetchDocs) -> list:
+    """Process the documents found for one term of the batch, following the rules of getCandidates."""
+    lang_paragraphs = {lang: [] for lang in input_lang if lang != "English"}
+    processed_results = []
+    pending_extractions = []
+    processed_docs = 0
+
+    for i, metadata in enumerate(metadataCleaned):
+        # Check if we've processed enough documents and have paragraphs for all languages
+        if processed_docs >= sourcesQuantity:
+            if all(len(paras) >= paragraphsPerDoc for paras in lang_paragraphs.values()):
+                break
+
+        # Prefetch this document and the next ones while this one is processed
+        shared.prefetch(metadataCleaned[i:i + prefetchDocs + 1], input_lang)
+
+        processed_docs += 1
+        resultItem = dict(metadata)
+        resultItem["EnglishTerm"] = term
+        resultItem["docURLs"] = get_un_document_urls(resultItem["docSymbol"])
+
+        all_english_paragraphs = shared.english_paragraphs(resultItem["docSymbol"], term)
+        if not all_english_paragraphs:
+            print(f"No English paragraphs found for '{term}' in document {resultItem['docSymbol']}, skipping...")
+            continue
+
+        englishParagraphs = all_english_paragraphs[:paragraphsPerDoc]
+        resultItem["EnglishParagraphs"] = englishParagraphs
+
+        languages_to_process = [lang for lang in input_lang if lang != "English" and len(lang_paragraphs[lang]) < paragraphsPerDoc]
+        if not languages_to_process:
+            break
+
+        found_target_paragraphs = False
+        target_paragraphs_by_lang = {}
+        for targetLang in languages_to_process:
+            try:
+                target_doc, alignments = shared.alignments(resultItem["docSymbol"], targetLang, all_english_paragraphs)
+                new_target_paragraphs = select_target_paragraphs(alignments, target_doc, UNEP_LANGUAGES.get(targetLang, ""),
+                                                                 paragraphsPerDoc)
+                if not new_target_paragraphs:
+                    print(f"No target paragraphs found for {targetLang} in document {resultItem['docSymbol']}")
+                    continue
+
+                found_target_paragraphs = True
+                lang_paragraphs[targetLang].extend(new_target_paragraphs)
+                resultItem[targetLang + 'Paragraphs'] = new_target_paragraphs
+                resultItem[targetLang + 'Term'] = None
+                resultItem[targetLang + 'Synonyms'] = None
+                target_paragraphs_by_lang[targetLang] = new_target_paragraphs
+            except Exception as e:
+                print(f"Error processing {targetLang} document for {resultItem['docSymbol']}: {e}")
+
+        if found_target_paragraphs:
+            processed_results.append(resultItem)
+            # Use only as many English paragraphs as we have target paragraphs
+            if extraction is not None:
+                englishParasToUse = englishParagraphs[:max(len(paras) for paras in target_paragraphs_by_lang.values())]
+                future = extraction.submit_languages(term, englishParasToUse, target_paragraphs_by_lang)
+                pending_extractions.append((resultItem, future))
+            if len(processed_results) >= sourcesQuantity:
+                if all(len(paras) >= paragraphsPerDoc for paras in lang_paragraphs.values()):
+                    break
+
+    collect_target_terms(pending_extractions)
+    return processed_results
+
+
+def getCandidatesBatch(terms, input_lang, input_filterSymbols, sourcesQuantity, paragraphsPerDoc, eraseDrafts,
+                       localLM=False, groqToken=None, output_path=None, prefetchDocs=2, maxDownloadsPerHost=3,
+                       multilingualPrompt=True, bypassLLMCache=False) -> dict:
+    """
+    Run getCandidates for a list of terms, sharing downloads, conversions, scans and alignments.
+
+    Args:
+        terms (list): The English terms to search for
+        input_lang (str or list): Target language(s), or "ALL"
+        input_filterSymbols (list): Document symbols to filter the searches. If empty, general term searches are performed.
+        sourcesQuantity (int): The number of documents to process for each term
+        paragraphsPerDoc (int): The number of paragraphs to extract per document for each language
+        eraseDrafts (bool): Whether to exclude draft documents from the results
+        localLM (bool, optional): If True, uses a local language model. If None, no term extraction is done. Defaults to False.
+        groqToken (str, optional): Token for accessing the Groq API. Defaults to None.
+        output_path (str, optional): JSON Lines file where the results of each term are appended as soon as the term is complete
+                                     (see ResultSink). Terms already completed in the file are not processed again.
+        prefetchDocs (int, optional): Number of upcoming documents prefetched in the background. Defaults to 2.
+        maxDownloadsPerHost (int, optional): Maximum number of simultaneous downloads from the same host. Defaults to 3.
+        multilingualPrompt (bool, optional): Whether the terms of all the target languages of a document are extracted
+                                             with a single LLM request. Defaults to True.
+        bypassLLMCache (bool, optional): Whether to ignore the LLM response cache. Defaults to False.
+
+    Returns:
+        dict: Mapping of each term to its list of results (same format as getCandidates)
+    """
+    input_lang = standardize_languages(input_lang)
+    terms = list(dict.fromkeys(terms))
+    results = {}
+
+    # Resume after the terms completed by a previous run
+    sink = ResultSink(output_path) if output_path else None
+    if sink is not None and sink.completed_terms:
+        for term in terms:
+            if term in sink.completed_terms:
+                results[term] = sink.records(term)
+        terms = [term for term in terms if term not in sink.completed_terms]
+        print(f"Resuming after {len(results)} terms already completed in {output_path}")
+
+    max_docs_to_fetch = min(50, max(10, sourcesQuantity * 3))
+
+    # Search the library for every term, and group the terms by document
+    term_metadata = {}
+    doc_terms = {}
+    for term in terms:
+        print(f"Searching documents for '{term}'...")
+        term_metadata[term] = search_library_metadata(term, input_filterSymbols, eraseDrafts, max_docs_to_fetch)
+        for metadata in term_metadata[term]:
+            doc_terms.setdefault(metadata["docSymbol"], []).append(term)
+
+    shared_docs = sum(1 for doc_list in doc_terms.values() if len(doc_list) > 1)
+    print(f"Found {len(doc_terms)} unique documents for {len(terms)} terms ({shared_docs} shared by several terms)")
+
+    prefetcher = DocumentPrefetcher(CACHE_DIR, max_per_host=maxDownloadsPerHost)
+    extraction = None
+    if localLM is not None:
+        extraction = ExtractionQueue(localLM, groqToken, multilingual=multilingualPrompt,
+                                     cache=get_llm_cache(CACHE_DIR), bypass_cache=bypassLLMCache)
+    shared = SharedDocuments(prefetcher, doc_terms)
+    completed = False
+    try:
+        for n, term in enumerate(terms, 1):
+            print(f"Processing term {n}/{len(terms)}: {term}")
+            results[term] = _process_term(term, term_metadata[term], shared, extraction, input_lang,
+                                          sourcesQuantity, paragraphsPerDoc, prefetchDocs)
+            shared.release_term(term, [metadata["docSymbol"] for metadata in term_metadata[term]])
+
+            # Stream the results of the term as soon as it is complete
+            if sink is not None:
+                sink.write_term(term, results[term])
+        completed = True
+    finally:
+        prefetcher.close()
+        if extraction is not None:
+            # Extractions still queued are cancelled after an error or an interruption
+            extraction.close(cancel=not completed)
+            report_extraction_stats(extraction)
+        if sink is not None:
+            sink.close()
+
+    return results
@@ -4,72 +4,95 @@ Convert module for transforming documents to different formats
 
 import os
 import tempfile
-import requests
-import pymupdf4llm
+from .transport import get_transport
 from pathlib import Path
 
-def convert_pdf_to_markdown(url_or_path, cache_dir=None, file_name=None):
+def get_markdown_cache_paths(url_or_path, cache_dir=None, file_name=None):
     """
-    Convert a PDF document to Markdown format.
-    
+    Find the markdown cache file of a PDF document.
+
     Parameters:
     -----------
     url_or_path : str
         URL or file path to the PDF document
-    output_format : str, optional
-        Output format (default is "markdown")
-        
+    cache_dir : str, optional
+        Directory of the markdown cache
+    file_name : str, optional
+        File name to use in the cache instead of the hash of the URL
+
+    Returns:
+    --------
+    tuple
+        (path of an existing cached version or None, path where a new version should be saved or None)
+    """
+    if not cache_dir or not url_or_path.startswith(('http://', 'https://')):
+        return None, None
+
+    import hashlib
+    # Create a hash of the URL to use as filename
+    url_hash = hashlib.md5(url_or_path.encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{url_hash}.md")
+    if os.path.exists(cache_path):
+        return cache_path, cache_path
+
+    if file_name:
+        # Use provided file_name for caching
+        cache_path = os.path.join(cache_dir, f"{file_name}")
+        if os.path.exists(cache_path):
+            return cache_path, cache_path
+
+    return None, cache_path
+
+def download_pdf(url):
+    """
+    Download a PDF document to a temporary file.
+
+    Parameters:
+    -----------
+    url : str
+        URL of the PDF document
+
+    Returns:
+    --------
+    str
+        Path of the temporary file, to be removed by the caller
+    """
+    # Save to temporary file
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+        temp_path = temp_file.name
+        try:
+            size = get_transport().download(url, temp_file)
+        except Exception:
+            temp_file.close()
+            os.unlink(temp_path)
+            raise
+    print(f"\t\tconvert.py -> got response ({size} bytes)")
+    return temp_path
+
+def pdf_file_to_markdown(file_path, cache_path=None, remove_file=False):
+    """
+    Convert a local PDF file to Markdown format and optionally save it to the cache.
+    This function is kept at module level so it can run in a process pool.
+
+    Parameters:
+    -----------
+    file_path : str
+        Path to the PDF file
+    cache_path : str, optional
+        Path of the markdown cache file to write
+    remove_file : bool, optional
+        Whether to delete the PDF file after the conversion (e.g. a downloaded temporary file)
+
     Returns:
     --------
     str
         The document content in Markdown format
     """
     try:
-        # Determine if input is URL or local file
-        is_url = url_or_path.startswith(('http://', 'https://'))
-        
-        # Create cache filename if caching is enabled
-        cache_path = None
-        if cache_dir and is_url:
-            import hashlib
-            # Create a hash of the URL to use as filename
-            url_hash = hashlib.md5(url_or_path.encode()).hexdigest()
-            cache_path = os.path.join(cache_dir, f"{url_hash}.md")
-            print(cache_path)
-            # Check if cached version exists
-            if os.path.exists(cache_path):
-                print(f"\t\tconvert.py -> using cached version from {cache_path}")
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    return f.read()
-                
-            elif file_name:
-                # Use provided file_name for caching
-                cache_path = os.path.join(cache_dir, f"{file_name}")
-                if os.path.exists(cache_path):
-                    print(f"\t\tconvert.py -> using cached version from {cache_path}")
-                    with open(cache_path, 'r', encoding='utf-8') as f:
-                        return f.read()
-                
-        # Create temporary file if input is URL
-        if is_url:
-            # Download the file
-            response = requests.get(url_or_path, stream=True)
-            if response:
-                print("\t\tconvert.py -> got response")
-            response.raise_for_status()
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-                temp_path = temp_file.name
-                for chunk in response.iter_content(chunk_size=8192):
-                    temp_file.write(chunk)
-            file_path = temp_path
-        else:
-            file_path = url_or_path
-        
         # Use pymupdf4llm (assumed to be installed) to convert PDF to markdown
         try:
             print("\t\tconvert.py -> using pymupdf4llm")
+            import pymupdf4llm
             markdown_content = pymupdf4llm.to_markdown(file_path)
             if markdown_content:
                 print("\t\tconvert.py -> got markdown content")
@@ -82,7 +105,7 @@ def convert_pdf_to_markdown(url_or_path, cache_dir=None, file_name=None):
             for page in doc:
                 markdown_content += page.get_text("markdown") + "\n\n"
             doc.close()
-        
+
         # After successful conversion, save to cache if enabled
         if cache_path and markdown_content:
             os.makedirs(os.path.dirname(cache_path), exist_ok=True)
@@ -90,12 +113,45 @@ def convert_pdf_to_markdown(url_or_path, cache_dir=None, file_name=None):
                 f.write(markdown_content)
             print(f"\t\tconvert.py -> saved to cache: {cache_path}")
 
-        # Clean up temporary file if created
-        if is_url and os.path.exists(file_path):
+        return markdown_content
+    finally:
+        # Clean up temporary file if requested
+        if remove_file and os.path.exists(file_path):
             os.unlink(file_path)
 
-        return markdown_content
+def convert_pdf_to_markdown(url_or_path, cache_dir=None, file_name=None):
+    """
+    Convert a PDF document to Markdown format.
+    
+    Parameters:
+    -----------
+    url_or_path : str
+        URL or file path to the PDF document
+    cache_dir : str, optional
+        Directory of the markdown cache (only used for URLs)
+    file_name : str, optional
+        File name to use in the cache instead of the hash of the URL
+        
+    Returns:
+    --------
+    str
+        The document content in Markdown format
+    """
+    try:
+        # Determine if input is URL or local file
+        is_url = url_or_path.startswith(('http://', 'https://'))
+        
+        # Check if cached version exists
+        cached_path, cache_path = get_markdown_cache_paths(url_or_path, cache_dir, file_name)
+        if cached_path:
+            print(f"\t\tconvert.py -> using cached version from {cached_path}")
+            with open(cached_path, 'r', encoding='utf-8') as f:
+                return f.read()
+                
+        # Download the file to a temporary file if input is URL
+        file_path = download_pdf(url_or_path) if is_url else url_or_path
         
+        return pdf_file_to_markdown(file_path, cache_path, remove_file=is_url)
     
     except Exception as e:
         print(f"Error converting PDF to Markdown: {e}")
@@ -136,7 +192,7 @@ def convert_docx_to_markdown(url_or_path):
         # Create temporary file if input is URL
         if is_url:
             # Download the file
-            response = requests.get(url_or_path, stream=True)
+            response = get_transport().get(url_or_path, stream=True)
             response.raise_for_status()
             
             # Save to temporary file
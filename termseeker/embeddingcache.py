@@ -0,0 +1,206 @@
+"""
+Persistent paragraph embedding cache for TermSeeker
+
+This module stores the paragraph embeddings computed for a document next to the
+markdown cache written by convert_pdf_to_markdown, so documents that were already
+processed do not need any model inference:
+- {cache_dir}/embeddings/{model}/{doc_key}.{generation}.npy holds a float32 matrix (one row per paragraph)
+- {cache_dir}/embeddings/{model}/{doc_key}.json holds the paragraph hash of every row and the
+  generation of its matrix, so a reader never pairs an index with the matrix of another save
+
+The .npy files are opened memory-mapped, so only the requested rows are read from disk.
+"""
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+import unicodedata
+import uuid
+import numpy as np
+
+
+def normalize_paragraph(text) -> str:
+    """
+    Normalize a paragraph before hashing it (Unicode NFC and collapsed whitespace).
+
+    Args:
+        text (str): The paragraph text
+
+    Returns:
+        str: The normalized paragraph text
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def paragraph_hash(text) -> str:
+    """
+    Compute the hash of a normalized paragraph, used as the key of its embedding.
+
+    Args:
+        text (str): The paragraph text
+
+    Returns:
+        str: Hexadecimal SHA-1 digest of the normalized paragraph
+    """
+    return hashlib.sha1(normalize_paragraph(text).encode("utf-8")).hexdigest()
+
+
+def get_embedding_paths(cache_dir, doc_key, model_name, generation=None) -> tuple[str, str]:
+    """
+    Get the paths of the embedding matrix and of its index file for a document.
+
+    Args:
+        cache_dir (str): The markdown cache directory
+        doc_key (str): Identifier of the document (e.g. "UNEP_EA.5_HLS.1_Spanish")
+        model_name (str): Name of the embedding model
+        generation (str, optional): Generation of the matrix, given by its index. Defaults to None,
+                                    the matrix of caches written before generations.
+
+    Returns:
+        tuple: (path of the .npy matrix, path of the .json index)
+    """
+    model_dir = re.sub(r'[^\w\-_\.]', '_', model_name)
+    doc_name = re.sub(r'[^\w\-_\.]', '_', doc_key)
+    base_path = os.path.join(cache_dir, "embeddings", model_dir, doc_name)
+    matrix_path = f"{base_path}.{generation}.npy" if generation else f"{base_path}.npy"
+    return matrix_path, f"{base_path}.json"
+
+
+def _read_index(index_path) -> dict:
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_document_embeddings(cache_dir, doc_key, model_name):
+    """
+    Load the cached embeddings of a document.
+
+    Args:
+        cache_dir (str): The markdown cache directory
+        doc_key (str): Identifier of the document
+        model_name (str): Name of the embedding model
+
+    Returns:
+        tuple: (dict mapping paragraph hashes to row numbers, memory-mapped float32 matrix),
+               or (None, None) if the document has no cached embeddings
+    """
+    _, index_path = get_embedding_paths(cache_dir, doc_key, model_name)
+    if not os.path.exists(index_path):
+        return None, None
+
+    try:
+        index = _read_index(index_path)
+        hashes = index["hashes"]
+        matrix_path, _ = get_embedding_paths(cache_dir, doc_key, model_name, index.get("generation"))
+        if not os.path.exists(matrix_path):
+            return None, None
+        matrix = np.load(matrix_path, mmap_mode='r')
+        if matrix.shape[0] != len(hashes):
+            print(f"\t\tembeddingcache.py -> ignoring inconsistent cache for {doc_key}")
+            return None, None
+        return {h: row for row, h in enumerate(hashes)}, matrix
+    except Exception as e:
+        print(f"\t\tembeddingcache.py -> error reading cache for {doc_key}: {e}")
+        return None, None
+
+
+def _atomic_save(path, write):
+    """Write a file through a temporary file in the same directory, then rename it."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def save_document_embeddings(cache_dir, doc_key, model_name, hashes, matrix):
+    """
+    Save the embeddings of a document, replacing any previous version.
+    The matrix is written under a new generation and the index is replaced last, so concurrent
+    writers and readers always see an index together with the matrix it was written with.
+
+    Args:
+        cache_dir (str): The markdown cache directory
+        doc_key (str): Identifier of the document
+        model_name (str): Name of the embedding model
+        hashes (list): Paragraph hash of every row of the matrix
+        matrix (np.ndarray): Embedding matrix, one row per paragraph
+    """
+    generation = uuid.uuid4().hex
+    matrix_path, index_path = get_embedding_paths(cache_dir, doc_key, model_name, generation)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    index = json.dumps({"model": model_name, "doc": doc_key, "generation": generation, "hashes": list(hashes)})
+
+    try:
+        previous_generation = _read_index(index_path).get("generation")
+    except Exception:
+        previous_generation = None
+
+    # The matrix is written first: an index never points to a matrix that does not exist
+    _atomic_save(matrix_path, lambda f: np.save(f, matrix))
+    _atomic_save(index_path, lambda f: f.write(index.encode('utf-8')))
+
+    # The replaced matrix stays readable where it is memory-mapped (removal fails on Windows)
+    previous_path, _ = get_embedding_paths(cache_dir, doc_key, model_name, previous_generation)
+    try:
+        os.remove(previous_path)
+    except OSError:
+        pass
+
+
+def encode_with_cache(paragraphs, encode, cache_dir, doc_key, model_name) -> np.ndarray:
+    """
+    Return the embeddings of the paragraphs of a document, computing only the missing ones.
+
+    Args:
+        paragraphs (list): Paragraphs to embed
+        encode (callable): Function embedding a list of paragraphs, only called for
+                           paragraphs that are not cached yet
+        cache_dir (str): The markdown cache directory
+        doc_key (str): Identifier of the document
+        model_name (str): Name of the embedding model
+
+    Returns:
+        np.ndarray: float32 matrix with one embedding per paragraph, in the input order
+    """
+    hashes = [paragraph_hash(p) for p in paragraphs]
+    index, matrix = load_document_embeddings(cache_dir, doc_key, model_name)
+    if index is None:
+        index, matrix = {}, None
+
+    # Embed each missing paragraph once, even if it appears several times
+    missing = {}
+    for h, paragraph in zip(hashes, paragraphs):
+        if h not in index and h not in missing:
+            missing[h] = paragraph
+
+    if missing:
+        print(f"\t\tembeddingcache.py -> embedding {len(missing)} new paragraphs for {doc_key}")
+        new_embeddings = np.asarray(encode(list(missing.values())), dtype=np.float32)
+        new_hashes = list(missing.keys())
+
+        if matrix is not None and matrix.shape[0] > 0:
+            all_hashes = list(index.keys()) + new_hashes
+            matrix = np.vstack([np.asarray(matrix), new_embeddings])
+        else:
+            all_hashes = new_hashes
+            matrix = new_embeddings
+
+        try:
+            save_document_embeddings(cache_dir, doc_key, model_name, all_hashes, matrix)
+        except Exception as e:
+            print(f"\t\tembeddingcache.py -> error saving cache for {doc_key}: {e}")
+        index = {h: row for row, h in enumerate(all_hashes)}
+
+    if not paragraphs:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    return np.asarray(matrix[[index[h] for h in hashes]], dtype=np.float32)
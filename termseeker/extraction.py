@@ -0,0 +1,330 @@
+"""
+Asynchronous term extraction for TermSeeker
+
+This module sends the term extraction requests to the language models in the background, so
+downloads and alignments go on while the LLM answers are awaited:
+- Jobs (term, source paragraphs, target paragraphs, language) are submitted from the pipeline
+  and get a Future resolved with the extracted terms
+- The jobs run concurrently on an asyncio event loop in a dedicated thread
+- Each backend (Groq, LM-Studio, DuckDuckGo chat) has its own concurrency limit and token rate
+  limit, and LM-Studio falls back to DuckDuckGo chat as in askLLM_term_equivalents
+- The target languages of a document can be extracted with a single multilingual prompt, falling
+  back to one prompt per language for the languages missing from an answer that cannot be parsed
+- With a LLMResponseCache, answers already received for the same request are reused
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .llmcache import make_cache_key
+from .utils import LMSTUDIO_URL, DDGS_MODEL, PROMPT_VERSION, llm_backend_model, build_term_equivalents_prompt, lmstudioLocalAPI, askGroqAPI, parse_term_equivalents, \
+                   build_multilingual_prompt, askGroqAPI_multilingual, parse_multilingual_equivalents
+
+# Default limits of the backends: simultaneous requests and tokens sent per minute (None for no limit)
+DEFAULT_BACKEND_LIMITS = {
+    "groq": {"concurrency": 2, "tokens_per_minute": 12000},
+    "lmstudio": {"concurrency": 1, "tokens_per_minute": None},
+    "ddgs": {"concurrency": 2, "tokens_per_minute": 6000},
+}
+
+
+def estimate_tokens(text) -> int:
+    """Rough number of tokens of a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenRateLimiter:
+    """
+    Token bucket limiting the number of tokens sent per minute to a backend.
+
+    Args:
+        tokens_per_minute (int): Tokens allowed per minute, the bucket holds at most one minute of tokens
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.available = tokens_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        """Wait until the tokens of a request can be sent. Requests larger than the bucket wait for a full bucket."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) / self.rate)
+
+
+class ExtractionQueue:
+    """
+    Queue of term extraction jobs dispatched concurrently to a language model backend.
+    The backend is chosen as in askLLM_term_equivalents: LM-Studio if localLM, else Groq if
+    a token is given, else DuckDuckGo chat.
+
+    Args:
+        localLM (bool): Whether to use the local LM-Studio server (with DuckDuckGo chat as fallback)
+        groqToken (str, optional): Token for accessing the Groq API
+        lmstudioURL (str): Base URL of the local OpenAI-compatible server
+        backend_limits (dict, optional): Limits replacing the defaults of some backends,
+                                         e.g. {"groq": {"concurrency": 4, "tokens_per_minute": 30000}}
+        multilingual (bool): Whether submit_languages asks for all the languages in a single prompt
+        cache (LLMResponseCache, optional): Cache where the answers are looked up and stored
+        bypass_cache (bool): Whether to send the requests even if their answers are in the cache, without storing the new answers
+
+    Example:
+        with ExtractionQueue(groqToken=token) as extraction:
+            future = extraction.submit("climate change", englishParagraphs, spanishParagraphs, "Spanish")
+            ...
+            spanishTerms = future.result()
+
+            future = extraction.submit_languages("climate change", englishParagraphs,
+                                                 {"Spanish": spanishParagraphs, "French": frenchParagraphs})
+            termsByLanguage = future.result()
+    """
+
+    def __init__(self, localLM=False, groqToken=None, lmstudioURL=LMSTUDIO_URL, backend_limits=None, multilingual=True,
+                 cache=None, bypass_cache=False):
+        self.localLM = localLM
+        self.groqToken = groqToken
+        self.lmstudioURL = lmstudioURL
+        self.multilingual = multilingual
+        self.cache = cache
+        self.bypass_cache = bypass_cache
+        self.backend_limits = {backend: dict(limits) for backend, limits in DEFAULT_BACKEND_LIMITS.items()}
+        for backend, limits in (backend_limits or {}).items():
+            self.backend_limits.setdefault(backend, {}).update(limits)
+
+        # The LLM clients are blocking, they run in threads sized to the backend limits
+        max_workers = sum(limits.get("concurrency", 1) for limits in self.backend_limits.values())
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="termseeker-llm")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="termseeker-extraction", daemon=True)
+        self._thread.start()
+        self._semaphores = {}
+        self._limiters = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(cancel=exc_type is not None)
+
+    @property
+    def backend(self) -> str:
+        """Name of the backend used for the jobs."""
+        return llm_backend_model(self.localLM, self.groqToken, self.lmstudioURL)[0]
+
+    # =============================================
+    # Statistics
+    # =============================================
+
+    def reset_stats(self):
+        """Reset all the counters."""
+        with self._lock:
+            self._stats = {"requests": 0, "tokens": 0, "multilingual_requests": 0, "multilingual_failures": 0,
+                           "fallback_requests": 0, "requests_saved": 0, "tokens_saved": 0}
+
+    def _record(self, **counters):
+        with self._lock:
+            for key, value in counters.items():
+                self._stats[key] += value
+
+    def get_stats(self) -> dict:
+        """
+        Get the counters accumulated since the creation of the queue or the last reset.
+
+        Returns:
+            dict: LLM requests sent and their estimated tokens, multilingual requests, multilingual
+                  answers that could not be parsed, per-language requests sent as fallback, and the
+                  requests and estimated tokens saved compared to one request per language
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    # =============================================
+    # Jobs
+    # =============================================
+
+    async def _call(self, backend, tokens, function, *args):
+        """Run a blocking LLM call within the concurrency and token rate limits of a backend."""
+        # Semaphores and limiters are created in the event loop thread
+        if backend not in self._semaphores:
+            limits = self.backend_limits.get(backend, {})
+            self._semaphores[backend] = asyncio.Semaphore(max(1, limits.get("concurrency", 1)))
+            if limits.get("tokens_per_minute"):
+                self._limiters[backend] = TokenRateLimiter(limits["tokens_per_minute"])
+
+        self._record(requests=1, tokens=tokens)
+        async with self._semaphores[backend]:
+            if backend in self._limiters:
+                await self._limiters[backend].acquire(tokens)
+            return await self._loop.run_in_executor(self._executor, function, *args)
+
+    async def _ask_ddgs(self, prompt):
+        from duckduckgo_search import DDGS
+        return await self._call("ddgs", estimate_tokens(prompt), lambda: DDGS().chat(prompt, model=DDGS_MODEL))
+
+    async def _ask(self, key_parts, prompt, groq_tokens, groq_function, *groq_args):
+        """Send a prompt to the backend of the queue (the Groq API gets its own structured request)."""
+        backend, model_name = llm_backend_model(self.localLM, self.groqToken, self.lmstudioURL)
+        if self.cache is not None:
+            response = self.cache.get(make_cache_key(backend, model_name, PROMPT_VERSION, *key_parts), bypass=self.bypass_cache)
+            if response is not None:
+                return response
+
+        try:
+            if backend == "lmstudio":
+                try:
+                    response = await self._call("lmstudio", estimate_tokens(prompt), lmstudioLocalAPI,
+                                                prompt, self.lmstudioURL)
+                except Exception as e:
+                    print(f"Error extracting term equivalents with local inference server: {str(e)}")
+                    print("Falling back to DuckDuckGo search...")
+                    # The answer is cached under the backend that gave it
+                    backend, model_name = "ddgs", DDGS_MODEL
+                    response = await self._ask_ddgs(prompt)
+            elif backend == "groq":
+                response = await self._call("groq", groq_tokens, groq_function, *groq_args)
+            else:
+                response = await self._ask_ddgs(prompt)
+        except Exception as e:
+            response = f"Error extracting term equivalents with {backend}: {str(e)}"
+
+        print(response)
+        # Errors are not cached, so they are retried on the next run
+        if self.cache is not None and response and "Error" not in response:
+            self.cache.put(make_cache_key(backend, model_name, PROMPT_VERSION, *key_parts), response, backend, model_name,
+                           bypass=self.bypass_cache)
+        return response
+
+    async def _extract(self, source_term, source_paragraphs, target_paragraphs, target_language, source_language) -> list:
+        prompt = build_term_equivalents_prompt(source_term, source_paragraphs, target_paragraphs,
+                                               source_language, target_language)
+        # askGroqAPI sends at most 5000 characters of context
+        groq_tokens = estimate_tokens(str(target_paragraphs)[:5000]) + estimate_tokens(source_term) + 500
+        key_parts = (source_term, source_language, source_paragraphs, target_language, target_paragraphs)
+        response = await self._ask(key_parts, prompt, groq_tokens, askGroqAPI, source_term, target_paragraphs,
+                                   target_language, self.groqToken, source_language)
+        return parse_term_equivalents(response)
+
+    async def _extract_languages(self, source_term, source_paragraphs, target_paragraphs_by_lang, source_language) -> dict:
+        languages = list(target_paragraphs_by_lang)
+        equivalents = {}
+
+        if self.multilingual and len(languages) > 1:
+            prompt = build_multilingual_prompt(source_term, source_paragraphs, target_paragraphs_by_lang, source_language)
+            groq_tokens = sum(estimate_tokens(str(paragraphs)[:5000]) for paragraphs in target_paragraphs_by_lang.values())
+            key_parts = (source_term, source_language, source_paragraphs, target_paragraphs_by_lang)
+            response = await self._ask(key_parts, prompt, groq_tokens + estimate_tokens(source_term) + 500,
+                                       askGroqAPI_multilingual, source_term, target_paragraphs_by_lang,
+                                       self.groqToken, source_language)
+            equivalents = parse_multilingual_equivalents(response, languages)
+            self._record(multilingual_requests=1, multilingual_failures=int(len(equivalents) < len(languages)))
+
+            # Savings compared to one prompt per language for the languages answered
+            if equivalents:
+                single_tokens = sum(estimate_tokens(build_term_equivalents_prompt(source_term, source_paragraphs,
+                                                                                  target_paragraphs_by_lang[language],
+                                                                                  source_language, language))
+                                    for language in equivalents)
+                self._record(requests_saved=len(equivalents) - 1,
+                             tokens_saved=max(0, single_tokens - estimate_tokens(prompt)))
+
+        # One prompt per language for the languages missing from the answer
+        missing = [language for language in languages if language not in equivalents]
+        if self.multilingual and len(languages) > 1:
+            self._record(fallback_requests=len(missing))
+        results = await asyncio.gather(*(self._extract(source_term, source_paragraphs, target_paragraphs_by_lang[language],
+                                                       language, source_language)
+                                         for language in missing))
+        equivalents.update(zip(missing, results))
+        return {language: equivalents[language] for language in languages}
+
+    def submit(self, source_term, source_paragraphs, target_paragraphs, target_language, source_language="English"):
+        """
+        Submit a term extraction job.
+
+        Args:
+            source_term (str): The term to find equivalents for
+            source_paragraphs (list): The source paragraphs containing the term
+            target_paragraphs (list): The aligned target language paragraphs
+            target_language (str): Language of the target paragraphs (e.g. "Spanish")
+            source_language (str, optional): Language of the source paragraphs. Defaults to "English".
+
+        Returns:
+            concurrent.futures.Future: Future resolved with the unique equivalent terms (the first one is the main term)
+        """
+        return self._schedule(self._extract(source_term, source_paragraphs, target_paragraphs, target_language,
+                                            source_language))
+
+    def submit_languages(self, source_term, source_paragraphs, target_paragraphs_by_lang, source_language="English"):
+        """
+        Submit a term extraction job for several target languages of the same document.
+        With multilingual set, the languages are asked in a single prompt and only the languages
+        missing from the answer are asked again one by one.
+
+        Args:
+            source_term (str): The term to find equivalents for
+            source_paragraphs (list): The source paragraphs containing the term
+            target_paragraphs_by_lang (dict): Mapping of each target language (e.g. "Spanish") to its aligned paragraphs
+            source_language (str, optional): Language of the source paragraphs. Defaults to "English".
+
+        Returns:
+            concurrent.futures.Future: Future resolved with a mapping of each target language to its unique
+                                       equivalent terms (the first one is the main term)
+        """
+        return self._schedule(self._extract_languages(source_term, source_paragraphs, target_paragraphs_by_lang,
+                                                      source_language))
+
+    def _schedule(self, coroutine):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    async def _cancel_tasks(self):
+        """Cancel the tasks of the event loop and wait for them to finish."""
+        tasks = [task for task in asyncio.all_tasks(self._loop) if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self, cancel=False):
+        """
+        Wait for the submitted jobs, then stop the event loop and the worker threads.
+
+        Args:
+            cancel (bool): Cancel the submitted jobs instead of waiting for them (e.g. after an
+                           interruption). LLM requests already sent are not waited for.
+        """
+        if cancel:
+            # The tasks must finish cancelling before the loop stops, or they are destroyed while pending
+            asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self._loop).result()
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result()
+            except BaseException:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
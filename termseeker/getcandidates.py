@@ -1,32 +1,64 @@
 import os
 import re
-import polars as pl
-from .convert import convert_pdf_to_markdown
-from .searchlibrary import access_un_library_by_term_and_symbol, adv_search_un_library, extract_metadata_UNLib
-from .utils import cleanSymbols, get_un_document_urls, find_paragraphs_with_merge, \
-                        find_similar_paragraph_in_target, askLLM_term_equivalents, getEquivalents_from_response, consolidate_results
+import threading
+import urllib.parse
+from concurrent.futures import Future
+from .prefetch import DocumentPrefetcher
+from .extraction import ExtractionQueue
+from .llmcache import get_llm_cache
+from .journal import get_run_journal
+from .modelserver import get_model_client, forget_model_client, ModelServerError
+from .resultsink import ResultSink
+from .searchlibrary import PAGE_SIZE, search_un_library
+from .utils import cleanSymbols, get_un_document_urls, find_paragraphs_with_merge, encode_paragraphs, \
+                        align_paragraphs_anchored, askLLM_term_equivalents, parse_term_equivalents, consolidate_results
+from .parseddoc import parse_document
+from .paragraphindex import get_paragraph_index
+from .termstore import get_term_store
 from .askTermBases import queryUNTerm, consolidate_UNTermResults, report_missing_translations
 
-from lingua import Language, LanguageDetectorBuilder
-
-# Initialize language detector with all UN languages
-LANGUAGE_MAP = {
-    Language.ENGLISH: "en",
-    Language.FRENCH: "fr", 
-    Language.SPANISH: "es", 
-    Language.CHINESE: "zh", 
-    Language.RUSSIAN: "ru", 
-    Language.ARABIC: "ar", 
-    Language.PORTUGUESE: "pt",
-    Language.SWAHILI: "sw"
+# Languages of the language detector (names of lingua Languages) with their ISO 639-1 codes
+LANGUAGE_CODES = {
+    "ENGLISH": "en",
+    "FRENCH": "fr",
+    "SPANISH": "es",
+    "CHINESE": "zh",
+    "RUSSIAN": "ru",
+    "ARABIC": "ar",
+    "PORTUGUESE": "pt",
+    "SWAHILI": "sw"
 }
 
-# Create a detector instance
-detector = LanguageDetectorBuilder.from_languages(*LANGUAGE_MAP.keys()).build()
+# Multilingual embedding model used to align paragraphs across language versions
+ALIGNMENT_MODEL = 'distiluse-base-multilingual-cased-v2'
+
+# Directory of the markdown cache, the paragraph embeddings are cached next to it
+CACHE_DIR = "/content"
+
+# Global variable to store the language detector, built on first use
+detector = None
+_detector_lock = threading.Lock()
+
+def get_language_detector():
+    """
+    Get the Lingua language detector of the UN languages (see LANGUAGE_CODES).
+    It is built on first use, as building it takes time and memory.
+
+    Returns:
+        LanguageDetector: The shared detector
+    """
+    global detector
+    with _detector_lock:
+        if detector is None:
+            from lingua import Language, LanguageDetectorBuilder
+            languages = [getattr(Language, name) for name in LANGUAGE_CODES]
+            detector = LanguageDetectorBuilder.from_languages(*languages).build()
+        return detector
 
 def detect_language(text):
     """
     Detects the language of the given text using lingua language detector.
+    The detector of the model server is used if the server is running (see modelserver).
     
     Args:
         text (str): Text to detect language of
@@ -39,12 +71,20 @@ def detect_language(text):
         if not text or len(text.strip()) < 20:
             return "unknown"
             
+        client = get_model_client()
+        if client is not None:
+            try:
+                return client.detect([text])[0]
+            except ModelServerError as e:
+                print(f"Model server failed, building the language detector locally: {e}")
+                forget_model_client()
+
         # Detect language
-        detected_language = detector.detect_language_of(text)
+        detected_language = get_language_detector().detect_language_of(text)
         
         # Return the ISO code if detected, otherwise "unknown"
         if detected_language:
-            return LANGUAGE_MAP.get(detected_language, "unknown")
+            return LANGUAGE_CODES.get(detected_language.name, "unknown")
         return "unknown"
     except Exception as e:
         print(f"Language detection failed: {e}")
@@ -56,9 +96,267 @@ def sanitize_filename(filename):
     return sanitized
 
 
-def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQuantity, paragraphsPerDoc, eraseDrafts, localLM=False, groqToken=None):
+UNEP_LANGUAGES = {"English": "en", "French": "fr", "Spanish": "es", "Chinese": "zh", "Russian": "ru", "Arabic": "ar", "Portuguese": "pt", "Swahili": "sw"}
+# Reverse mapping for language code to name
+LANG_CODES_TO_NAME = {v: k for k, v in UNEP_LANGUAGES.items()}
+
+
+def standardize_languages(input_lang):
+    """
+    Convert the input languages to a list of language names.
+
+    Args:
+        input_lang (str or list): A language name, a list of language names, or "ALL"
+
+    Returns:
+        list: The list of language names
+    """
+    if input_lang == "ALL":
+        input_lang = list(UNEP_LANGUAGES.keys())
+    if isinstance(input_lang, str) and input_lang in list(UNEP_LANGUAGES.keys()):
+        input_lang = [input_lang]
+    return input_lang
+
+
+def search_library_metadata(input_search_text, input_filterSymbols, eraseDrafts, max_docs_to_fetch, page=1):
+    """
+    Search the UN Digital Library for a term and return the cleaned metadata of the documents found.
+    Searches are cached, so the same term and symbols are only searched once (see search_un_library).
+
+    Args:
+        input_search_text (str): The search term
+        input_filterSymbols (list): Document symbols to filter the search. If empty, a general term search is performed.
+        eraseDrafts (bool): Whether to exclude draft documents from the results
+        max_docs_to_fetch (int): Maximum number of documents to keep
+        page (int, optional): The page of search results, starting at 1. Defaults to 1.
+
+    Returns:
+        list: Metadata dictionaries of the documents, with missing keys initialized with None
+    """
+    # Initialize a list to collect all metadata
+    all_metadata = None
+
+    # Verify that all input languages are in UNEP_Languages
+    if isinstance(input_filterSymbols, list):
+
+        # A single symbol is searched by term and symbol, several symbols with an advanced search
+        if len(input_filterSymbols) > 0:
+            all_metadata = search_un_library(input_search_text, input_filterSymbols, page)
+
+        if len(input_filterSymbols) == 0 or all_metadata is None:
+            print("General term search without filters...")
+            all_metadata = search_un_library(input_search_text, "", page)
+
+    # First, fetch all potential metadata from the UN Library search
+    if all_metadata:
+        print(f"Found {len(all_metadata)} potential documents")
+
+    # Only clean the symbols, but don't limit yet (set a high maxResults)
+    if all_metadata:
+        metadataCleaned = cleanSymbols(all_metadata, removeDrafts=eraseDrafts, maxResults=max_docs_to_fetch)
+        print(f"After cleaning, {len(metadataCleaned)} documents remain for processing")
+    else:
+        metadataCleaned = []
+
+    # Initialize missing keys with None
+    if metadataCleaned:
+        all_keys = set().union(*(d.keys() for d in metadataCleaned))
+        for resultItem in metadataCleaned:
+            for key in all_keys:
+                resultItem.setdefault(key, None)
+
+    return metadataCleaned
+
+
+def select_target_paragraphs(alignments, target_doc, target_lang_code, paragraphsPerDoc):
+    """
+    Select the aligned target paragraphs that are written in the target language.
+
+    Args:
+        alignments (list): Output of align_paragraphs_anchored, one list of (segment index, score) per English paragraph
+        target_doc (ParsedDocument): The parsed target document, which keeps the detected languages of its segments
+        target_lang_code (str): ISO 639-1 code of the target language
+        paragraphsPerDoc (int): Maximum number of paragraphs to select
+
+    Returns:
+        list: The selected target paragraphs, at most one per English paragraph
+    """
+    # Try to find matching paragraphs for each English paragraph
+    new_target_paragraphs = []
+
+    for similar_paragraphs in alignments:
+        if len(new_target_paragraphs) >= paragraphsPerDoc:
+            break
+
+        for segment_index, score in similar_paragraphs:
+            detected_lang = target_doc.segment_language(segment_index, detect_language)
+            # Check if paragraph is in the target language
+            if detected_lang == target_lang_code:
+                new_target_paragraphs.append(target_doc.segment_texts[segment_index])
+                break
+
+    return new_target_paragraphs
+
+
+def index_target_document(target_doc, docSymbol, targetLang):
+    """
+    Add the segments of an aligned target document to the paragraph index of its language
+    (see paragraphindex), if the alignment embedded the whole document. Documents aligned only
+    around their numbered paragraph anchors are not embedded again for the index, they are
+    added by index_markdown_cache. A failure is reported without interrupting the run.
+    """
+    try:
+        get_paragraph_index(CACHE_DIR, targetLang, ALIGNMENT_MODEL).add_parsed_document(
+            target_doc, f"{sanitize_filename(docSymbol)}_{targetLang}", docSymbol, CACHE_DIR, cached_only=True)
+    except Exception as e:
+        print(f"\t\tgetcandidates.py -> could not index {docSymbol} ({targetLang}): {type(e).__name__}: {e}")
+
+
+def extract_target_terms(input_search_text, englishParasToUse, new_target_paragraphs, targetLang, localLM=False, groqToken=None,
+                         llmCache=None) -> list:
+    """
+    Extract the target language equivalents of a term from aligned paragraphs with a language model.
+
+    Args:
+        input_search_text (str): The English term
+        englishParasToUse (list): English paragraphs containing the term
+        new_target_paragraphs (list): Aligned target language paragraphs
+        targetLang (str): Target language name (e.g. "Spanish")
+        localLM (bool, optional): If True, uses a local language model. If None, no extraction is done. Defaults to False.
+        groqToken (str, optional): Token for accessing the Groq API. Defaults to None.
+        llmCache (LLMResponseCache, optional): Cache of the LLM answers. Defaults to None.
+
+    Returns:
+        list: Unique equivalent terms (the first one is the main term), or an empty list
+    """
+    if localLM == None:
+        return []
+
+    targetTerms = askLLM_term_equivalents(input_search_text, englishParasToUse,
+                                          new_target_paragraphs, "English",
+                                          targetLang,
+                                          localLM, groqToken, llmCache=llmCache)
+    print(targetTerms)
+
+    return parse_term_equivalents(targetTerms)
+
+
+def collect_target_terms(pending_extractions, sink=None, wait=True) -> list:
+    """
+    Store the terms of the term extraction jobs of a search in their result items, in order.
+
+    Args:
+        pending_extractions (list): (resultItem, Future of ExtractionQueue.submit_languages or None) tuples
+        sink (ResultSink, optional): Sink where each result item is written once its terms are stored
+        wait (bool): Whether to wait for all the jobs, or to stop at the first job still running
+
+    Returns:
+        list: The tuples of the jobs not collected yet (empty if wait is True)
+    """
+    pending_extractions = list(pending_extractions)
+    while pending_extractions and (wait or pending_extractions[0][1] is None or pending_extractions[0][1].done()):
+        resultItem, future = pending_extractions.pop(0)
+        if future is not None:
+            try:
+                terms_by_lang = future.result()
+            except Exception as e:
+                print(f"Error extracting terms for {resultItem['docSymbol']}: {e}")
+                terms_by_lang = {}
+            for targetLang, targetTerms in terms_by_lang.items():
+                if targetTerms:
+                    # Save the targetTerm in metadata w/ its related
+                    resultItem[targetLang + 'Term'] = targetTerms[0]
+                    resultItem[targetLang + 'Synonyms'] = targetTerms[1:]
+        if sink is not None:
+            sink.write(resultItem)
+    return pending_extractions
+
+
+def report_extraction_stats(extraction):
+    """Print the LLM requests sent by an extraction queue and those saved by multilingual prompts."""
+    stats = extraction.get_stats()
+    print(f"LLM requests: {stats['requests']} (~{stats['tokens']} tokens), "
+          f"{stats['multilingual_requests']} multilingual with {stats['multilingual_failures']} incomplete answers "
+          f"and {stats['fallback_requests']} per-language fallbacks")
+    print(f"Saved by multilingual prompts: {stats['requests_saved']} requests, ~{stats['tokens_saved']} tokens")
+    if extraction.cache is not None and not extraction.bypass_cache:
+        cache_stats = extraction.cache.get_stats()
+        print(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries")
+
+
+def run_stage(journal, stage, compute, term, document="", language=""):
+    """Run a stage of getCandidates through the run journal (see RunJournal.step), or directly without journal."""
+    if journal is None:
+        return compute()
+    return journal.step(stage, compute, term, document, language)
+
+
+def journal_document_stages(journal, term):
+    """
+    Get an on_stage function for DocumentPrefetcher recording the downloads and markdown
+    conversions of the documents of a term in a run journal.
+    """
+    def on_stage(stage, url, file_name):
+        docSymbol = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get("DS", [""])[0]
+        docURLs = get_un_document_urls(docSymbol)
+        language = next((lang for lang, lang_url in docURLs.items() if lang_url == url), "")
+        journal.record(stage, term, docSymbol, language)
+    return on_stage
+
+
+def submit_extraction(extraction, journal, input_search_text, docSymbol, englishParasToUse, target_paragraphs_by_lang) -> Future:
+    """
+    Queue the extraction of the terms of a document, unless the run journal already has them.
+    The extracted terms are recorded in the journal once at least one language got terms.
+
+    Returns:
+        Future: Resolved with the terms by language (see ExtractionQueue.submit_languages)
+    """
+    if journal is not None:
+        completed, terms_by_lang = journal.lookup("extraction", input_search_text, docSymbol)
+        if completed:
+            future = Future()
+            future.set_result(terms_by_lang)
+            return future
+
+    future = extraction.submit_languages(input_search_text, englishParasToUse, target_paragraphs_by_lang)
+    if journal is not None:
+        def record(done):
+            if not done.cancelled() and done.exception() is None and any(done.result().values()):
+                journal.record("extraction", input_search_text, docSymbol, result=done.result())
+        future.add_done_callback(record)
+    return future
+
+
+def prefetch_document_versions(prefetcher, metadata_items, input_lang, journal=None, input_search_text=None):
+    """
+    Schedule the download and conversion of the English and target language versions of documents.
+
+    Args:
+        prefetcher (DocumentPrefetcher): The prefetcher downloading and converting the documents
+        metadata_items (list): Metadata dictionaries of the documents to prefetch (with docSymbol)
+        input_lang (list): Target languages
+        journal (RunJournal, optional): Journal of the run. Versions whose paragraphs are journaled are not needed.
+        input_search_text (str, optional): The search term, required with a journal
+    """
+    def needed(stage, docSymbol, lang):
+        return journal is None or not journal.is_completed(stage, input_search_text, docSymbol, lang)
+
+    for item in metadata_items:
+        docURLs = get_un_document_urls(item["docSymbol"])
+        sanitized_docSymbol = sanitize_filename(item["docSymbol"])
+        if needed("paragraphs", item["docSymbol"], "English"):
+            prefetcher.prefetch(docURLs["English"])
+        for lang in input_lang:
+            if lang != "English" and lang in docURLs and needed("alignment", item["docSymbol"], lang):
+                prefetcher.prefetch(docURLs[lang], f"{sanitized_docSymbol}_{lang}.txt")
+
+
+def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQuantity, paragraphsPerDoc, eraseDrafts, localLM=False, groqToken=None,
+                  prefetchDocs=2, maxDownloadsPerHost=3, multilingualPrompt=True, bypassLLMCache=False, output_path=None,
+                  run_id=None, maxSearchPages=3):
     """
-    getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQuantity, paragraphsPerDoc, eraseDrafts, localLM=False, groqToken=None)
+    getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQuantity, paragraphsPerDoc, eraseDrafts, localLM=False, groqToken=None, prefetchDocs=2, maxDownloadsPerHost=3, multilingualPrompt=True, bypassLLMCache=False, output_path=None, run_id=None, maxSearchPages=3)
     Fetches and processes candidate documents and paragraphs from the UN Library based on the input search text, language, and other parameters.
     Parameters:
         input_search_text (str): The search term to look for in the documents.
@@ -69,6 +367,13 @@ def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQua
         eraseDrafts (bool): Whether to exclude draft documents from the results.
         localLM (bool, optional): If True, uses a local language model for processing. If False, uses a remote language model. Defaults to False.
         groqToken (str, optional): Token for accessing the remote language model, if applicable. Defaults to None.
+        prefetchDocs (int, optional): Number of upcoming documents whose language versions are downloaded and converted in the background while the current document is aligned. Defaults to 2.
+        maxDownloadsPerHost (int, optional): Maximum number of simultaneous downloads from the same host. Defaults to 3.
+        multilingualPrompt (bool, optional): Whether the terms of all the target languages of a document are extracted with a single LLM request, with per-language requests only for the languages missing from the answer. Defaults to True.
+        bypassLLMCache (bool, optional): Whether to send the LLM requests even if their answers are in the LLM response cache, without storing the new answers. Defaults to False.
+        output_path (str, optional): JSON Lines file where each result is written as soon as it is complete (see ResultSink). If the file already has results for the search text, their documents are not processed again. Defaults to None.
+        run_id (str, optional): ID of the run in the run journal (see RunJournal). The library search, matched paragraphs, alignments and extracted terms are recorded as they complete, and a run restarted with the same ID reads them instead of computing them again. Defaults to None.
+        maxSearchPages (int, optional): Maximum number of pages of library search results. The next page is only fetched when the documents of the previous pages run out before enough paragraphs are found. Defaults to 3.
     Returns:
         list: A list of processed results, where each result is a dictionary containing metadata and extracted paragraphs for the specified languages. Returns an empty list if no results are found.
     Notes:
@@ -77,10 +382,6 @@ def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQua
         - If Polars is available, the processed results are converted into a Polars DataFrame for easier handling.
         - Logs warnings if the required number of paragraphs for all languages is not met.
     """
-    UNEP_LANGUAGES = {"English": "en", "French": "fr", "Spanish": "es", "Chinese": "zh", "Russian": "ru", "Arabic": "ar", "Portuguese": "pt", "Swahili": "sw"}
-    # Reverse mapping for language code to name
-    LANG_CODES_TO_NAME = {v: k for k, v in UNEP_LANGUAGES.items()}
-
     # Initialize a variable to track if we need more documents
     need_more_docs = True
     max_docs_to_fetch = max(10, sourcesQuantity * 3)  # Fetch more documents than requested initially
@@ -88,55 +389,36 @@ def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQua
     processed_docs = 0
     
     # Standardize languages
-    if input_lang == "ALL":
-        input_lang = list(UNEP_LANGUAGES.keys())
-    if isinstance(input_lang, str) and input_lang in list(UNEP_LANGUAGES.keys()):
-        input_lang = [input_lang]
+    input_lang = standardize_languages(input_lang)
 
-    # Verify that all input languages are in UNEP_Languages
-    if isinstance(input_filterSymbols, list):
-        html_output = None
-
-        if len(input_filterSymbols) == 1:
-            html_output = access_un_library_by_term_and_symbol(
-                input_search_text,
-                input_filterSymbols[0]
-            )
-        elif len(input_filterSymbols) > 1:
-            html_output = adv_search_un_library(
-                document_symbol=input_filterSymbols,
-                fulltext_term=input_search_text
-            )
-
-        if len(input_filterSymbols) == 0 or html_output is None:
-            print("General term search without filters...")
-            html_output = access_un_library_by_term_and_symbol(
-                input_search_text,
-                ""
-            )
+    # Resume the stages completed by an interrupted run with the same ID
+    journal = get_run_journal(CACHE_DIR, run_id) if run_id else None
 
-    # Initialize a list to collect all metadata
-    all_metadata = []
-    
-    # First, fetch all potential metadata from the UN Library search
-    if html_output:
-        # Extract all metadata without limiting initially
-        all_metadata = extract_metadata_UNLib(html_output)
-        print(f"Found {len(all_metadata)} potential documents")
+    def search_page(page):
+        # All the usable documents of the page are kept, they are taken max_docs_to_fetch at a time
+        return run_stage(journal, "metadata",
+                         lambda: search_library_metadata(input_search_text, input_filterSymbols, eraseDrafts, PAGE_SIZE, page) or None,
+                         input_search_text, "" if page == 1 else f"page {page}") or []
 
-    # Only clean the symbols, but don't limit yet (set a high maxResults)
-    if all_metadata:
-        metadataCleaned = cleanSymbols(all_metadata, removeDrafts=eraseDrafts, maxResults=max_docs_to_fetch)
-        print(f"After cleaning, {len(metadataCleaned)} documents remain for processing")
-    else:
-        metadataCleaned = []
+    # Documents of the search pages fetched so far that are not in metadataCleaned yet
+    remaining_docs = []
+    searched_pages = 0
 
-    # Initialize missing keys with None
-    if metadataCleaned:
-        all_keys = set().union(*(d.keys() for d in metadataCleaned))
-        for resultItem in metadataCleaned:
-            for key in all_keys:
-                resultItem.setdefault(key, None)
+    def next_documents():
+        """The next documents to process: the rest of the last page fetched, else the documents of the next pages."""
+        nonlocal searched_pages
+        while not remaining_docs and searched_pages < maxSearchPages:
+            searched_pages += 1
+            known_docs = {item["docSymbol"] for item in metadataCleaned}
+            new_docs = [item for item in search_page(searched_pages) if item["docSymbol"] not in known_docs]
+            print(f"Fetched page {searched_pages} of the search results: {len(new_docs)} new documents")
+            remaining_docs.extend(new_docs)
+        documents = remaining_docs[:max_docs_to_fetch]
+        del remaining_docs[:max_docs_to_fetch]
+        return documents
+
+    metadataCleaned = []
+    metadataCleaned.extend(next_documents())
 
     # Initialize a dictionary to track paragraphs found for each language
     lang_paragraphs = {lang: [] for lang in input_lang if lang != "English"}
@@ -146,175 +428,214 @@ def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQua
     
     # Initialize a list to store processed results
     processed_results = []
+
+    # Resume from the results already written by a previous run
+    sink = None
+    stored_docs = set()
+    if output_path:
+        sink = ResultSink(output_path)
+        for resultItem in sink.records(input_search_text):
+            processed_results.append(resultItem)
+            stored_docs.add(resultItem["docSymbol"])
+            for lang in lang_paragraphs:
+                lang_paragraphs[lang].extend(resultItem.get(lang + 'Paragraphs', []))
+        if stored_docs:
+            print(f"Resuming with {len(stored_docs)} documents already processed in {output_path}")
     
-    # Process each document until we have enough paragraphs for all languages
-    # or until we've processed the specified number of documents
-    for i, resultItem in enumerate(metadataCleaned):
-        # Check if we've processed enough documents and have paragraphs for all languages
-        if processed_docs >= sourcesQuantity:
-            all_languages_have_paragraphs = all(len(paras) >= paragraphsPerDoc for lang, paras in lang_paragraphs.items())
-            if all_languages_have_paragraphs:
-                print(f"Processed {processed_docs} documents and found at least {paragraphsPerDoc} paragraphs for all languages")
-                break
+    # Download and convert the language versions of upcoming documents in the background
+    prefetcher = DocumentPrefetcher(CACHE_DIR, max_per_host=maxDownloadsPerHost,
+                                    on_stage=journal_document_stages(journal, input_search_text) if journal else None)
+
+    # Extract the target terms in the background while the next documents are processed
+    extraction = None
+    if localLM is not None:
+        extraction = ExtractionQueue(localLM, groqToken, multilingual=multilingualPrompt,
+                                     cache=get_llm_cache(CACHE_DIR), bypass_cache=bypassLLMCache)
+    pending_extractions = []
+
+    # The pools, the event loop thread and the sink file are released even if the run is interrupted
+    completed = False
+    try:
+        # Process each document until we have enough paragraphs for all languages
+        # or until we've processed the specified number of documents
+        for i, resultItem in enumerate(metadataCleaned):
+            # Check if we've processed enough documents and have paragraphs for all languages
+            if processed_docs >= sourcesQuantity:
+                all_languages_have_paragraphs = all(len(paras) >= paragraphsPerDoc for lang, paras in lang_paragraphs.items())
+                if all_languages_have_paragraphs:
+                    print(f"Processed {processed_docs} documents and found at least {paragraphsPerDoc} paragraphs for all languages")
+                    break
+
+            # Take the next documents of the search results when the documents taken so far run out.
+            # The loop goes on with the documents appended to the list.
+            if i == len(metadataCleaned) - 1:
+                metadataCleaned.extend(next_documents())
                 
-        # Track that we're processing this document
-        processed_docs += 1
-        print(f"Processing document {processed_docs}/{len(metadataCleaned)}: {resultItem.get('docSymbol', 'Unknown')}")
+            # Documents written by a previous run count as processed
+            if resultItem.get('docSymbol') in stored_docs:
+                processed_docs += 1
+                continue
+
+            # Prefetch this document and the next ones while this one is processed
+            prefetch_document_versions(prefetcher, metadataCleaned[i:i + prefetchDocs + 1], input_lang,
+                                       journal, input_search_text)
+
+            # Track that we're processing this document
+            processed_docs += 1
+            print(f"Processing document {processed_docs}/{len(metadataCleaned)}: {resultItem.get('docSymbol', 'Unknown')}")
         
-        resultItem["EnglishTerm"] = input_search_text
-        resultItem["docURLs"] = get_un_document_urls(resultItem["docSymbol"])  # dict
-
-        # Process files
-        print(f"Processing files for {resultItem['docURLs']['English']}...")
-        englishMD = convert_pdf_to_markdown(resultItem["docURLs"]["English"], "/content")
-        print("Finding paragraphs...")
-        # Get all matching paragraphs
-        all_english_paragraphs = find_paragraphs_with_merge(englishMD, input_search_text, max_paragraphs=None)
+            resultItem["EnglishTerm"] = input_search_text
+            resultItem["docURLs"] = get_un_document_urls(resultItem["docSymbol"])  # dict
+
+            def match_english_paragraphs():
+                # Process files
+                print(f"Processing files for {resultItem['docURLs']['English']}...")
+                englishMD = prefetcher.get(resultItem["docURLs"]["English"])
+                if not englishMD:
+                    # Not journaled, the download is retried when the run is resumed
+                    return None
+                print("Finding paragraphs...")
+                # Get all matching paragraphs
+                return find_paragraphs_with_merge(englishMD, input_search_text, max_paragraphs=None, cache_dir=CACHE_DIR) or []
+
+            all_english_paragraphs = run_stage(journal, "paragraphs", match_english_paragraphs,
+                                               input_search_text, resultItem['docSymbol'], "English")
         
-        if not all_english_paragraphs:
-            print(f"No English paragraphs found in document {resultItem['docSymbol']}, skipping...")
-            continue
+            if not all_english_paragraphs:
+                print(f"No English paragraphs found in document {resultItem['docSymbol']}, skipping...")
+                continue
         
-        # Store all English paragraphs for this document
-        doc_english_paragraphs[resultItem['docSymbol']] = all_english_paragraphs
+            # Store all English paragraphs for this document
+            doc_english_paragraphs[resultItem['docSymbol']] = all_english_paragraphs
         
-        # Only use the specified number for initial processing
-        englishParagraphs = all_english_paragraphs[:paragraphsPerDoc]
-        resultItem["EnglishParagraphs"] = englishParagraphs  # list
+            # Only use the specified number for initial processing
+            englishParagraphs = all_english_paragraphs[:paragraphsPerDoc]
+            resultItem["EnglishParagraphs"] = englishParagraphs  # list
         
-        # Only add to processed results if we found English paragraphs
-        found_target_paragraphs = False
+            # Only add to processed results if we found English paragraphs
+            found_target_paragraphs = False
+
+            # English embeddings and the parsed English document are computed once per document and shared by all target languages
+            english_embeddings = {}
+            english_documents = {}
+
+            # Aligned paragraphs of each language, sent together to the term extraction
+            target_paragraphs_by_lang = {}
         
-        # Get the list of languages that still need paragraphs
-        languages_to_process = [lang for lang in input_lang if lang != "English" and len(lang_paragraphs[lang]) < paragraphsPerDoc]
+            # Get the list of languages that still need paragraphs
+            languages_to_process = [lang for lang in input_lang if lang != "English" and len(lang_paragraphs[lang]) < paragraphsPerDoc]
         
-        # If we already have paragraphs for all languages, we can stop
-        if not languages_to_process:
-            print("Already found enough paragraphs for all languages")
-            break
+            # If we already have paragraphs for all languages, we can stop
+            if not languages_to_process:
+                print("Already found enough paragraphs for all languages")
+                break
             
-        print(f"Need to find paragraphs for: {', '.join(languages_to_process)}")
+            print(f"Need to find paragraphs for: {', '.join(languages_to_process)}")
 
-        # For each language that still needs more paragraphs
-        for targetLang in languages_to_process:
-            print(f"Processing language: {targetLang}")
-            target_lang_code = UNEP_LANGUAGES.get(targetLang, "")
+            # For each language that still needs more paragraphs
+            for targetLang in languages_to_process:
+                print(f"Processing language: {targetLang}")
+                target_lang_code = UNEP_LANGUAGES.get(targetLang, "")
             
-            try:
-                
-                sanitized_docSymbol = sanitize_filename(resultItem['docSymbol'])
-                output_file_path = os.path.join(f"{sanitized_docSymbol}_{targetLang}.txt")
-                langMD = convert_pdf_to_markdown(resultItem["docURLs"][targetLang], "/content", output_file_path)
-            
-                # Try to find matching paragraphs for each English paragraph
-                processed_eng_paragraphs = []
-                new_target_paragraphs = []
-                
-                for engPara in englishParagraphs:
-                    if len(new_target_paragraphs) >= paragraphsPerDoc:
-                        break
-                        
-                    processed_eng_paragraphs.append(engPara)
-                    # Get top 3 similar paragraphs to have alternatives
-                    similar_paragraphs = find_similar_paragraph_in_target(engPara, langMD, 
-                                                                        model_name='distiluse-base-multilingual-cased-v2', 
-                                                                        top_k=2)
-                    
-                    if similar_paragraphs:
-                        found_target_lang_para = False
-                        
-                        for para in similar_paragraphs:
-                            detected_lang = detect_language(para[0])
-                            # Check if paragraph is in the target language
-                            if detected_lang == target_lang_code:
-                                new_target_paragraphs.append(para[0])
-                                found_target_lang_para = True
-                                break
-                                
-                            
-                
-                # If we don't have enough target paragraphs, try with additional English paragraphs
-                if len(new_target_paragraphs) < paragraphsPerDoc and len(all_english_paragraphs) > len(processed_eng_paragraphs):
-                    remaining_eng_paragraphs = [p for p in all_english_paragraphs if p not in processed_eng_paragraphs]
-                    
-                    for engPara in remaining_eng_paragraphs:
-                        if len(new_target_paragraphs) >= paragraphsPerDoc:
-                            break
-                            
-                        similar_paragraphs = find_similar_paragraph_in_target(engPara, langMD, 
-                                                                            model_name='distiluse-base-multilingual-cased-v2', 
-                                                                            top_k=2)
-                        
-                        if similar_paragraphs:
-                            for para in similar_paragraphs:
-                                detected_lang = detect_language(para[0])
-                                if detected_lang == target_lang_code:
-                                    new_target_paragraphs.append(para[0])
-                                    break
-                            
-                            if len(new_target_paragraphs) >= paragraphsPerDoc:
-                                break
+                def align_target_paragraphs():
+                    sanitized_docSymbol = sanitize_filename(resultItem['docSymbol'])
+                    output_file_path = os.path.join(f"{sanitized_docSymbol}_{targetLang}.txt")
+                    langMD = prefetcher.get(resultItem["docURLs"][targetLang], output_file_path)
+                    if not langMD:
+                        # Not journaled, the download is retried when the run is resumed
+                        return None
+
+                    # Align all English paragraphs against the target document at once,
+                    # so the target document is segmented and embedded a single time
+                    if "English" not in english_embeddings:
+                        english_embeddings["English"] = encode_paragraphs(all_english_paragraphs, ALIGNMENT_MODEL,
+                                                                          CACHE_DIR, f"{sanitized_docSymbol}_English")
+                    # The English document gives the structural anchors of the paragraphs (already in the markdown cache)
+                    if "English" not in english_documents:
+                        englishMD = prefetcher.get(resultItem["docURLs"]["English"])
+                        english_documents["English"] = parse_document(englishMD, CACHE_DIR) if englishMD else None
+                    # Get top 2 similar paragraphs to have alternatives, near the numbered paragraph anchors
+                    target_doc = parse_document(langMD, CACHE_DIR)
+                    alignments = align_paragraphs_anchored(all_english_paragraphs, target_doc,
+                                                           model_name=ALIGNMENT_MODEL,
+                                                           top_k=2,
+                                                           source_embeddings=english_embeddings["English"],
+                                                           cache_dir=CACHE_DIR,
+                                                           doc_key=f"{sanitized_docSymbol}_{targetLang}",
+                                                           source_doc=english_documents["English"])
+                    index_target_document(target_doc, resultItem['docSymbol'], targetLang)
+
+                    # Keep the best aligned paragraph in the target language for each English paragraph
+                    return select_target_paragraphs(alignments, target_doc, target_lang_code, paragraphsPerDoc)
+
+                try:
+                    new_target_paragraphs = run_stage(journal, "alignment", align_target_paragraphs,
+                                                      input_search_text, resultItem['docSymbol'], targetLang)
                 
-                # Add the new target paragraphs to our collection for this language
-                if new_target_paragraphs:
-                    found_target_paragraphs = True
-                    lang_paragraphs[targetLang].extend(new_target_paragraphs)
-                    print(f"Found {len(new_target_paragraphs)} new paragraphs for {targetLang}, total now: {len(lang_paragraphs[targetLang])}")
+                    # Add the new target paragraphs to our collection for this language
+                    if new_target_paragraphs:
+                        found_target_paragraphs = True
+                        lang_paragraphs[targetLang].extend(new_target_paragraphs)
+                        print(f"Found {len(new_target_paragraphs)} new paragraphs for {targetLang}, total now: {len(lang_paragraphs[targetLang])}")
                     
-                    # Store target paragraphs in resultItem
-                    tParaColName = targetLang + 'Paragraphs'
-                    resultItem[tParaColName] = new_target_paragraphs
+                        # Store target paragraphs in resultItem
+                        tParaColName = targetLang + 'Paragraphs'
+                        resultItem[tParaColName] = new_target_paragraphs
                     
-                    # Initialize targetTerm and targetSynonyms if we found paragraphs
-                    targetTermColName = targetLang + 'Term'
-                    targetSynonymsColName = targetLang + 'Synonyms'
-                    resultItem[targetTermColName] = None
-                    resultItem[targetSynonymsColName] = None
+                        # Initialize targetTerm and targetSynonyms if we found paragraphs
+                        targetTermColName = targetLang + 'Term'
+                        targetSynonymsColName = targetLang + 'Synonyms'
+                        resultItem[targetTermColName] = None
+                        resultItem[targetSynonymsColName] = None
                     
-                    # Extract bilingual terms as LLM string answer
-                    englishParasToUse = englishParagraphs[:len(new_target_paragraphs)]
-
-                    if localLM == None:
-                        targetTerms = []
-                    
-                    elif localLM == False or localLM==True:
-                        # Use only as many English paragraphs as we have target paragraphs
-                        
-                        targetTerms = askLLM_term_equivalents(input_search_text, englishParasToUse,
-                                                              new_target_paragraphs, "English",
-                                                              targetLang,
-                                                              localLM, groqToken)
-                        print(targetTerms)
-
-                        if "Error" in targetTerms:
-                            print(f"Error in LLM response: {targetTerms['Error']}")
-                            targetTerms = []
-                        elif targetTerms:
-                            targetTerms = getEquivalents_from_response(targetTerms)  # list of str
-                        
-                            # Unique values of list
-                            targetTerms = list(set(targetTerms))
-
-                            # Save the targetTerm in metadata w/ its related
-                            resultItem[targetTermColName] = targetTerms[0]
-                            resultItem[targetSynonymsColName] = targetTerms[1:]
-                else:
-                    print(f"No target paragraphs found for {targetLang} in document {resultItem['docSymbol']}")
+                        target_paragraphs_by_lang[targetLang] = new_target_paragraphs
+                    else:
+                        print(f"No target paragraphs found for {targetLang} in document {resultItem['docSymbol']}")
             
-            except Exception as e:
-                print(f"Error processing {targetLang} document for {resultItem['docSymbol']}: {e}")
+                except Exception as e:
+                    print(f"Error processing {targetLang} document for {resultItem['docSymbol']}: {e}")
         
-        # If we found any target paragraphs in this document, add it to our results
-        if found_target_paragraphs:
-            processed_results.append(resultItem)
+            # If we found any target paragraphs in this document, add it to our results
+            if found_target_paragraphs:
+                processed_results.append(resultItem)
+
+                # Queue the extraction of the terms of all languages, collected after the last document.
+                # Use only as many English paragraphs as we have target paragraphs
+                future = None
+                if extraction is not None:
+                    englishParasToUse = englishParagraphs[:max(len(paras) for paras in target_paragraphs_by_lang.values())]
+                    future = submit_extraction(extraction, journal, input_search_text, resultItem['docSymbol'],
+                                               englishParasToUse, target_paragraphs_by_lang)
+                pending_extractions.append((resultItem, future))
+
+                # Write the results whose terms are already extracted
+                if sink is not None:
+                    pending_extractions = collect_target_terms(pending_extractions, sink, wait=False)
             
-            # If we have enough results and found at least the required number of paragraphs for each language
-            if len(processed_results) >= sourcesQuantity:
-                all_languages_have_paragraphs = all(len(paras) >= paragraphsPerDoc for lang, paras in lang_paragraphs.items())
-                if all_languages_have_paragraphs:
-                    print(f"Found at least {paragraphsPerDoc} paragraphs for all languages after processing {processed_docs} documents")
-                    break
+                # If we have enough results and found at least the required number of paragraphs for each language
+                if len(processed_results) >= sourcesQuantity:
+                    all_languages_have_paragraphs = all(len(paras) >= paragraphsPerDoc for lang, paras in lang_paragraphs.items())
+                    if all_languages_have_paragraphs:
+                        print(f"Found at least {paragraphsPerDoc} paragraphs for all languages after processing {processed_docs} documents")
+                        break
     
+        # Stop the downloads of documents that are no longer needed
+        prefetcher.close()
+
+        # Wait for the term extractions still running
+        collect_target_terms(pending_extractions, sink)
+        completed = True
+    finally:
+        prefetcher.close()
+        if extraction is not None:
+            # Extractions still queued are cancelled after an error or an interruption
+            extraction.close(cancel=not completed)
+            report_extraction_stats(extraction)
+        if sink is not None:
+            sink.close()
+    if journal is not None:
+        journal.report()
+
     # Log the language paragraph counts
     print("\n--- Language paragraph counts ---")
     for lang, paras in lang_paragraphs.items():
@@ -331,6 +652,7 @@ def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQua
             
         # Create Polars dataframe with the successfully processed results
         try:
+            import polars as pl
             df = pl.DataFrame(processed_results, strict=False)
             print(df)
         except Exception as e:
@@ -342,7 +664,8 @@ def getCandidates(input_search_text, input_lang, input_filterSymbols, sourcesQua
 # This function is not working yet, but it is a placeholder for wrapping the getCandidates function
 # and adding the UNTERM query functionality.
 def getTermsAndCandidates(input_search_text, lang_to_search="ALL", input_filterSymbols=["UNEP", "FCCC", "S"], 
-                          sourcesQuantity=3, paragraphsPerDoc=2, eraseDrafts=True):
+                          sourcesQuantity=3, paragraphsPerDoc=2, eraseDrafts=True, run_id=None,
+                          useTermStore=True, store=None, offline=None):
     """
     Performs a comprehensive terminology search combining UNTERM database and UN document analysis.
     First queries UNTERM database, then checks for missing preferred translations and fills gaps by
@@ -355,12 +678,21 @@ def getTermsAndCandidates(input_search_text, lang_to_search="ALL", input_filterS
         sourcesQuantity (int): Maximum number of source documents to process
         paragraphsPerDoc (int): Maximum paragraphs to extract per document
         eraseDrafts (bool): Whether to remove draft documents from results
+        run_id (str, optional): ID of the run in the run journal, so an interrupted search resumes (see getCandidates)
+        useTermStore (bool): Whether to look UNTERM up in a local terminology store. Defaults to True.
+        store (TermStore, optional): Local terminology store to use. Defaults to the one in the cache directory.
+        offline (bool, optional): If True, UNTERM is only looked up in the store (see queryUNTerm).
+                                  Defaults to the offline setting of the store.
     
     Returns:
         dict: Combined terminology data from UNTERM and document extraction
     """
     # Step 1: Query the UN Terminology Database
-    unterm_results = queryUNTerm(input_search_text)
+    if not useTermStore:
+        store = None
+    elif store is None:
+        store = get_term_store(CACHE_DIR)
+    unterm_results = queryUNTerm(input_search_text, store=store, offline=offline)
     
     # Step 2: Consolidate UNTERM results
     consolidated_unterm = consolidate_UNTermResults(unterm_results, input_search_text)
@@ -394,7 +726,8 @@ def getTermsAndCandidates(input_search_text, lang_to_search="ALL", input_filterS
         input_filterSymbols=input_filterSymbols,
         sourcesQuantity=sourcesQuantity,
         paragraphsPerDoc=paragraphsPerDoc,
-        eraseDrafts=eraseDrafts
+        eraseDrafts=eraseDrafts,
+        run_id=run_id
     )
     
     # Step 5: Consolidate library results
@@ -0,0 +1,178 @@
+"""
+Run journal for TermSeeker
+
+This module records the stages completed by a getCandidates run, so a run interrupted by a
+transient failure (ODS timeout, Groq rate limit, Chrome crash) continues where it stopped
+when it is started again with the same run ID:
+- Each stage is recorded per (term, document, language) with its result: the library search
+  metadata, the matched English paragraphs, the aligned target paragraphs and the extracted terms
+- A restarted run reads the results of the completed stages instead of computing them again,
+  and documents whose paragraphs are journaled are not even downloaded
+- Downloads and markdown conversions are recorded for the progress report, their results are
+  already kept by the markdown cache
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# Stages of a run, in processing order
+RUN_STAGES = ("metadata", "download", "markdown", "paragraphs", "alignment", "extraction")
+
+# Global variable to store the shared journal connections, by database path
+run_journals = {}
+_run_journals_lock = threading.Lock()
+
+
+class RunJournal:
+    """
+    SQLite journal of the stages completed by a run.
+
+    Args:
+        path (str): Path of the SQLite database, shared by all the runs
+        run_id (str): ID of the run. Starting a run with the ID of an interrupted one resumes it.
+
+    Example:
+        journal = RunJournal("/content/run_journal.sqlite", "glossary-2024-05")
+        metadata = journal.step("metadata", lambda: search_library_metadata(...), term)
+        paragraphs = journal.step("paragraphs", lambda: find_paragraphs_with_merge(...), term, docSymbol, "English")
+    """
+
+    def __init__(self, path, run_id):
+        self.path = path
+        self.run_id = str(run_id)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS stages (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    result TEXT,
+                    completed REAL NOT NULL,
+                    PRIMARY KEY (run_id, stage, term, document, language)
+                )""")
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the counters of skipped and recorded stages."""
+        with self._lock:
+            self._stats = {"skipped": 0, "recorded": 0}
+
+    def get_stats(self) -> dict:
+        """
+        Get the counters of this process and the stages completed by the run.
+
+        Returns:
+            dict: skipped (stages read from the journal) and recorded stages, with the number
+                  of completed stages of the run by stage name
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            rows = self._connection.execute("SELECT stage, COUNT(*) FROM stages WHERE run_id = ? GROUP BY stage",
+                                            (self.run_id,)).fetchall()
+        stats["completed"] = {stage: count for stage, count in rows}
+        return stats
+
+    def _get(self, stage, term, document, language):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT result FROM stages WHERE run_id = ? AND stage = ? AND term = ? AND document = ? AND language = ?",
+                (self.run_id, stage, term, document, language)).fetchone()
+
+    def lookup(self, stage, term, document="", language=""):
+        """
+        Get the result of a completed stage, counted as resumed from the journal.
+
+        Returns:
+            tuple: (True, result) if the stage is completed, (False, None) otherwise
+        """
+        row = self._get(stage, term, document, language)
+        if row is None:
+            return False, None
+        with self._lock:
+            self._stats["skipped"] += 1
+        return True, json.loads(row[0]) if row[0] is not None else None
+
+    def is_completed(self, stage, term, document="", language="") -> bool:
+        """Whether a stage is completed."""
+        return self._get(stage, term, document, language) is not None
+
+    def record(self, stage, term, document="", language="", result=None):
+        """Record a completed stage with its result (JSON serializable)."""
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     (self.run_id, stage, term, document, language,
+                                      json.dumps(result, ensure_ascii=False) if result is not None else None,
+                                      time.time()))
+            self._stats["recorded"] += 1
+
+    def step(self, stage, compute, term, document="", language=""):
+        """
+        Get the result of a stage from the journal, or compute and record it.
+        A stage whose computation raises an exception or returns None (e.g. after a failed
+        download) is not recorded, so it runs again when the run is restarted.
+
+        Args:
+            stage (str): Name of the stage (see RUN_STAGES)
+            compute (callable): Function without arguments computing the result
+            term (str): The search term
+            document (str, optional): The document symbol
+            language (str, optional): The language
+
+        Returns:
+            The result of the stage
+        """
+        completed, result = self.lookup(stage, term, document, language)
+        if completed:
+            return result
+        result = compute()
+        if result is not None:
+            self.record(stage, term, document, language, result)
+        return result
+
+    def clear(self):
+        """Forget all the stages of the run."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM stages WHERE run_id = ?", (self.run_id,))
+
+    def report(self):
+        """Print the stages skipped and recorded in this process and the progress of the run."""
+        stats = self.get_stats()
+        completed = ", ".join(f"{stage} {stats['completed'][stage]}" for stage in RUN_STAGES if stage in stats["completed"])
+        print(f"Run '{self.run_id}': {stats['skipped']} stages resumed from the journal, "
+              f"{stats['recorded']} recorded (completed: {completed or 'none'})")
+
+
+def get_run_journal_path(cache_dir) -> str:
+    """Path of the run journal in the markdown cache directory."""
+    return os.path.join(cache_dir, "run_journal.sqlite")
+
+
+def get_run_journal(cache_dir, run_id) -> RunJournal:
+    """
+    Get the journal of a run.
+
+    Args:
+        cache_dir (str): Directory of the markdown cache
+        run_id (str): ID of the run
+
+    Returns:
+        RunJournal: The journal of the run
+    """
+    path = get_run_journal_path(cache_dir)
+    with _run_journals_lock:
+        key = (path, str(run_id))
+        if key not in run_journals:
+            run_journals[key] = RunJournal(path, run_id)
+        return run_journals[key]
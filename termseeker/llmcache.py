@@ -0,0 +1,215 @@
+"""
+Persistent LLM response cache for TermSeeker
+
+This module stores the answers of the language models in a SQLite database next to the
+markdown cache, so reruns and overlapping glossaries do not send the same prompt again:
+- Entries are keyed by a hash of the backend, the model, the prompt template version, the
+  source term and the normalized paragraphs sent, so editing a prompt template (and bumping
+  PROMPT_VERSION in utils) invalidates the previous answers
+- Entries expire after a time to live, and the least recently used entries are evicted
+  once the cache holds more than a maximum number of entries
+- Hits, misses, expired entries and evictions are counted
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from .embeddingcache import normalize_paragraph
+
+# Default time to live of the entries in seconds (30 days)
+DEFAULT_TTL = 30 * 24 * 3600
+
+# Default maximum number of entries
+DEFAULT_MAX_ENTRIES = 20000
+
+# Global variable to store the shared caches, by database path
+llm_caches = {}
+_llm_caches_lock = threading.Lock()
+
+
+def _normalize_context(value):
+    """Normalize the paragraphs of a request (strings, lists, tuples and dicts of them)."""
+    if isinstance(value, str):
+        return normalize_paragraph(value)
+    if isinstance(value, dict):
+        return {str(key): _normalize_context(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_context(item) for item in value]
+    return value
+
+
+def make_cache_key(backend, model, prompt_version, source_term, *paragraphs) -> str:
+    """
+    Compute the key of a LLM request.
+
+    Args:
+        backend (str): Name of the backend (e.g. "groq")
+        model (str): Name of the model, or URL of the local server
+        prompt_version (int or str): Version of the prompt template
+        source_term (str): The source term
+        *paragraphs: The paragraphs sent (strings, lists, or dicts of languages to paragraphs)
+
+    Returns:
+        str: Hexadecimal SHA-256 digest identifying the request
+    """
+    payload = json.dumps([backend, model, str(prompt_version), normalize_paragraph(source_term),
+                          _normalize_context(list(paragraphs))], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite store of LLM responses with time to live and LRU eviction.
+
+    Args:
+        path (str): Path of the SQLite database
+        ttl (float): Seconds after which an entry expires (None for no expiry)
+        max_entries (int): Maximum number of entries, the least recently used are evicted beyond it
+        bypass (bool): If True, nothing is read from or written to the cache
+
+    Example:
+        cache = LLMResponseCache("/content/llm_cache.sqlite")
+        key = make_cache_key("groq", "llama-3.3-70b-versatile", PROMPT_VERSION, term, paragraphs)
+        response = cache.get(key)
+        if response is None:
+            response = askGroqAPI(...)
+            cache.put(key, response)
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, bypass=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    backend TEXT,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the hit and miss counters."""
+        with self._lock:
+            self._stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+
+    def get_stats(self) -> dict:
+        """
+        Get the counters accumulated since the creation of the cache or the last reset.
+
+        Returns:
+            dict: hits, misses, expired entries found, writes and evictions, with the number
+                  of entries and the hit rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def get(self, key, bypass=None):
+        """
+        Get a cached response.
+
+        Args:
+            key (str): Key of the request, see make_cache_key
+            bypass (bool, optional): Whether to ignore the cache for this lookup. Defaults to the bypass of the cache.
+
+        Returns:
+            The cached response (string or JSON object), or None if it is not cached or expired
+        """
+        if self.bypass if bypass is None else bypass:
+            return None
+
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._stats["expired"] += 1
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key, response, backend=None, model=None, bypass=None):
+        """
+        Store a response, evicting the least recently used entries beyond max_entries.
+
+        Args:
+            key (str): Key of the request, see make_cache_key
+            response: The response (string or JSON object)
+            backend (str, optional): Name of the backend, stored for inspection
+            model (str, optional): Name of the model, stored for inspection
+            bypass (bool, optional): Whether to skip storing this response. Defaults to the bypass of the cache.
+        """
+        if self.bypass if bypass is None else bypass:
+            return
+
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, backend, model, response, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, backend, model, json.dumps(response, ensure_ascii=False), now, now))
+            self._stats["writes"] += 1
+
+            count = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if self.max_entries and count > self.max_entries:
+                evicted = self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,)).rowcount
+                self._stats["evictions"] += evicted
+
+    def clear(self):
+        """Remove all the entries."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+def get_llm_cache_path(cache_dir) -> str:
+    """Path of the LLM response cache in the markdown cache directory."""
+    return os.path.join(cache_dir, "llm_cache.sqlite")
+
+
+def get_llm_cache(cache_dir) -> LLMResponseCache:
+    """
+    Get the LLM response cache shared by all TermSeeker modules for a cache directory.
+    The shared cache is never bypassed, callers pass bypass to get and put instead.
+
+    Args:
+        cache_dir (str): Directory of the markdown cache
+
+    Returns:
+        LLMResponseCache: The shared cache
+    """
+    path = get_llm_cache_path(cache_dir)
+    with _llm_caches_lock:
+        if path not in llm_caches:
+            llm_caches[path] = LLMResponseCache(path)
+        return llm_caches[path]
@@ -0,0 +1,275 @@
+"""
+Embedding model registry for TermSeeker
+
+This module loads the sentence embedding models used to align paragraphs:
+- Models are kept by (model name, backend, device), so several models can be used in a run,
+  and the least recently used one is unloaded when more than max_models are loaded
+- Backends: "torch" (default), "torch-int8" (dynamic int8 quantization of the linear layers
+  on CPU), "onnx" and "onnx-int8" (ONNX Runtime through the sentence-transformers ONNX backend)
+- The torch thread count and the encode batch size are configurable
+- benchmark_model_variants compares the throughput and the alignments of the backends
+"""
+
+import os
+import re
+import gc
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Multilingual embedding model used by default
+DEFAULT_MODEL = 'distiluse-base-multilingual-cased-v2'
+
+# Backends of the models
+MODEL_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Quantized ONNX file of the models, and the quantization used to export it when a model does not have it
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+ONNX_INT8_CONFIG = "avx2"
+
+# Directory where the quantized ONNX exports are saved
+DEFAULT_MODELS_DIR = "/content/models"
+
+# Global variable to store the shared registry
+model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loaded embedding models, by model name, backend and device.
+
+    Args:
+        max_models (int): Maximum number of loaded models, the least recently used one is unloaded
+        backend (str): Default backend (see MODEL_BACKENDS)
+        device (str): Default device of the torch backends ("cpu", "cuda", ...), None to let
+                      sentence-transformers choose. Quantized and ONNX backends run on CPU.
+        batch_size (int): Number of texts encoded together
+        threads (int): Number of torch threads, None to keep the torch default
+        models_dir (str): Directory where the quantized ONNX exports are saved
+
+    Example:
+        registry = ModelRegistry(backend="onnx-int8", batch_size=64, threads=4)
+        embeddings = registry.encode(paragraphs, "distiluse-base-multilingual-cased-v2")
+    """
+
+    def __init__(self, max_models=2, backend="torch", device=None, batch_size=32, threads=None,
+                 models_dir=DEFAULT_MODELS_DIR):
+        self.max_models = max_models
+        self.backend = "torch"
+        self.device = None
+        self.batch_size = batch_size
+        self.threads = None
+        self.models_dir = models_dir
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+        self.configure(backend=backend, device=device, threads=threads)
+
+    def configure(self, backend=None, device=None, batch_size=None, threads=None, max_models=None):
+        """
+        Change the settings of the registry. Models already loaded are kept.
+
+        Args:
+            backend (str, optional): Default backend (see MODEL_BACKENDS)
+            device (str, optional): Default device of the torch backends
+            batch_size (int, optional): Number of texts encoded together
+            threads (int, optional): Number of torch threads
+            max_models (int, optional): Maximum number of loaded models
+        """
+        if backend is not None:
+            if backend not in MODEL_BACKENDS:
+                raise ValueError(f"Unknown model backend '{backend}', expected one of {', '.join(MODEL_BACKENDS)}")
+            self.backend = backend
+        if device is not None:
+            self.device = device
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if threads is not None:
+            import torch
+            torch.set_num_threads(threads)
+            self.threads = threads
+        if max_models is not None:
+            self.max_models = max_models
+            with self._lock:
+                self._evict()
+
+    def _key(self, model_name, backend, device):
+        backend = backend or self.backend
+        # Quantized and ONNX models run on CPU
+        device = (device or self.device) if backend == "torch" else "cpu"
+        return model_name, backend, device
+
+    def cache_name(self, model_name, backend=None) -> str:
+        """
+        Name of the embeddings of a model in the embedding cache. Quantized and ONNX variants
+        give slightly different embeddings, so they are cached apart from the torch model.
+        """
+        backend = backend or self.backend
+        return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+    def get(self, model_name=DEFAULT_MODEL, backend=None, device=None):
+        """
+        Get a model, loading it if needed.
+
+        Args:
+            model_name (str): Name of the sentence-transformers model
+            backend (str, optional): Backend of the model, defaults to the backend of the registry
+            device (str, optional): Device of a torch model, defaults to the device of the registry
+
+        Returns:
+            SentenceTransformer: The loaded model
+        """
+        key = self._key(model_name, backend, device)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            print(f"Loading model {model_name} ({key[1]})...")
+            self._models[key] = self._load(*key)
+            self._evict()
+            return self._models[key]
+
+    def _evict(self):
+        """Unload the least recently used models above max_models."""
+        evicted = False
+        while len(self._models) > max(1, self.max_models):
+            key, _ = self._models.popitem(last=False)
+            print(f"\t\tmodelregistry.py -> unloading model {key[0]} ({key[1]})")
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def _load(self, model_name, backend, device):
+        from sentence_transformers import SentenceTransformer
+
+        if backend == "torch":
+            return SentenceTransformer(model_name, device=device)
+        if backend == "torch-int8":
+            import torch
+            model = SentenceTransformer(model_name, device="cpu")
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if backend == "onnx":
+            return SentenceTransformer(model_name, backend="onnx", device="cpu")
+
+        # onnx-int8: use the quantized file of the model, or export it once to models_dir
+        try:
+            return SentenceTransformer(model_name, backend="onnx", device="cpu",
+                                       model_kwargs={"file_name": ONNX_INT8_FILE})
+        except Exception as e:
+            print(f"\t\tmodelregistry.py -> no quantized ONNX file for {model_name} ({e}), exporting it")
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        export_dir = os.path.join(self.models_dir, re.sub(r'[^\w\-_\.]', '_', model_name) + "-onnx")
+        if not os.path.exists(os.path.join(export_dir, ONNX_INT8_FILE)):
+            model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+            model.save(export_dir)
+            export_dynamic_quantized_onnx_model(model, ONNX_INT8_CONFIG, export_dir)
+        return SentenceTransformer(export_dir, backend="onnx", device="cpu",
+                                   model_kwargs={"file_name": ONNX_INT8_FILE})
+
+    def encode(self, texts, model_name=DEFAULT_MODEL, backend=None) -> np.ndarray:
+        """
+        Compute the embeddings of texts.
+
+        Returns:
+            np.ndarray: float32 matrix with one embedding per text
+        """
+        model = self.get(model_name, backend)
+        return np.asarray(model.encode(list(texts), batch_size=self.batch_size), dtype=np.float32)
+
+    def loaded(self) -> list:
+        """(model name, backend, device) of the loaded models, from the least to the most recently used."""
+        with self._lock:
+            return list(self._models)
+
+    def unload(self, model_name=None):
+        """Unload the models with a name, or all the models."""
+        with self._lock:
+            for key in [key for key in self._models if model_name is None or key[0] == model_name]:
+                del self._models[key]
+        gc.collect()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Get the model registry shared by the alignments.
+
+    Returns:
+        ModelRegistry: The shared registry
+    """
+    global model_registry
+    with _model_registry_lock:
+        if model_registry is None:
+            model_registry = ModelRegistry()
+        return model_registry
+
+
+def configure_models(**settings):
+    """
+    Change the settings of the shared model registry (see ModelRegistry.configure), e.g.
+    configure_models(backend="onnx-int8", batch_size=64, threads=4).
+    """
+    get_model_registry().configure(**settings)
+
+
+def benchmark_model_variants(source_paragraphs, target_paragraphs, model_name=DEFAULT_MODEL, backends=MODEL_BACKENDS,
+                             top_k=1) -> dict:
+    """
+    Compare the backends of a model on aligned paragraph pairs (e.g. the English and Spanish
+    paragraphs of getCandidates results): encoding throughput, and agreement of the alignments
+    with those of the first backend.
+
+    Args:
+        source_paragraphs (list): Source paragraphs, e.g. in English
+        target_paragraphs (list): Target paragraphs, the translation of each source paragraph at the same index
+        model_name (str): Name of the sentence-transformers model
+        backends (tuple): Backends to compare, the first one is the reference
+        top_k (int): Number of target paragraphs compared for each source paragraph
+
+    Returns:
+        dict: For each backend, load and encode seconds, texts per second, accuracy (share of source
+              paragraphs whose best target is their translation), agreement (share of source paragraphs
+              with the same top_k targets as the reference) and mean cosine similarity of the embeddings
+              with the reference, or the error if the backend could not be used
+    """
+    from .utils import top_similar
+
+    registry = ModelRegistry(max_models=1, batch_size=get_model_registry().batch_size)
+    texts = list(source_paragraphs) + list(target_paragraphs)
+    results = {}
+    reference = None
+    for backend in backends:
+        try:
+            start = time.perf_counter()
+            registry.get(model_name, backend)
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            embeddings = registry.encode(texts, model_name, backend)
+            encode_seconds = time.perf_counter() - start
+        except Exception as e:
+            print(f"{backend}: {type(e).__name__}: {e}")
+            results[backend] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+
+        source, target = embeddings[:len(source_paragraphs)], embeddings[len(source_paragraphs):]
+        matches = [[i for i, _ in row] for row in top_similar(source, target, top_k)]
+        result = {"load_seconds": load_seconds,
+                  "encode_seconds": encode_seconds,
+                  "texts_per_second": len(texts) / encode_seconds if encode_seconds else float("inf"),
+                  "accuracy": float(np.mean([row[0] == i for i, row in enumerate(matches)])) if matches else 0.0}
+        if reference is None:
+            reference = (embeddings, matches)
+            result.update(agreement=1.0, cosine_to_reference=1.0)
+        else:
+            result["agreement"] = float(np.mean([row == ref for row, ref in zip(matches, reference[1])])) if matches else 0.0
+            norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference[0], axis=1)
+            result["cosine_to_reference"] = float(np.mean(np.sum(embeddings * reference[0], axis=1) / np.maximum(norms, 1e-12)))
+        results[backend] = result
+        print(f"{backend}: load {load_seconds:.1f}s, {result['texts_per_second']:.1f} texts/s, "
+              f"accuracy {result['accuracy']:.3f}, agreement {result['agreement']:.3f}, "
+              f"cosine to {backends[0]} {result['cosine_to_reference']:.4f}")
+        registry.unload()
+    return results
@@ -0,0 +1,316 @@
+"""
+Model server for TermSeeker
+
+This module keeps the embedding model and the language detector loaded in a local daemon,
+so short CLI runs and interactive lookups do not wait for them to load:
+- The server listens on a Unix socket and answers encode, detect and align requests
+- encode_paragraphs and detect_language use the server transparently when it is running,
+  and load the model and the detector in the process otherwise
+- Messages are a JSON header followed by an optional binary payload (the float32 embeddings)
+
+Start the server with "termseeker-cli --serve-models" (or serve_models()), and stop it with
+"termseeker-cli --stop-models" (or get_model_client().shutdown()).
+"""
+
+import os
+import json
+import time
+import struct
+import socket
+import tempfile
+import threading
+import socketserver
+import numpy as np
+from .modelregistry import get_model_registry
+
+# Path of the Unix socket of the model server, can be changed with TERMSEEKER_MODEL_SOCKET
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), f"termseeker-models-{getattr(os, 'getuid', lambda: 0)()}.sock")
+
+# Seconds before the presence of the server is checked again after it was not found
+RECHECK_INTERVAL = 30.0
+
+# Seconds to wait for an answer of the server
+REQUEST_TIMEOUT = 300.0
+
+# Global variable to store the shared client, None if no server is running
+model_client = None
+_model_client_checked = 0.0
+_model_client_lock = threading.Lock()
+
+# Set in the server process, so its own requests are not sent back to the socket
+serving = False
+
+
+class ModelServerError(Exception):
+    """Error of a request to the model server."""
+
+
+def get_socket_path() -> str:
+    """Path of the Unix socket of the model server."""
+    return os.environ.get("TERMSEEKER_MODEL_SOCKET", DEFAULT_SOCKET_PATH)
+
+
+def _receive_exactly(sock, size) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ModelServerError("Connection closed by the model server")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock, header, payload=b""):
+    """Send a JSON header and a binary payload, each preceded by its length."""
+    header_bytes = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack(">II", len(header_bytes), len(payload)) + header_bytes + payload)
+
+
+def receive_message(sock) -> tuple:
+    """
+    Receive a message sent with send_message.
+
+    Returns:
+        tuple: (header dict, payload bytes)
+    """
+    header_size, payload_size = struct.unpack(">II", _receive_exactly(sock, 8))
+    header = json.loads(_receive_exactly(sock, header_size).decode("utf-8"))
+    return header, _receive_exactly(sock, payload_size)
+
+
+class _ModelRequestHandler(socketserver.BaseRequestHandler):
+    """Answer the requests of one connection until the client closes it."""
+
+    def handle(self):
+        while True:
+            try:
+                header, payload = receive_message(self.request)
+            except (ModelServerError, ConnectionError, struct.error):
+                return
+            try:
+                answer, answer_payload = self.server.answer(header)
+            except Exception as e:
+                answer, answer_payload = {"error": f"{type(e).__name__}: {e}"}, b""
+            send_message(self.request, answer, answer_payload)
+            if header.get("op") == "shutdown":
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server keeping the embedding models and the language detector loaded.
+
+    Args:
+        socket_path (str): Path of the Unix socket
+        model_names (list): Embedding models loaded at start, other models are loaded on first request
+
+    Raises:
+        ModelServerError: If another server is listening on the socket
+
+    Example:
+        with ModelServer(get_socket_path(), ["distiluse-base-multilingual-cased-v2"]) as server:
+            server.serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, model_names=()):
+        if os.path.exists(socket_path):
+            # The socket of a server that did not stop cleanly is replaced, not the one of a running server
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.connect(socket_path)
+                except ConnectionRefusedError:
+                    os.remove(socket_path)
+                else:
+                    raise ModelServerError(f"A model server is already running at {socket_path}")
+        super().__init__(socket_path, _ModelRequestHandler)
+        os.chmod(socket_path, 0o600)
+        self.socket_path = socket_path
+        self.started = time.time()
+        self.model_names = set()
+        self._lock = threading.Lock()
+        self._stats = {"encode": 0, "detect": 0, "align": 0, "texts": 0}
+
+        global serving
+        serving = True
+        for model_name in model_names:
+            self.get_model(model_name)
+        from .getcandidates import get_language_detector
+        get_language_detector()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def get_model(self, model_name, backend=None):
+        """Get a loaded embedding model (see modelregistry)."""
+        registry = get_model_registry()
+        with self._lock:
+            self.model_names.add(registry.cache_name(model_name, backend))
+            return registry.get(model_name, backend)
+
+    def encode(self, texts, model_name, backend=None) -> np.ndarray:
+        """Compute the embeddings of texts, one request at a time."""
+        self.get_model(model_name, backend)
+        with self._lock:
+            return get_model_registry().encode(texts, model_name, backend)
+
+    def answer(self, header) -> tuple:
+        """
+        Answer a request.
+
+        Returns:
+            tuple: (answer header, answer payload)
+        """
+        op = header.get("op")
+        texts = header.get("texts", [])
+        if op in self._stats:
+            with self._lock:
+                self._stats[op] += 1
+                self._stats["texts"] += len(texts)
+
+        if op == "ping" or op == "shutdown":
+            return {"pid": os.getpid(), "uptime": time.time() - self.started,
+                    "models": sorted(self.model_names), "stats": dict(self._stats)}, b""
+        if op == "encode":
+            embeddings = self.encode(texts, header["model"], header.get("backend"))
+            return {"shape": list(embeddings.shape)}, embeddings.tobytes()
+        if op == "detect":
+            from .getcandidates import detect_language
+            return {"languages": [detect_language(text) for text in texts]}, b""
+        if op == "align":
+            source = self.encode(header["source_texts"], header["model"], header.get("backend"))
+            target = self.encode(header["target_texts"], header["model"], header.get("backend"))
+            from .utils import top_similar
+            return {"matches": top_similar(source, target, header.get("top_k", 1))}, b""
+        raise ModelServerError(f"Unknown operation: {op}")
+
+
+class ModelClient:
+    """
+    Client of the model server. Each request uses its own connection, so a client can be shared by threads.
+
+    Args:
+        socket_path (str): Path of the Unix socket of the server
+        timeout (float): Seconds to wait for an answer
+
+    Example:
+        client = ModelClient(get_socket_path())
+        embeddings = client.encode(["Climate change"], "distiluse-base-multilingual-cased-v2")
+    """
+
+    def __init__(self, socket_path, timeout=REQUEST_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, header) -> tuple:
+        """
+        Send a request and wait for its answer.
+
+        Returns:
+            tuple: (answer header, answer payload)
+
+        Raises:
+            ModelServerError: If the server cannot be reached or the request failed
+        """
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                send_message(sock, header)
+                answer, payload = receive_message(sock)
+        except (OSError, ValueError, struct.error) as e:
+            raise ModelServerError(f"Model server not reachable at {self.socket_path}: {e}")
+        if "error" in answer:
+            raise ModelServerError(answer["error"])
+        return answer, payload
+
+    def ping(self) -> dict:
+        """Get the process ID, uptime, loaded models and request counters of the server."""
+        return self.request({"op": "ping"})[0]
+
+    def encode(self, texts, model_name, backend=None) -> np.ndarray:
+        """Compute the embeddings of texts with a model of the registry of the server (see ModelRegistry.encode)."""
+        answer, payload = self.request({"op": "encode", "texts": list(texts), "model": model_name, "backend": backend})
+        return np.frombuffer(payload, dtype=np.float32).reshape(answer["shape"])
+
+    def detect(self, texts) -> list:
+        """Detect the ISO 639-1 language codes of texts, as getcandidates.detect_language."""
+        return self.request({"op": "detect", "texts": list(texts)})[0]["languages"]
+
+    def align(self, source_texts, target_texts, model_name, top_k=1, backend=None) -> list:
+        """
+        Align source texts against target texts.
+
+        Returns:
+            list: One list of (target index, score) tuples per source text, from the most to the least similar
+        """
+        answer = self.request({"op": "align", "source_texts": list(source_texts), "target_texts": list(target_texts),
+                               "model": model_name, "top_k": top_k, "backend": backend})[0]
+        return [[(int(i), float(score)) for i, score in matches] for matches in answer["matches"]]
+
+    def shutdown(self) -> dict:
+        """Stop the server after answering."""
+        return self.request({"op": "shutdown"})[0]
+
+
+def get_model_client():
+    """
+    Get the client of the running model server. The presence of the server is checked again
+    every RECHECK_INTERVAL seconds when it was not found.
+    Set TERMSEEKER_MODEL_SERVER=0 to always load the models in the process.
+
+    Returns:
+        ModelClient: The shared client, or None if no server is running
+    """
+    global model_client, _model_client_checked
+    if serving or os.environ.get("TERMSEEKER_MODEL_SERVER", "1") == "0":
+        return None
+    with _model_client_lock:
+        socket_path = get_socket_path()
+        if model_client is not None and model_client.socket_path == socket_path:
+            return model_client
+        if time.monotonic() - _model_client_checked < RECHECK_INTERVAL:
+            return None
+        _model_client_checked = time.monotonic()
+        if not os.path.exists(socket_path):
+            return None
+        client = ModelClient(socket_path)
+        try:
+            info = client.ping()
+        except ModelServerError:
+            return None
+        print(f"\t\tmodelserver.py -> using the model server at {socket_path} (pid {info['pid']})")
+        model_client = client
+        return model_client
+
+
+def forget_model_client():
+    """Stop using the shared client (e.g. after the server stopped), until the server is found again."""
+    global model_client, _model_client_checked
+    with _model_client_lock:
+        model_client = None
+        _model_client_checked = time.monotonic()
+
+
+def serve_models(socket_path=None, model_names=("distiluse-base-multilingual-cased-v2",)):
+    """
+    Run the model server until it is shut down or interrupted.
+
+    Args:
+        socket_path (str, optional): Path of the Unix socket. Defaults to get_socket_path().
+        model_names (tuple): Embedding models loaded at start
+    """
+    socket_path = socket_path or get_socket_path()
+    print(f"Loading {', '.join(model_names)} and the language detector...")
+    with ModelServer(socket_path, model_names) as server:
+        print(f"Model server listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    print("Model server stopped")
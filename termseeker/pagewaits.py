@@ -0,0 +1,224 @@
+"""
+Page waits and lookup timings for the browser-based terminology lookups
+
+This module replaces fixed sleeps with waits on the DOM conditions a lookup needs:
+- wait_for_stable_count polls until the number of matching elements (e.g. table rows and
+  cells, so the language columns are rendered) stops changing
+- AdaptiveTimeout derives the timeout of a stage from the durations observed in previous
+  lookups, so a slow page gets time to load while a missing element fails fast
+- StageTimer records how long each stage of a lookup takes, and the durations of all the
+  lookups can be read with get_lookup_timings
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Seconds between two checks of a DOM condition
+POLL_INTERVAL = 0.1
+
+# Global variable to store the durations of the stages of all lookups, by "lookup/stage"
+lookup_timings = {}
+_timings_lock = threading.Lock()
+
+# Global variable to store the adaptive timeouts, by "lookup/stage"
+adaptive_timeouts = {}
+
+
+class AdaptiveTimeout:
+    """
+    Timeout of a stage derived from its recent durations.
+
+    Args:
+        default (float): Timeout in seconds until enough durations are observed
+        minimum (float): Smallest timeout in seconds
+        maximum (float): Largest timeout in seconds
+        factor (float): Multiple of the slowest recent duration used as timeout
+        history (int): Number of recent durations kept
+    """
+
+    def __init__(self, default=10.0, minimum=2.0, maximum=30.0, factor=3.0, history=20):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self._durations = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, duration):
+        """Record the duration of a successful stage."""
+        with self._lock:
+            self._durations.append(duration)
+
+    @property
+    def value(self) -> float:
+        """The current timeout in seconds."""
+        with self._lock:
+            if len(self._durations) < 3:
+                return self.default
+            slowest = max(self._durations)
+        return min(self.maximum, max(self.minimum, slowest * self.factor))
+
+
+def get_adaptive_timeout(name, **kwargs) -> AdaptiveTimeout:
+    """
+    Get the adaptive timeout of a stage, created with the given settings on first use.
+
+    Args:
+        name (str): Name of the stage, e.g. "unterm/table"
+        **kwargs: Settings of AdaptiveTimeout
+
+    Returns:
+        AdaptiveTimeout: The adaptive timeout of the stage
+    """
+    with _timings_lock:
+        if name not in adaptive_timeouts:
+            adaptive_timeouts[name] = AdaptiveTimeout(**kwargs)
+        return adaptive_timeouts[name]
+
+
+def wait_until(condition, timeout, poll=POLL_INTERVAL):
+    """
+    Poll a condition until it returns a truthy value.
+
+    Args:
+        condition (callable): Function without arguments; exceptions count as a false result
+        timeout (float): Maximum number of seconds to wait
+        poll (float): Seconds between two checks
+
+    Returns:
+        The truthy value returned by the condition
+
+    Raises:
+        TimeoutError: If the condition is still false after the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = condition()
+        except Exception:
+            result = None
+        if result:
+            return result
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Condition not met after {timeout:.1f}s")
+        time.sleep(poll)
+
+
+def wait_for_stable_count(count, timeout, stable_for=0.3, minimum=1, poll=POLL_INTERVAL):
+    """
+    Poll a count (e.g. of table rows) until it reaches a minimum and stops changing.
+
+    Args:
+        count (callable): Function without arguments returning the count, or a tuple of counts
+                          (e.g. rows and cells, so the columns added to a table are waited for too)
+        timeout (float): Maximum number of seconds to wait
+        stable_for (float): Seconds during which the count must not change
+        minimum (int): Smallest first count accepted
+        poll (float): Seconds between two checks
+
+    Returns:
+        The stable count
+
+    Raises:
+        TimeoutError: If the count does not reach the minimum or keeps changing until the timeout
+    """
+    deadline = time.monotonic() + timeout
+    last = None
+    since = None
+    while True:
+        try:
+            current = count()
+        except Exception:
+            current = None
+        now = time.monotonic()
+        first = current[0] if isinstance(current, tuple) else current
+        if current is not None and first >= minimum:
+            if current != last:
+                last, since = current, now
+            elif now - since >= stable_for:
+                return current
+        else:
+            last = since = None
+        if now >= deadline:
+            raise TimeoutError(f"Count not stable after {timeout:.1f}s (last: {last})")
+        time.sleep(poll)
+
+
+class StageTimer:
+    """
+    Durations of the stages of one lookup.
+
+    Args:
+        lookup (str): Name of the lookup, e.g. "unterm"
+
+    Example:
+        timer = StageTimer("unterm")
+        with timer.stage("search page"):
+            driver.get(search_url)
+        print(timer.summary())
+    """
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+        self.timings = {}
+        self._start = time.monotonic()
+
+    @contextmanager
+    def stage(self, name, timeout=None):
+        """
+        Time a stage. Its duration is recorded even if it fails, and a successful duration
+        is fed to the adaptive timeout of the stage if one is given.
+
+        Args:
+            name (str): Name of the stage
+            timeout (AdaptiveTimeout, optional): Adaptive timeout of the stage
+        """
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self._record(name, time.monotonic() - start)
+            raise
+        duration = time.monotonic() - start
+        self._record(name, duration)
+        if timeout is not None:
+            timeout.record(duration)
+
+    def _record(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+        with _timings_lock:
+            lookup_timings.setdefault(f"{self.lookup}/{name}", []).append(duration)
+
+    @property
+    def total(self) -> float:
+        """Seconds since the creation of the timer."""
+        return time.monotonic() - self._start
+
+    def summary(self) -> str:
+        """One line with the duration of each stage and the total."""
+        stages = ", ".join(f"{name} {duration:.2f}s" for name, duration in self.timings.items())
+        return f"{self.lookup} lookup: {stages} (total {self.total:.2f}s)"
+
+
+def get_lookup_timings() -> dict:
+    """
+    Get statistics of the stage durations of all the lookups since the start (or the last reset).
+
+    Returns:
+        dict: For each "lookup/stage", the count, mean, max and total durations in seconds
+    """
+    with _timings_lock:
+        timings = {name: list(durations) for name, durations in lookup_timings.items()}
+    return {name: {"count": len(durations),
+                   "mean": sum(durations) / len(durations),
+                   "max": max(durations),
+                   "total": sum(durations)}
+            for name, durations in timings.items() if durations}
+
+
+def reset_lookup_timings():
+    """Forget the recorded stage durations."""
+    with _timings_lock:
+        lookup_timings.clear()
@@ -0,0 +1,467 @@
+"""
+Paragraph index for TermSeeker
+
+This module keeps a persistent approximate nearest neighbour index per language over the
+paragraphs of the cached documents, to find where an English sentence was translated in the
+whole cached UN corpus instead of one document at a time:
+- The segments of each target document (see ParsedDocument.segment_texts) are added once, with
+  their normalized float32 embeddings from the embedding cache, as documents are aligned against
+  their whole text, or with index_markdown_cache
+- Vectors are appended to flat files on disk and read memory-mapped
+- Above TRAIN_MIN_ROWS paragraphs, an IVF index (k-means centroids, one inverted list per centroid)
+  limits a search to the nprobe lists closest to the query; smaller indexes are searched exhaustively
+- Searches can be restricted to documents by symbol prefix
+
+Files of an index ({cache_dir}/ann/{model}/{language}/):
+- meta.json: dimension, number of rows and IVF state
+- vectors.f32: one normalized embedding per row
+- rows.i32: document id and segment index of each row
+- lists.i32: IVF list of each row (-1 before training), centroids.npy: the IVF centroids
+- texts.jsonl and text_offsets.i64: text of each row and its offset in texts.jsonl
+- documents.jsonl: doc_key, docSymbol and row range of each document
+
+An index is written by one process at a time.
+"""
+
+import os
+import re
+import json
+import threading
+import numpy as np
+
+from .embeddingcache import load_document_embeddings, paragraph_hash
+from .modelregistry import get_model_registry
+from .utils import encode_paragraphs, encode_texts
+
+# Default embedding model of the index, the one used to align paragraphs
+DEFAULT_MODEL = 'distiluse-base-multilingual-cased-v2'
+
+# Number of paragraphs from which the IVF index is trained, smaller indexes are searched exhaustively
+TRAIN_MIN_ROWS = 4096
+
+# The IVF index is trained again when the number of paragraphs grows by this factor since the last training
+RETRAIN_FACTOR = 4
+
+# Default number of inverted lists searched per query
+DEFAULT_NPROBE = 8
+
+# Number of rows scored at once in exhaustive searches and list assignments
+CHUNK_ROWS = 65536
+
+# Global variable to store the opened indexes, by directory
+paragraph_indexes = {}
+_paragraph_indexes_lock = threading.Lock()
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _symbol_key(symbol) -> str:
+    """Document symbols and doc keys compared in filters (as in sanitize_filename, case insensitive)."""
+    return re.sub(r'[^\w\-_\.]', '_', symbol).casefold()
+
+
+def nearest_centroids(vectors, centroids) -> np.ndarray:
+    """Index of the most similar centroid of each normalized vector."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        block = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors, nlist, iterations=10, sample_per_list=256, seed=0) -> np.ndarray:
+    """
+    Spherical k-means on a sample of normalized vectors.
+
+    Args:
+        vectors (np.ndarray): Normalized vectors (may be memory-mapped)
+        nlist (int): Number of centroids
+        iterations (int): Number of k-means iterations
+        sample_per_list (int): Number of sampled vectors per centroid
+        seed (int): Seed of the sampling
+
+    Returns:
+        np.ndarray: float32 matrix of normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * sample_per_list)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = np.linalg.norm(sums, axis=1) == 0
+        # Restart the empty lists from random vectors
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class ParagraphIndex:
+    """
+    Persistent approximate nearest neighbour index of the paragraphs of one language.
+
+    Args:
+        index_dir (str): Directory of the index files
+        model_name (str): Embedding model of the vectors
+
+    Example:
+        index = get_paragraph_index("/content", "French")
+        index.add_parsed_document(parse_document(frenchMD), "UNEP_EA.5_HLS.1_French", "UNEP/EA.5/HLS.1")
+        matches = index.search("Sustainable consumption and production patterns", top_k=5, documents=["UNEP/EA"])
+    """
+
+    def __init__(self, index_dir, model_name=DEFAULT_MODEL):
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self._lock = threading.RLock()
+        self._vectors = None
+        os.makedirs(index_dir, exist_ok=True)
+
+        meta_path = self._path("meta.json")
+        self.meta = {"model": model_name, "dim": None, "rows": 0, "nlist": 0, "trained_rows": 0}
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.meta.update(json.load(f))
+        self._truncate_incomplete()
+
+        self.documents = []
+        if os.path.exists(self._path("documents.jsonl")):
+            with open(self._path("documents.jsonl"), 'r', encoding='utf-8') as f:
+                self.documents = [json.loads(line) for line in f if line.strip()]
+        self._doc_keys = {document["doc_key"]: document for document in self.documents}
+        self.centroids = np.load(self._path("centroids.npy")) if self.meta["nlist"] else None
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _path(self, name) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _save_meta(self):
+        temp_path = self._path("meta.json.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(temp_path, self._path("meta.json"))
+
+    def _truncate_incomplete(self):
+        """Drop the rows and documents written after the last saved meta.json (e.g. before a crash)."""
+        rows = self.meta["rows"]
+        dim = self.meta["dim"] or 0
+        # text_offsets.i64 holds the start offset of each row and the end offset of the last row
+        offsets_path = self._path("text_offsets.i64")
+        offsets_size = (rows + 1) * 8 if rows else 0
+        text_end = 0 if not rows else None
+        if rows and os.path.exists(offsets_path) and os.path.getsize(offsets_path) >= offsets_size:
+            text_end = int(np.fromfile(offsets_path, dtype=np.int64, count=rows + 1)[rows])
+        for name, size in (("vectors.f32", rows * dim * 4), ("rows.i32", rows * 8), ("lists.i32", rows * 4),
+                           ("text_offsets.i64", offsets_size), ("texts.jsonl", text_end)):
+            path = self._path(name)
+            if size is not None and os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, 'rb+') as f:
+                    f.truncate(size)
+
+        documents_path = self._path("documents.jsonl")
+        if os.path.exists(documents_path):
+            with open(documents_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            kept = []
+            for line in lines:
+                try:
+                    document = json.loads(line)
+                except ValueError:
+                    continue
+                if document["first_row"] + document["rows"] <= rows:
+                    kept.append(line if line.endswith("\n") else line + "\n")
+            if kept != lines:
+                with open(documents_path, 'w', encoding='utf-8') as f:
+                    f.writelines(kept)
+
+    def _vector_map(self):
+        """Memory-mapped vectors, reopened when rows were added."""
+        rows, dim = self.meta["rows"], self.meta["dim"]
+        if self._vectors is None or self._vectors.shape[0] != rows:
+            self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode='r', shape=(rows, dim)) if rows else None
+        return self._vectors
+
+    def has_document(self, doc_key) -> bool:
+        """Whether a document is in the index."""
+        return doc_key in self._doc_keys
+
+    def add_document(self, doc_key, texts, embeddings, docSymbol=None) -> int:
+        """
+        Add the paragraphs of a document, unless the document is already in the index.
+
+        Args:
+            doc_key (str): Identifier of the document (e.g. "UNEP_EA.5_HLS.1_French")
+            texts (list): The paragraphs
+            embeddings (np.ndarray): One embedding per paragraph
+            docSymbol (str, optional): Symbol of the document, used by the search filters
+
+        Returns:
+            int: Number of paragraphs added
+        """
+        with self._lock:
+            if doc_key in self._doc_keys or not len(texts):
+                return 0
+            vectors = _normalize(embeddings)
+            if self.meta["dim"] is None:
+                self.meta["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"Embeddings of {doc_key} have {vectors.shape[1]} dimensions, the index has {self.meta['dim']}")
+
+            first_row = self.meta["rows"]
+            document = {"id": len(self.documents), "doc_key": doc_key, "docSymbol": docSymbol or doc_key,
+                        "first_row": first_row, "rows": len(texts)}
+            rows = np.column_stack([np.full(len(texts), document["id"], dtype=np.int32),
+                                    np.arange(len(texts), dtype=np.int32)])
+            lists = nearest_centroids(vectors, self.centroids) if self.centroids is not None else np.full(len(texts), -1, dtype=np.int32)
+
+            text_offset = os.path.getsize(self._path("texts.jsonl")) if os.path.exists(self._path("texts.jsonl")) else 0
+            lines = [json.dumps(text, ensure_ascii=False).encode("utf-8") + b"\n" for text in texts]
+            offsets = text_offset + np.concatenate([[0], np.cumsum([len(line) for line in lines])]).astype(np.int64)
+            if first_row == 0:
+                offsets_to_write = offsets
+            else:
+                # The end offset of the previous document is already written
+                offsets_to_write = offsets[1:]
+
+            with open(self._path("vectors.f32"), 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self._path("rows.i32"), 'ab') as f:
+                f.write(rows.astype(np.int32).tobytes())
+            with open(self._path("lists.i32"), 'ab') as f:
+                f.write(lists.astype(np.int32).tobytes())
+            with open(self._path("texts.jsonl"), 'ab') as f:
+                f.write(b"".join(lines))
+            with open(self._path("text_offsets.i64"), 'ab') as f:
+                f.write(offsets_to_write.tobytes())
+            with open(self._path("documents.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(document, ensure_ascii=False) + "\n")
+
+            self.meta["rows"] += len(texts)
+            self._save_meta()
+            self.documents.append(document)
+            self._doc_keys[doc_key] = document
+
+            if self.meta["rows"] >= TRAIN_MIN_ROWS and self.meta["rows"] >= RETRAIN_FACTOR * self.meta["trained_rows"]:
+                self.train()
+            return len(texts)
+
+    def add_parsed_document(self, target_doc, doc_key, docSymbol=None, cache_dir=None, cached_only=False) -> int:
+        """
+        Add the segments of a parsed document, embedded with the embedding cache of cache_dir
+        (a document that was aligned against its whole text is not embedded again).
+
+        Args:
+            target_doc (ParsedDocument): The parsed document
+            doc_key (str): Identifier of the document in the index and in the embedding cache
+            docSymbol (str, optional): Symbol of the document
+            cache_dir (str, optional): Directory of the markdown cache
+            cached_only (bool): Only add the document if all its segments are in the embedding cache
+                                (e.g. not after an alignment limited to the numbered paragraph anchors)
+
+        Returns:
+            int: Number of paragraphs added
+        """
+        if self.has_document(doc_key):
+            return 0
+        texts = target_doc.segment_texts
+        if not texts:
+            return 0
+        if cached_only:
+            cached, _ = load_document_embeddings(cache_dir, doc_key, get_model_registry().cache_name(self.model_name)) \
+                if cache_dir else (None, None)
+            if cached is None or any(paragraph_hash(text) not in cached for text in texts):
+                return 0
+        embeddings = encode_paragraphs(texts, self.model_name, cache_dir, doc_key)
+        return self.add_document(doc_key, texts, embeddings, docSymbol)
+
+    def train(self, nlist=None):
+        """
+        Train the IVF centroids on the vectors of the index and assign every row to its list.
+
+        Args:
+            nlist (int, optional): Number of inverted lists. Defaults to sqrt(rows).
+        """
+        with self._lock:
+            rows = self.meta["rows"]
+            if not rows:
+                return
+            nlist = min(rows, nlist or max(1, int(np.sqrt(rows))))
+            print(f"\t\tparagraphindex.py -> training {nlist} lists on {rows} paragraphs of {self.index_dir}")
+            vectors = self._vector_map()
+            centroids = train_centroids(vectors, nlist)
+            lists = nearest_centroids(vectors, centroids)
+
+            np.save(self._path("centroids.npy"), centroids)
+            lists.tofile(self._path("lists.i32"))
+            self.centroids = centroids
+            self.meta.update(nlist=nlist, trained_rows=rows)
+            self._save_meta()
+
+    def _document_mask(self, documents) -> np.ndarray:
+        """Rows of the documents whose symbol or doc_key starts with one of the given prefixes."""
+        prefixes = tuple(_symbol_key(document) for document in documents)
+        mask = np.zeros(self.meta["rows"], dtype=bool)
+        for document in self.documents:
+            if _symbol_key(document["docSymbol"]).startswith(prefixes) or _symbol_key(document["doc_key"]).startswith(prefixes):
+                mask[document["first_row"]:document["first_row"] + document["rows"]] = True
+        return mask
+
+    def _texts(self, rows) -> list:
+        offsets = np.memmap(self._path("text_offsets.i64"), dtype=np.int64, mode='r')
+        texts = []
+        with open(self._path("texts.jsonl"), 'rb') as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                texts.append(json.loads(f.readline()))
+        return texts
+
+    def search_vectors(self, queries, top_k=10, documents=None, nprobe=DEFAULT_NPROBE) -> list:
+        """
+        Find the most similar paragraphs of query embeddings.
+
+        Args:
+            queries (np.ndarray): One embedding per query
+            top_k (int): Number of paragraphs per query
+            documents (list, optional): Only search the documents whose symbol starts with one of these prefixes
+            nprobe (int): Number of inverted lists searched once the IVF index is trained
+
+        Returns:
+            list: For each query, a list of dicts (text, score, docSymbol, doc_key, segment), most similar first
+        """
+        with self._lock:
+            vectors = self._vector_map()
+            if vectors is None:
+                return [[] for _ in queries]
+            queries = _normalize(np.atleast_2d(queries))
+            allowed = self._document_mask(documents) if documents else None
+            lists = np.fromfile(self._path("lists.i32"), dtype=np.int32) if self.centroids is not None else None
+            row_info = np.memmap(self._path("rows.i32"), dtype=np.int32, mode='r', shape=(self.meta["rows"], 2))
+
+            results = []
+            for query in queries:
+                if lists is not None:
+                    probes = np.argsort(self.centroids @ query)[::-1][:nprobe]
+                    mask = np.isin(lists, probes)
+                    candidates = np.flatnonzero(mask & allowed if allowed is not None else mask)
+                elif allowed is not None:
+                    candidates = np.flatnonzero(allowed)
+                else:
+                    candidates = None
+
+                if candidates is None:
+                    # Exhaustive search by chunks of rows
+                    best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+                    for start in range(0, len(vectors), CHUNK_ROWS):
+                        scores = np.asarray(vectors[start:start + CHUNK_ROWS]) @ query
+                        best_rows = np.concatenate([best_rows, np.arange(start, start + len(scores))])
+                        best_scores = np.concatenate([best_scores, scores])
+                        keep = np.argsort(best_scores)[::-1][:top_k]
+                        best_rows, best_scores = best_rows[keep], best_scores[keep]
+                else:
+                    scores = np.asarray(vectors[candidates]) @ query if len(candidates) else np.empty(0, dtype=np.float32)
+                    keep = np.argsort(scores)[::-1][:top_k]
+                    best_rows, best_scores = candidates[keep], scores[keep]
+
+                texts = self._texts(best_rows)
+                matches = []
+                for row, score, text in zip(best_rows, best_scores, texts):
+                    document = self.documents[int(row_info[row, 0])]
+                    matches.append({"text": text, "score": float(score), "docSymbol": document["docSymbol"],
+                                    "doc_key": document["doc_key"], "segment": int(row_info[row, 1])})
+                results.append(matches)
+            return results
+
+    def search(self, query, top_k=10, documents=None, nprobe=DEFAULT_NPROBE) -> list:
+        """
+        Find the paragraphs most similar to a text (e.g. the translations of an English sentence).
+
+        Args:
+            query (str or list): The text, or a list of texts
+            top_k (int): Number of paragraphs per text
+            documents (list, optional): Only search the documents whose symbol starts with one of these prefixes
+            nprobe (int): Number of inverted lists searched once the IVF index is trained
+
+        Returns:
+            list: The matches of the text (see search_vectors), or one list of matches per text for a list
+        """
+        queries = [query] if isinstance(query, str) else list(query)
+        results = self.search_vectors(encode_texts(queries, self.model_name), top_k, documents, nprobe)
+        return results[0] if isinstance(query, str) else results
+
+
+def get_paragraph_index(cache_dir, language, model_name=DEFAULT_MODEL) -> ParagraphIndex:
+    """
+    Get the paragraph index of a language in the markdown cache directory.
+
+    Args:
+        cache_dir (str): Directory of the markdown cache
+        language (str): Language of the paragraphs (e.g. "French")
+        model_name (str): Embedding model of the index
+
+    Returns:
+        ParagraphIndex: The shared index
+    """
+    # Quantized and ONNX variants of a model have their own index, as for the embedding cache
+    model_dir = re.sub(r'[^\w\-_\.]', '_', get_model_registry().cache_name(model_name))
+    index_dir = os.path.join(cache_dir, "ann", model_dir, language)
+    with _paragraph_indexes_lock:
+        if index_dir not in paragraph_indexes:
+            paragraph_indexes[index_dir] = ParagraphIndex(index_dir, model_name)
+        return paragraph_indexes[index_dir]
+
+
+def index_markdown_cache(cache_dir, languages, model_name=DEFAULT_MODEL) -> dict:
+    """
+    Add the cached target language documents ({docSymbol}_{language}.txt) that are not indexed yet.
+
+    Args:
+        cache_dir (str): Directory of the markdown cache
+        languages (list): Languages to index (e.g. ["French", "Spanish"])
+        model_name (str): Embedding model of the indexes
+
+    Returns:
+        dict: Number of paragraphs added per language
+    """
+    from .parseddoc import parse_document
+
+    added = {}
+    for language in languages:
+        index = get_paragraph_index(cache_dir, language, model_name)
+        suffix = f"_{language}.txt"
+        added[language] = 0
+        for file_name in sorted(os.listdir(cache_dir)):
+            doc_key = file_name[:-len(".txt")]
+            if not file_name.endswith(suffix) or index.has_document(doc_key):
+                continue
+            with open(os.path.join(cache_dir, file_name), 'r', encoding='utf-8') as f:
+                markdown = f.read()
+            if markdown:
+                added[language] += index.add_parsed_document(parse_document(markdown, cache_dir), doc_key, cache_dir=cache_dir)
+        print(f"Indexed {added[language]} new {language} paragraphs ({len(index)} in total)")
+    return added
+
+
+def find_translations(text, language, top_k=5, documents=None, cache_dir="/content", model_name=DEFAULT_MODEL) -> list:
+    """
+    Find where a sentence was translated into a language across the indexed documents.
+
+    Args:
+        text (str): The sentence, e.g. in English
+        language (str): The target language (e.g. "French")
+        top_k (int): Number of paragraphs to return
+        documents (list, optional): Only search the documents whose symbol starts with one of these prefixes (e.g. ["UNEP/EA"])
+        cache_dir (str): Directory of the markdown cache
+        model_name (str): Embedding model of the index
+
+    Returns:
+        list: Dicts with the text, score, docSymbol, doc_key and segment of the paragraphs, most similar first
+    """
+    return get_paragraph_index(cache_dir, language, model_name).search(text, top_k, documents)
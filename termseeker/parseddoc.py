@@ -0,0 +1,391 @@
+"""
+Parsed markdown documents for TermSeeker
+
+A ParsedDocument is built once per converted markdown document and reused by the paragraph
+search, the alignment and the language detection, instead of splitting and classifying the
+paragraphs of the same document again for every call. It holds, in compact arrays:
+- The offsets of the raw paragraphs (text split on blank lines) in the markdown text
+- Flags of each raw paragraph (separator or note, page number, footnote, complete sentence,
+  numbered paragraph start)
+- The paragraph number of numbered paragraphs ("12. ..."), or -1
+- The segments used for alignment: ranges of raw paragraphs merged into complete thoughts
+
+Parsed documents are kept in memory and saved in {cache_dir}/parsed/, next to the markdown cache.
+"""
+
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+# Flags of the raw paragraphs
+SEPARATOR = 1
+COMPLETE = 2
+NUMBERED = 4
+PAGE_NUMBER = 8
+FOOTNOTE = 16
+
+# Version of the serialized format, parsed documents saved with another version are rebuilt
+FORMAT_VERSION = 2
+
+# Maximum number of parsed documents kept in memory
+MAX_DOCUMENTS_IN_MEMORY = 32
+
+# Global variable to store the parsed documents in memory, by text hash
+parsed_documents = OrderedDict()
+
+
+def text_hash(text) -> str:
+    """
+    Compute the hash identifying a markdown text.
+
+    Args:
+        text (str): The markdown text
+
+    Returns:
+        str: Hexadecimal SHA-1 digest of the text
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class ParsedDocument:
+    """
+    Paragraph structure of a markdown document.
+
+    Args:
+        text (str): The markdown text
+        offsets (np.ndarray): (n, 2) start and end offsets of the raw paragraphs in the text
+        flags (np.ndarray): (n,) SEPARATOR, COMPLETE, NUMBERED, PAGE_NUMBER and FOOTNOTE flags of the raw paragraphs
+        numbers (np.ndarray): (n,) paragraph number of numbered paragraphs, -1 otherwise
+        segments (np.ndarray): (m, 2) start and end (excluded) raw paragraph of each alignment segment
+    """
+
+    def __init__(self, text, offsets, flags, numbers, segments):
+        self.text = text
+        self.offsets = offsets
+        self.flags = flags
+        self.numbers = numbers
+        self.segments = segments
+        self._paragraphs = None
+        self._segment_texts = None
+        self._languages = {}
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Parse a markdown text.
+
+        Args:
+            text (str): The markdown text
+
+        Returns:
+            ParsedDocument: The parsed document
+        """
+        from .utils import classify_paragraphs
+
+        paragraphs = text.split('\n\n')
+        lengths = np.fromiter((len(paragraph) for paragraph in paragraphs), dtype=np.int64, count=len(paragraphs))
+        # Each paragraph is followed by the two newlines of the split
+        starts = np.concatenate(([0], np.cumsum(lengths + 2)[:-1]))
+        offsets = np.stack((starts, starts + lengths), axis=1)
+        flags, numbers = classify_paragraphs(paragraphs)
+
+        document = cls(text, offsets, flags, numbers, np.zeros((0, 2), dtype=np.int32))
+        document.segments = document._build_segments()
+        return document
+
+    # =============================================
+    # Raw paragraphs
+    # =============================================
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def paragraphs(self) -> list:
+        """The raw paragraphs of the document (text split on blank lines)."""
+        if self._paragraphs is None:
+            self._paragraphs = [self.text[start:end] for start, end in self.offsets]
+        return self._paragraphs
+
+    def is_separator(self, i) -> bool:
+        return bool(self.flags[i] & SEPARATOR)
+
+    def is_complete(self, i) -> bool:
+        return bool(self.flags[i] & COMPLETE)
+
+    def is_numbered(self, i) -> bool:
+        return bool(self.flags[i] & NUMBERED)
+
+    def is_page_number(self, i) -> bool:
+        return bool(self.flags[i] & PAGE_NUMBER)
+
+    def is_footnote(self, i) -> bool:
+        return bool(self.flags[i] & FOOTNOTE)
+
+    def merge_from(self, i) -> str:
+        """
+        Merge the raw paragraph at index i with its continuation paragraphs if it is incomplete.
+        Separators and notes are skipped, and merging stops once the text is complete, at a new
+        numbered paragraph, or after 5 paragraphs.
+
+        Args:
+            i (int): Index of the raw paragraph
+
+        Returns:
+            str: The paragraph, possibly merged with continuation text
+        """
+        paragraphs = self.paragraphs
+        parts = [paragraphs[i]]
+        needs_continuation = not self.is_complete(i)
+        next_index = i + 1
+
+        while needs_continuation and next_index < len(paragraphs):
+            # If it's a separator or note, skip it but continue looking
+            if self.is_separator(next_index):
+                next_index += 1
+                continue
+
+            # A new numbered paragraph is a new thought rather than a continuation
+            if not self.is_numbered(next_index):
+                parts.append(paragraphs[next_index].strip())
+                if self.is_complete(next_index):
+                    needs_continuation = False
+                else:
+                    next_index += 1
+            else:
+                needs_continuation = False
+
+            # Arbitrary limit to prevent excessive merging
+            if next_index > i + 5:
+                needs_continuation = False
+
+        return " ".join(parts)
+
+    # =============================================
+    # Alignment segments
+    # =============================================
+
+    def _build_segments(self) -> np.ndarray:
+        """Group the raw paragraphs into complete thoughts, skipping separators and notes."""
+        n = len(self)
+        segments = []
+        i = 0
+        while i < n:
+            # Skip separator or note paragraphs
+            if self.is_separator(i):
+                i += 1
+                continue
+
+            next_index = i + 1
+            complete = self.is_complete(i)
+            # Try to find continuation paragraphs of incomplete paragraphs
+            while not complete and next_index < n:
+                if self.is_separator(next_index):
+                    next_index += 1
+                    continue
+                if self.is_numbered(next_index):
+                    break
+                complete = self.is_complete(next_index)
+                next_index += 1
+                if next_index > i + 5:
+                    break
+
+            segments.append((i, next_index))
+            i = next_index
+
+        return np.array(segments, dtype=np.int32).reshape(-1, 2)
+
+    @property
+    def segment_texts(self) -> list:
+        """The text of each alignment segment (its non-separator paragraphs joined by spaces)."""
+        if self._segment_texts is None:
+            paragraphs = self.paragraphs
+            self._segment_texts = [
+                " ".join(paragraphs[k].strip() for k in range(start, end) if not self.is_separator(k))
+                for start, end in self.segments
+            ]
+        return self._segment_texts
+
+    @property
+    def segment_numbers(self) -> np.ndarray:
+        """The paragraph number of each alignment segment (-1 if it does not start a numbered paragraph)."""
+        return self.numbers[self.segments[:, 0]] if len(self.segments) else np.zeros(0, dtype=np.int32)
+
+    # =============================================
+    # Structural anchors
+    # =============================================
+
+    def find_paragraph(self, paragraph) -> int:
+        """
+        Find the raw paragraph a paragraph of this document starts at (e.g. a paragraph returned
+        by find_paragraphs_with_merge, possibly merged with its continuation).
+
+        Returns:
+            int: Index of the raw paragraph, or -1 if the paragraph is not from this document
+        """
+        candidate = -1
+        for i, text in enumerate(self.paragraphs):
+            if self.is_separator(i) or not paragraph.startswith(text):
+                continue
+            if self.merge_from(i) == paragraph:
+                return i
+            if candidate < 0:
+                candidate = i
+        return candidate
+
+    def segment_of(self, i) -> int:
+        """Index of the alignment segment holding raw paragraph i (or of the next segment for a separator)."""
+        k = int(np.searchsorted(self.segments[:, 0], i, side='right')) - 1
+        if k < 0 or i >= self.segments[k, 1]:
+            k += 1
+        return min(max(k, 0), len(self.segments) - 1)
+
+    def segment_anchor(self, k) -> tuple:
+        """
+        Structural position of an alignment segment.
+
+        Returns:
+            tuple: (number of the numbered paragraph the segment is in or -1, number of segments
+                    since that numbered paragraph or since the start, relative position in the document)
+        """
+        numbered = np.flatnonzero(self.segment_numbers[:k + 1] >= 0)
+        position = k / max(1, len(self.segments) - 1)
+        if len(numbered):
+            return int(self.segment_numbers[numbered[-1]]), k - int(numbered[-1]), position
+        return -1, k, position
+
+    def anchor_window(self, number, offset, position, window, position_window) -> np.ndarray:
+        """
+        Segments around the place of a structural anchor in this document: the segments near
+        the numbered paragraph of the same number (the nearest to the relative position when the
+        number is used several times, e.g. in annexes), or near the relative position otherwise.
+
+        Args:
+            number (int): Paragraph number, -1 if unknown
+            offset (int): Number of segments after the numbered paragraph
+            position (float): Relative position in the document (0 to 1), None if unknown
+            window (int): Number of segments taken on each side of a numbered anchor
+            position_window (int): Number of segments taken on each side of a position anchor
+
+        Returns:
+            np.ndarray: Sorted segment indices, empty if the anchor cannot be placed
+        """
+        m = len(self.segments)
+        if not m:
+            return np.zeros(0, dtype=np.int64)
+        centers = np.zeros(0, dtype=np.int64)
+        if number >= 0:
+            centers = np.flatnonzero(self.segment_numbers == number)
+            if len(centers) > 1 and position is not None:
+                centers = centers[[np.argmin(np.abs(centers / max(1, m - 1) - position))]]
+            centers = np.minimum(centers + offset, m - 1)
+        if not len(centers):
+            if position is None:
+                return np.zeros(0, dtype=np.int64)
+            centers, window = np.array([round(position * (m - 1))]), position_window
+        return np.unique(np.concatenate([np.arange(max(0, c - window), min(m, c + window + 1)) for c in centers]))
+
+    def segment_language(self, k, detect) -> str:
+        """
+        Get the language of an alignment segment, detected once per document.
+
+        Args:
+            k (int): Index of the segment
+            detect (callable): Language detection function returning an ISO 639-1 code
+
+        Returns:
+            str: The language code of the segment
+        """
+        if k not in self._languages:
+            self._languages[k] = detect(self.segment_texts[k])
+        return self._languages[k]
+
+    # =============================================
+    # Serialization
+    # =============================================
+
+    def save(self, path):
+        """
+        Save the parsed structure (without the text) to a .npz file.
+
+        Args:
+            path (str): Path of the .npz file
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, version=np.array(FORMAT_VERSION), text_hash=np.array(text_hash(self.text)),
+                         offsets=self.offsets, flags=self.flags, numbers=self.numbers, segments=self.segments)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, text):
+        """
+        Load a parsed structure saved with save.
+
+        Args:
+            path (str): Path of the .npz file
+            text (str): The markdown text the structure was built from
+
+        Returns:
+            ParsedDocument: The parsed document, or None if the file does not match the text or format
+        """
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION or str(data["text_hash"]) != text_hash(text):
+                return None
+            return cls(text, data["offsets"], data["flags"], data["numbers"], data["segments"])
+
+
+def get_parsed_path(cache_dir, hash_value) -> str:
+    """Path of the serialized parsed document of a text in the markdown cache directory."""
+    return os.path.join(cache_dir, "parsed", f"{hash_value}.npz")
+
+
+def parse_document(text, cache_dir=None) -> ParsedDocument:
+    """
+    Get the parsed structure of a markdown text, building it only once.
+
+    The parsed document is looked up in memory, then in the markdown cache directory (if given),
+    and is only built when it is found in neither.
+
+    Args:
+        text (str): The markdown text
+        cache_dir (str, optional): Directory of the markdown cache
+
+    Returns:
+        ParsedDocument: The parsed document
+    """
+    hash_value = text_hash(text)
+    document = parsed_documents.get(hash_value)
+
+    if document is None and cache_dir:
+        path = get_parsed_path(cache_dir, hash_value)
+        if os.path.exists(path):
+            try:
+                document = ParsedDocument.load(path, text)
+            except Exception as e:
+                print(f"\t\tparseddoc.py -> error reading {path}: {e}")
+
+    if document is None:
+        document = ParsedDocument.from_text(text)
+        if cache_dir:
+            try:
+                document.save(get_parsed_path(cache_dir, hash_value))
+            except Exception as e:
+                print(f"\t\tparseddoc.py -> error saving parsed document: {e}")
+
+    # Keep the most recently used documents in memory
+    parsed_documents[hash_value] = document
+    parsed_documents.move_to_end(hash_value)
+    while len(parsed_documents) > MAX_DOCUMENTS_IN_MEMORY:
+        parsed_documents.popitem(last=False)
+
+    return document
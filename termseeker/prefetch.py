@@ -0,0 +1,185 @@
+"""
+Document prefetching for TermSeeker
+
+This module downloads and converts the language versions of UN documents ahead of time:
+- A thread pool downloads the PDF files from the ODS, with a concurrency limit per host
+- A process pool converts the downloaded PDF files to markdown (pymupdf4llm is CPU bound)
+
+Documents are converted into the same markdown cache as convert_pdf_to_markdown, so
+a document that is already cached is read from disk without any download.
+"""
+
+import os
+import threading
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .convert import get_markdown_cache_paths, download_pdf, pdf_file_to_markdown
+
+
+class DocumentPrefetcher:
+    """
+    Download and convert PDF documents in the background.
+
+    Args:
+        cache_dir (str): Directory of the markdown cache
+        download_workers (int): Maximum number of simultaneous downloads
+        convert_workers (int): Number of conversion processes (0 converts in the download threads)
+        max_per_host (int): Default maximum number of simultaneous downloads from one host
+        host_limits (dict): Maximum number of simultaneous downloads for specific hosts,
+                            e.g. {"daccess-ods.un.org": 2}
+        on_stage (callable): Function called with ("download" or "markdown", url, file_name) when
+                             a document is downloaded and when its markdown is ready (e.g. RunJournal records)
+
+    Example:
+        with DocumentPrefetcher("/content") as prefetcher:
+            prefetcher.prefetch(urls["Spanish"], "UNEP_EA.5_HLS.1_Spanish.txt")
+            ...
+            spanishMD = prefetcher.get(urls["Spanish"], "UNEP_EA.5_HLS.1_Spanish.txt")
+    """
+
+    def __init__(self, cache_dir, download_workers=6, convert_workers=2, max_per_host=3, host_limits=None, on_stage=None):
+        self.cache_dir = cache_dir
+        self.max_per_host = max_per_host
+        self.host_limits = dict(host_limits or {})
+        self.on_stage = on_stage
+        self._host_semaphores = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._download_pool = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="termseeker-download")
+        self._convert_pool = None
+        if convert_workers:
+            try:
+                self._convert_pool = ProcessPoolExecutor(max_workers=convert_workers)
+            except Exception as e:
+                print(f"\t\tprefetch.py -> process pool unavailable, converting in threads: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _host_semaphore(self, url):
+        """Get the semaphore limiting the simultaneous downloads from the host of a URL."""
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                limit = self.host_limits.get(host, self.max_per_host)
+                self._host_semaphores[host] = threading.BoundedSemaphore(max(1, limit))
+            return self._host_semaphores[host]
+
+    def _notify(self, stage, url, file_name):
+        """Report a completed stage of a document to the on_stage function."""
+        if self.on_stage is not None:
+            try:
+                self.on_stage(stage, url, file_name)
+            except Exception as e:
+                print(f"\t\tprefetch.py -> error reporting the {stage} of {url}: {e}")
+
+    def _convert(self, temp_path, cache_path, future, url=None, file_name=None):
+        """Convert a downloaded file in the process pool and resolve the future with the markdown."""
+        if self._convert_pool is not None:
+            try:
+                conversion = self._convert_pool.submit(pdf_file_to_markdown, temp_path, cache_path, True)
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"\t\tprefetch.py -> process pool unavailable, converting in thread: {e}")
+                self._convert_pool = None
+            else:
+                def resolve(done):
+                    try:
+                        markdown = done.result()
+                    except Exception as e:
+                        future.set_exception(e)
+                        return
+                    self._notify("markdown", url, file_name)
+                    future.set_result(markdown)
+                conversion.add_done_callback(resolve)
+                return
+
+        markdown = pdf_file_to_markdown(temp_path, cache_path, remove_file=True)
+        self._notify("markdown", url, file_name)
+        future.set_result(markdown)
+
+    def _fetch(self, url, file_name, future):
+        """Read the cached markdown of a document, or download it and hand it to the conversion."""
+        try:
+            cached_path, cache_path = get_markdown_cache_paths(url, self.cache_dir, file_name)
+            if cached_path:
+                print(f"\t\tprefetch.py -> using cached version from {cached_path}")
+                with open(cached_path, 'r', encoding='utf-8') as f:
+                    markdown = f.read()
+                self._notify("markdown", url, file_name)
+                future.set_result(markdown)
+                return
+
+            with self._host_semaphore(url):
+                temp_path = download_pdf(url)
+            self._notify("download", url, file_name)
+            self._convert(temp_path, cache_path, future, url, file_name)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+
+    def prefetch(self, url, file_name=None) -> Future:
+        """
+        Schedule the download and conversion of a document, if not already scheduled.
+
+        Args:
+            url (str): URL of the PDF document
+            file_name (str, optional): File name to use in the markdown cache
+
+        Returns:
+            Future: Future resolved with the markdown content of the document
+        """
+        key = (url, file_name)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = Future()
+                self._futures[key] = future
+                self._download_pool.submit(self._fetch, url, file_name, future)
+        return future
+
+    def get(self, url, file_name=None) -> str:
+        """
+        Get the markdown content of a document, waiting for its download and conversion.
+
+        Args:
+            url (str): URL of the PDF document
+            file_name (str, optional): File name to use in the markdown cache
+
+        Returns:
+            str: The document content in Markdown format, or an empty string on error
+        """
+        future = self.prefetch(url, file_name)
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error converting PDF to Markdown: {e}")
+            return ""
+        finally:
+            # The markdown is handed over once, keep only pending futures in memory
+            with self._lock:
+                self._futures.pop((url, file_name), None)
+
+    def discard(self, url, file_name=None):
+        """
+        Forget a prefetched document that will not be read with get, so its markdown is not
+        kept in memory. A download in progress still completes and fills the markdown cache.
+        """
+        with self._lock:
+            self._futures.pop((url, file_name), None)
+
+    def close(self):
+        """Cancel the pending downloads and shut down the worker pools."""
+        self._download_pool.shutdown(wait=True, cancel_futures=True)
+        if self._convert_pool is not None:
+            self._convert_pool.shutdown(wait=True, cancel_futures=True)
+        # Futures whose download was cancelled will never be resolved
+        with self._lock:
+            for future in self._futures.values():
+                if not future.done():
+                    future.cancel()
+            self._futures.clear()
@@ -0,0 +1,221 @@
+"""
+Streaming result sink for TermSeeker
+
+This module writes the results of getCandidates and getCandidatesBatch to disk as soon as
+each one is complete, so a crash does not lose the work done before it:
+- Each result (one document of one term) is appended as a line of a JSON Lines file with a
+  fixed schema (metadata, paragraphs, terms and synonyms of every language), and flushed
+- The terms completed by a batch are recorded next to the results, so a rerun resumes after them
+- A line cut by a crash is dropped when the file is opened again
+- The Excel workbook is produced at the end from the file, instead of from the results in memory
+"""
+
+import os
+import json
+import threading
+
+# Metadata columns of a result
+RESULT_METADATA = ["EnglishTerm", "docSymbol", "publicationDate", "docType", "docTitle"]
+
+# Languages of the document URLs (see get_un_document_urls)
+RESULT_URL_LANGUAGES = ["Arabic", "Chinese", "English", "French", "Russian", "Spanish"]
+
+# Target languages with paragraph, term and synonym columns
+RESULT_LANGUAGES = ["French", "Spanish", "Chinese", "Russian", "Arabic", "Portuguese", "Swahili"]
+
+
+def result_schema() -> dict:
+    """
+    Get the fixed schema of the results.
+
+    Returns:
+        dict: Polars data type of each column, in column order
+    """
+    import polars as pl
+
+    schema = {column: pl.Utf8 for column in RESULT_METADATA}
+    schema["docURLs"] = pl.Struct({lang: pl.Utf8 for lang in RESULT_URL_LANGUAGES})
+    schema["EnglishParagraphs"] = pl.List(pl.Utf8)
+    for lang in RESULT_LANGUAGES:
+        schema[f"{lang}Paragraphs"] = pl.List(pl.Utf8)
+        schema[f"{lang}Term"] = pl.Utf8
+        schema[f"{lang}Synonyms"] = pl.List(pl.Utf8)
+    return schema
+
+
+def _to_column_value(value, dtype):
+    """Convert a value of a result to the type of its column."""
+    if value is None:
+        return None
+    import polars as pl
+    if dtype == pl.Utf8:
+        return str(value)
+    if isinstance(dtype, pl.List):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        # Paragraphs may be (text, score) tuples
+        return [str(item[0] if isinstance(item, tuple) else item) for item in values]
+    if isinstance(dtype, pl.Struct):
+        return {lang: value.get(lang) for lang in RESULT_URL_LANGUAGES}
+    return value
+
+
+class ResultSink:
+    """
+    JSON Lines file of results, appended as they are complete.
+
+    Args:
+        path (str): Path of the JSON Lines file, created if needed
+        resume (bool): If True, the results already in the file are kept, otherwise the file is emptied
+
+    Example:
+        with ResultSink("glossary_results.jsonl") as sink:
+            for term in terms:
+                if term in sink.completed_terms:
+                    continue
+                sink.write_term(term, getCandidates(term, ...))
+            sink.export_excel("glossary_results.xlsx")
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.progress_path = path + ".complete"
+        self.schema = result_schema()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume:
+            for file_path in (self.path, self.progress_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        self._truncate_partial_line()
+
+        self.completed_terms = set()
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                self.completed_terms = {line.rstrip("\n") for line in f if line.strip()}
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _truncate_partial_line(self):
+        """Drop the last line of the file if a crash cut it before its end."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                f.truncate(content.rfind(b"\n") + 1)
+                print(f"\t\tresultsink.py -> dropped an incomplete result at the end of {self.path}")
+
+    def to_record(self, resultItem) -> dict:
+        """Convert a result item to a record with the columns of the schema. Other keys are left out."""
+        return {column: _to_column_value(resultItem.get(column), dtype) for column, dtype in self.schema.items()}
+
+    def _write_lines(self, resultItems):
+        lines = "".join(json.dumps(self.to_record(item), ensure_ascii=False) + "\n" for item in resultItems)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def write(self, resultItem):
+        """Append a result, flushed to disk before returning."""
+        self._write_lines([resultItem])
+
+    def write_term(self, term, resultItems):
+        """
+        Append all the results of a term and record the term as complete.
+        Results of the term written by an interrupted run are replaced.
+        """
+        if term in self.completed_terms:
+            return
+        self.discard(term)
+        self._write_lines(resultItems)
+        with self._lock:
+            with open(self.progress_path, 'a', encoding='utf-8') as f:
+                f.write(term + "\n")
+            self.completed_terms.add(term)
+
+    def records(self, term=None) -> list:
+        """
+        Read the results in the file, without the columns that have no value.
+
+        Args:
+            term (str, optional): Only read the results of this English term
+
+        Returns:
+            list: The result dictionaries, in file order
+        """
+        with self._lock:
+            self._file.flush()
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if term is None or record.get("EnglishTerm") == term:
+                    records.append({key: value for key, value in record.items() if value is not None})
+        return records
+
+    def discard(self, term):
+        """Remove the results of a term that is not complete (e.g. written before a crash)."""
+        if term in self.completed_terms:
+            return
+        with self._lock:
+            self._file.flush()
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            kept = [line for line in lines if json.loads(line).get("EnglishTerm") != term]
+            if len(kept) == len(lines):
+                return
+            self._file.close()
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(kept)
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def to_dataframe(self) -> "pl.DataFrame":
+        """Read the results in the file as a DataFrame with the fixed schema."""
+        import polars as pl
+
+        with self._lock:
+            self._file.flush()
+        if os.path.getsize(self.path) == 0:
+            return pl.DataFrame(schema=self.schema)
+        return pl.read_ndjson(self.path, schema=self.schema)
+
+    def export_excel(self, filename=None) -> str:
+        """
+        Write the consolidated results of all the terms in the file to an Excel workbook
+        (see consolidate_results).
+
+        Args:
+            filename (str, optional): Path of the workbook. Defaults to the path of the file with an .xlsx extension.
+
+        Returns:
+            str: The path of the workbook, or None if there are no results
+        """
+        import polars as pl
+        from .utils import consolidate_results
+
+        consolidated = consolidate_results(self.to_dataframe())
+        if not consolidated:
+            print("No results to export.")
+            return None
+
+        filename = filename or os.path.splitext(self.path)[0] + ".xlsx"
+        pl.DataFrame(consolidated, strict=False).write_excel(filename)
+        print(f"Exported consolidated results to '{filename}'")
+        return filename
+
+    def close(self):
+        """Close the file."""
+        with self._lock:
+            self._file.close()
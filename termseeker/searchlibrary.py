@@ -5,48 +5,80 @@ This module provides functions for:
 - Accessing the UN Digital Library for document retrieval
 - Performing advanced searches
 - Extracting metadata from UN Library documents
+- Caching the parsed results of each search page, so identical searches are sent once
 """
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
+import re
 import json
 import urllib.parse
 import base64
+import threading
+from collections import OrderedDict
+from .transport import http_get
 
-def access_un_library_by_term_and_symbol(term, document_symbol) -> str:
+# Number of results per search page (rg parameter of the UN Digital Library)
+PAGE_SIZE = 50
+
+# Maximum number of search pages kept in the search cache
+SEARCH_CACHE_SIZE = 512
+
+# Global variable to store the parsed search pages, by normalized query parameters
+search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+_search_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _page_parameter(page) -> str:
+    """URL parameter of the first record of a search page (jrec), empty for the first page."""
+    return f"&jrec={(page - 1) * PAGE_SIZE + 1}" if page > 1 else ""
+
+
+def un_library_search_url(term, document_symbol, page=1) -> str:
+    """
+    Build the URL of a UN Digital Library search by term and document symbol.
+
+    Args:
+        term (str): The search term to look for in the full text.
+        document_symbol (str): The document symbol to filter the search results.
+        page (int): The page of results, starting at 1.
+
+    Returns:
+        str: The search URL
+    """
+    # Base URL
+    base_url = "https://digitallibrary.un.org/search?"
+
+    # Construct the URL with the provided term and document symbol
+    return (
+        f"{base_url}ln=en&as=1&m1=p&p1={document_symbol}&f1=documentsymbol&op1=a"
+        f"&m2=p&p2={term}&f2=fulltext&op2=a&rm=&sf=title&so=a&rg={PAGE_SIZE}"
+        f"&c=United+Nations+Digital+Library+System&of=hb&fti=1{_page_parameter(page)}"
+    )
+
+
+def access_un_library_by_term_and_symbol(term, document_symbol, page=1) -> str:
     """
     Access the UN Digital Library and search for documents by term and document symbol.
 
     Args:
         term (str): The search term to look for in the full text.
         document_symbol (str): The document symbol to filter the search results.
+        page (int, optional): The page of results, starting at 1. Defaults to 1.
 
     Returns:
         str: The HTML content of the search results page if the request is successful, None otherwise.
     """
     try:
-        # Base URL
-        base_url = "https://digitallibrary.un.org/search?"
-
-        # Construct the URL with the provided term and document symbol
-        url = (
-            f"{base_url}ln=en&as=1&m1=p&p1={document_symbol}&f1=documentsymbol&op1=a"
-            f"&m2=p&p2={term}&f2=fulltext&op2=a&rm=&sf=title&so=a&rg=50"
-            f"&c=United+Nations+Digital+Library+System&of=hb&fti=1"
-        )
-
         # Send an HTTP GET request to the URL
-        response = requests.get(url)
+        response = http_get(un_library_search_url(term, document_symbol, page))
 
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
             print("Request was successful. Content:")
 
-            # Parse the HTML content using BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
-
             # Return the HTML content
-            return soup.prettify()
+            return response.text
         else:
             print(f"Failed to retrieve the URL. Status code: {response.status_code}")
             return None
@@ -54,15 +86,16 @@ def access_un_library_by_term_and_symbol(term, document_symbol) -> str:
         print(f"An error occurred: {str(e)}")
         return None
 
-def adv_search_un_library(document_symbol=None, fulltext_term=None, date_from=None, date_to=None):
+def adv_search_url(document_symbol=None, fulltext_term=None, date_from=None, date_to=None, page=1) -> str:
     """
-    Build a search URL for the UN Digital Library
+    Build an advanced search URL for the UN Digital Library
 
     Args:
         document_symbol: Document symbol or symbols (can be a string or list)
         fulltext_term: Term to search in full text
         date_from: Start date in YYYY-MM-DD format
         date_to: End date in YYYY-MM-DD format
+        page: The page of results, starting at 1
 
     Returns:
         Search URL for the UN Digital Library
@@ -114,7 +147,7 @@ def adv_search_un_library(document_symbol=None, fulltext_term=None, date_from=No
         ("ln", "en"),
         ("as", "1"),
         ("so", "d"),
-        ("rg", "50"),
+        ("rg", str(PAGE_SIZE)),
         ("c", "Resource Type"),  # Note: space, not +
         ("c", "UN Bodies"),      # Separate parameter
         ("of", "hb"),
@@ -133,37 +166,136 @@ def adv_search_un_library(document_symbol=None, fulltext_term=None, date_from=No
         else:
             url_parts.append(f"{key}={urllib.parse.quote(value)}")
 
-    url = base_url + "&" + "&".join(url_parts) + "#searchresultsbox"
+    return base_url + "&" + "&".join(url_parts) + _page_parameter(page) + "#searchresultsbox"
+
+def adv_search_un_library(document_symbol=None, fulltext_term=None, date_from=None, date_to=None, page=1):
+    """
+    Search the UN Digital Library with an advanced search (see adv_search_url)
+
+    Args:
+        document_symbol: Document symbol or symbols (can be a string or list)
+        fulltext_term: Term to search in full text
+        date_from: Start date in YYYY-MM-DD format
+        date_to: End date in YYYY-MM-DD format
+        page: The page of results, starting at 1
+
+    Returns:
+        The HTML content of the search results page if the request is successful, None otherwise
+    """
+    url = adv_search_url(document_symbol, fulltext_term, date_from, date_to, page)
 
     print(url)
     # Send an HTTP GET request to the URL
-    response = requests.get(url)
+    response = http_get(url)
 
     # Check if the request was successful (status code 200)
     if response.status_code == 200:
         print("Request was successful. Content:")
 
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-
         # Return the HTML content
-        return soup.prettify()
+        return response.text
     else:
         print(f"Failed to retrieve the URL. Status code: {response.status_code}")
         return None
 
+
+def _normalize_query_text(text) -> str:
+    """Normalize a search term or symbol for the cache key: case and extra whitespace do not change a search."""
+    return re.sub(r"\s+", " ", str(text or "")).strip().casefold()
+
+
+def search_cache_key(term, document_symbols, page=1) -> tuple:
+    """
+    Get the key of a search in the search cache.
+
+    Args:
+        term (str): The search term
+        document_symbols (str or list): The document symbol filter(s), empty for a general search
+        page (int): The page of results
+
+    Returns:
+        tuple: The normalized query parameters
+    """
+    if isinstance(document_symbols, (list, tuple)):
+        symbols = tuple(sorted({_normalize_query_text(symbol) for symbol in document_symbols if symbol}))
+    else:
+        symbols = (_normalize_query_text(document_symbols),) if document_symbols else ()
+    return (_normalize_query_text(term), symbols, int(page))
+
+
+def search_un_library(term, document_symbols=None, page=1) -> list:
+    """
+    Search the UN Digital Library and return the metadata of the results, parsed from the page directly.
+    A single symbol is searched by term and symbol, several symbols with an advanced search.
+    Results are cached by normalized query parameters, failed requests are not cached.
+
+    Args:
+        term (str): The search term to look for in the full text
+        document_symbols (str or list, optional): Document symbol(s) to filter the search. Empty for a general search.
+        page (int, optional): The page of results, starting at 1. Defaults to 1.
+
+    Returns:
+        list: The metadata dictionaries of the results (see extract_metadata_UNLib), or None if the request failed
+    """
+    key = search_cache_key(term, document_symbols, page)
+    with _search_cache_lock:
+        if key in search_cache:
+            search_cache.move_to_end(key)
+            _search_cache_stats["hits"] += 1
+            return [dict(metadata) for metadata in search_cache[key]]
+        _search_cache_stats["misses"] += 1
+
+    symbols = [document_symbols] if isinstance(document_symbols, str) else list(document_symbols or [])
+    if len(symbols) > 1:
+        html_content = adv_search_un_library(document_symbol=symbols, fulltext_term=term, page=page)
+    else:
+        html_content = access_un_library_by_term_and_symbol(term, symbols[0] if symbols else "", page)
+    if html_content is None:
+        return None
+
+    metadata_list = extract_metadata_UNLib(BeautifulSoup(html_content, 'html.parser'))
+    with _search_cache_lock:
+        search_cache[key] = [dict(metadata) for metadata in metadata_list]
+        search_cache.move_to_end(key)
+        while len(search_cache) > SEARCH_CACHE_SIZE:
+            search_cache.popitem(last=False)
+    return metadata_list
+
+
+def get_search_cache_stats() -> dict:
+    """
+    Get the counters of the search cache.
+
+    Returns:
+        dict: hits, misses and number of cached pages
+    """
+    with _search_cache_lock:
+        return dict(_search_cache_stats, entries=len(search_cache))
+
+
+def clear_search_cache():
+    """Forget the cached search pages and reset the counters."""
+    with _search_cache_lock:
+        search_cache.clear()
+        _search_cache_stats.update(hits=0, misses=0)
+
+def _icon_text(icon) -> str:
+    """Text following an icon of a search result (e.g. the document symbol after the globe icon)."""
+    sibling = icon.next_sibling
+    return sibling.strip() if isinstance(sibling, NavigableString) else ""
+
+
 def extract_document_symbols(html_content) -> list:
     """
     Extract document symbols from the given HTML content.
 
     Args:
-        html_content (str): The HTML content of the search results page.
+        html_content (str or BeautifulSoup): The HTML content of the search results page, or the already parsed page.
 
     Returns:
         list: A list of extracted document symbols.
     """
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = html_content if isinstance(html_content, BeautifulSoup) else BeautifulSoup(html_content, 'html.parser')
     document_symbols = []
 
     # Find all div elements with class 'brief-options'
@@ -171,7 +303,7 @@ def extract_document_symbols(html_content) -> list:
         # Find the first <i> tag with class 'fa-globe' and get the next sibling text
         globe_icon = div.find('i', class_='fa-globe')
         if globe_icon:
-            document_symbol = globe_icon.next_sibling.strip()
+            document_symbol = _icon_text(globe_icon)
             document_symbols.append(document_symbol)
 
     return document_symbols
@@ -182,13 +314,12 @@ def extract_metadata_UNLib(html_content) -> list:
     Extract metadata from the UN Digital Library search results.
 
     Args:
-        html_content (str): The HTML content of the search results page.
+        html_content (str or BeautifulSoup): The HTML content of the search results page, or the already parsed page.
 
     Returns:
         list: A list of dictionaries containing extracted metadata.
     """
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = html_content if isinstance(html_content, BeautifulSoup) else BeautifulSoup(html_content, 'html.parser')
     metadata_list = []
 
     # Find all div elements with class 'result-row'
@@ -198,17 +329,17 @@ def extract_metadata_UNLib(html_content) -> list:
         # Extract document symbol
         globe_icon = div.find('i', class_='fa-globe')
         if globe_icon:
-            metadata['docSymbol'] = globe_icon.next_sibling.strip()
+            metadata['docSymbol'] = _icon_text(globe_icon)
 
         # Extract publication date
         calendar_icon = div.find('i', class_='fa-calendar')
         if calendar_icon:
-            metadata['publicationDate'] = calendar_icon.next_sibling.strip()
+            metadata['publicationDate'] = _icon_text(calendar_icon)
 
         # Extract document type
         tag_icon = div.find('i', class_='fa-tag')
         if tag_icon:
-            metadata['docType'] = tag_icon.next_sibling.strip()
+            metadata['docType'] = _icon_text(tag_icon)
 
         # Extract document title
         result_title = div.find('div', class_='result-title')
@@ -0,0 +1,132 @@
+"""
+Multi-pattern term scanner for TermSeeker
+
+This module finds the occurrences of many terms in a document in a single pass, using an
+Aho-Corasick automaton. Terms and text are normalized the same way before matching:
+- Unicode case folding (e.g. "Straße" matches "STRASSE")
+- Hyphens followed by whitespace or a line break are removed, so hyphenation artifacts from
+  pymupdf4llm ("sustain-\\nable") and hyphenated compounds ("10-Year", "10- Year") match
+- Markdown emphasis markers (*, _, `) are removed and whitespace runs become a single space
+"""
+
+import re
+from collections import deque
+
+# Hyphens (ASCII, soft, Unicode hyphen and non-breaking hyphen) and the whitespace after them
+_HYPHENATION_PATTERN = re.compile(r'[\-\u00ad\u2010\u2011]\s*')
+_MARKDOWN_EMPHASIS_PATTERN = re.compile(r'[*_`]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Below this number of terms, plain substring checks on the normalized text are faster
+# than running the automaton in Python
+_SUBSTRING_SEARCH_LIMIT = 8
+
+
+def normalize_for_matching(text) -> str:
+    """
+    Normalize a text or a term before matching (case folding, hyphenation and markdown removal).
+
+    Args:
+        text (str): The text to normalize
+
+    Returns:
+        str: The normalized text
+    """
+    text = _MARKDOWN_EMPHASIS_PATTERN.sub('', text.casefold())
+    text = _HYPHENATION_PATTERN.sub('', text)
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+class TermScanner:
+    """
+    Aho-Corasick automaton finding which of many terms occur in a text.
+
+    Args:
+        terms (list): The terms to search for (duplicates are kept once)
+
+    Example:
+        scanner = TermScanner(["climate change", "biodiversity"])
+        hits = scanner.scan_paragraphs(markdown.split("\\n\\n"))
+        # {"climate change": [3, 17], "biodiversity": [8]}
+    """
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(terms))
+        self.patterns = [normalize_for_matching(term) for term in self.terms]
+
+        # Automaton: goto transitions, failure links and terms recognized in each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for term_index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._add_pattern(pattern, term_index)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern, term_index):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(term_index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail_state = self._fail[state]
+                while fail_state and char not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                self._fail[next_state] = self._goto[fail_state].get(char, 0)
+                # A state also recognizes the terms of its longest proper suffix
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def scan(self, text) -> set:
+        """
+        Find the terms occurring in a text.
+
+        Args:
+            text (str): The text to scan
+
+        Returns:
+            set: Indices (in self.terms) of the terms found in the text
+        """
+        normalized = normalize_for_matching(text)
+        if len(self.patterns) <= _SUBSTRING_SEARCH_LIMIT:
+            return {i for i, pattern in enumerate(self.patterns) if pattern and pattern in normalized}
+
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in normalized:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def scan_paragraphs(self, paragraphs) -> dict:
+        """
+        Find the paragraphs in which each term occurs.
+
+        Args:
+            paragraphs (list): The paragraphs of a document
+
+        Returns:
+            dict: Mapping of each term found to the sorted list of indices of the paragraphs containing it
+        """
+        hits = {}
+        for paragraph_index, paragraph in enumerate(paragraphs):
+            for term_index in self.scan(paragraph):
+                hits.setdefault(self.terms[term_index], []).append(paragraph_index)
+        return hits
@@ -0,0 +1,378 @@
+"""
+Local terminology store for TermSeeker
+
+This module keeps the UNTERM and FAOTERM results in a SQLite database, so terms that recur
+across glossaries are not scraped again:
+- The results of each search are stored with the time they were fetched, and are returned
+  instead of querying the database again while they are fresh
+- The English terms of the stored records are indexed (FTS5 trigram index, or LIKE when SQLite
+  has no FTS5), for exact, case-folded and substring lookups matching the priority rules of
+  consolidate_UNTermResults (exact matches for priorities 1, 2 and 5, substrings for 3 and 4)
+- In offline mode, nothing is fetched: stored searches are returned even if stale, and other
+  terms are answered from the index
+- Partial results (e.g. a results page that did not finish loading) are stored as already stale,
+  so they are fetched again online and only used offline
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Default directory of the store, next to the markdown cache
+DEFAULT_STORE_DIR = "/content"
+
+# Default number of seconds after which stored results are fetched again (90 days)
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+
+# Match levels of the index lookups, from the strictest
+MATCH_LEVELS = ("exact", "casefold", "substring")
+
+# Global variable to store the shared stores, by database path
+term_stores = {}
+_term_stores_lock = threading.Lock()
+
+
+def fold_term(term) -> str:
+    """Case-fold a term and collapse its whitespace, as UNTERM and FAOTERM searches ignore case."""
+    return " ".join(str(term).split()).casefold()
+
+
+def _record_key(record) -> str:
+    """Key of a record without identifier, from its content."""
+    payload = json.dumps(record, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _unterm_english_terms(row) -> list:
+    """English preferred and admitted terms of an UNTERM row."""
+    english = row.get("English") or {}
+    return [term for term_type in ("preferred", "admitted") for term in english.get(term_type, []) if term]
+
+
+class TermStore:
+    """
+    SQLite store of UNTERM and FAOTERM results with freshness timestamps.
+
+    Args:
+        path (str): Path of the SQLite database
+        max_age (float): Seconds after which stored results are stale (None for never)
+        offline (bool): Default of the offline argument of the lookups. If True, stored results are used
+                        even if stale and nothing should be fetched
+
+    Example:
+        store = TermStore("/content/termstore.sqlite")
+        rows = store.get_unterm("climate change")
+        if rows is None:
+            rows = queryUNTerm_http("climate change")
+            store.put_unterm("climate change", rows)
+    """
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE, offline=False):
+        self.path = path
+        self.max_age = max_age
+        self.offline = offline
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    source TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    fetched REAL NOT NULL,
+                    PRIMARY KEY (source, query)
+                );
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    fetched REAL NOT NULL,
+                    UNIQUE (source, key)
+                );
+                CREATE TABLE IF NOT EXISTS search_records (
+                    source TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    record_id INTEGER NOT NULL,
+                    PRIMARY KEY (source, query, position)
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    id INTEGER PRIMARY KEY,
+                    record_id INTEGER NOT NULL,
+                    term TEXT NOT NULL,
+                    folded TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS terms_term ON terms (term);
+                CREATE INDEX IF NOT EXISTS terms_folded ON terms (folded);
+                CREATE INDEX IF NOT EXISTS terms_record ON terms (record_id);
+                CREATE TABLE IF NOT EXISTS entries (
+                    entry_id TEXT PRIMARY KEY,
+                    metadata INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    fetched REAL NOT NULL
+                );""")
+            try:
+                self._connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS terms_fts USING fts5(folded, tokenize='trigram')")
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite without FTS5 or without the trigram tokenizer (older than 3.34)
+                self.fts = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the hit and miss counters."""
+        with self._lock:
+            self._stats = {"hits": 0, "misses": 0, "stale": 0, "index_hits": 0, "writes": 0}
+
+    def get_stats(self) -> dict:
+        """
+        Get the counters accumulated since the creation of the store or the last reset.
+
+        Returns:
+            dict: hits (fresh stored searches), misses, stale searches found, offline index hits
+                  and writes, with the numbers of stored searches, records and entries
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            for table in ("searches", "records", "entries"):
+                stats[table] = self._connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return stats
+
+    def is_fresh(self, fetched, offline=None) -> bool:
+        """Whether results fetched at a time (seconds since the epoch) can be used."""
+        offline = self.offline if offline is None else offline
+        return offline or self.max_age is None or time.time() - fetched <= self.max_age
+
+    def _get_search(self, source, query, offline=None):
+        """Get the records of a stored search, or None if it is not stored or stale."""
+        folded = fold_term(query)
+        with self._lock:
+            row = self._connection.execute("SELECT fetched FROM searches WHERE source = ? AND query = ?",
+                                           (source, folded)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            if not self.is_fresh(row[0], offline):
+                self._stats["stale"] += 1
+                return None
+            records = self._connection.execute("""
+                SELECT records.data FROM search_records JOIN records ON records.id = search_records.record_id
+                WHERE search_records.source = ? AND search_records.query = ? ORDER BY search_records.position""",
+                                               (source, folded)).fetchall()
+            self._stats["hits"] += 1
+        return [json.loads(data) for (data,) in records]
+
+    def _put_search(self, source, query, records, keys, terms, complete=True):
+        """
+        Store the records of a search with their keys and indexed terms, replacing the previous results.
+        Partial results are stored as fetched at time 0, so they are never fresh.
+        """
+        folded = fold_term(query)
+        now = time.time() if complete else 0.0
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM search_records WHERE source = ? AND query = ?", (source, folded))
+            for position, (record, key, record_terms) in enumerate(zip(records, keys, terms)):
+                self._connection.execute("""
+                    INSERT INTO records (source, key, data, fetched) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (source, key) DO UPDATE SET data = excluded.data, fetched = excluded.fetched""",
+                                         (source, key, json.dumps(record, ensure_ascii=False), now))
+                record_id = self._connection.execute("SELECT id FROM records WHERE source = ? AND key = ?",
+                                                     (source, key)).fetchone()[0]
+                self._index_terms(record_id, record_terms)
+                self._connection.execute("INSERT INTO search_records (source, query, position, record_id) VALUES (?, ?, ?, ?)",
+                                         (source, folded, position, record_id))
+            self._connection.execute("INSERT OR REPLACE INTO searches (source, query, fetched) VALUES (?, ?, ?)",
+                                     (source, folded, now))
+            self._stats["writes"] += 1
+
+    def _index_terms(self, record_id, record_terms):
+        """Replace the indexed terms of a record."""
+        if self.fts:
+            self._connection.execute("DELETE FROM terms_fts WHERE rowid IN (SELECT id FROM terms WHERE record_id = ?)",
+                                     (record_id,))
+        self._connection.execute("DELETE FROM terms WHERE record_id = ?", (record_id,))
+        for term in dict.fromkeys(record_terms):
+            term_id = self._connection.execute("INSERT INTO terms (record_id, term, folded) VALUES (?, ?, ?)",
+                                               (record_id, term, fold_term(term))).lastrowid
+            if self.fts:
+                self._connection.execute("INSERT INTO terms_fts (rowid, folded) VALUES (?, ?)", (term_id, fold_term(term)))
+
+    def find(self, source, term, match="substring") -> list:
+        """
+        Find stored records by one of their indexed terms.
+
+        Args:
+            source (str): "unterm" or "faoterm"
+            term (str): The term to look up
+            match (str): "exact" for identical terms, "casefold" to also ignore case and whitespace,
+                         or "substring" to also find the terms containing it. Defaults to "substring".
+
+        Returns:
+            list: The records, the exact matches first, then the case-folded and the substring matches
+        """
+        levels = MATCH_LEVELS[:MATCH_LEVELS.index(match) + 1]
+        folded = fold_term(term)
+        queries = {
+            "exact": ("SELECT record_id FROM terms WHERE term = ?", (term,)),
+            "casefold": ("SELECT record_id FROM terms WHERE folded = ?", (folded,)),
+        }
+        if self.fts and len(folded) >= 3:
+            # Trigram index, the term is quoted as a phrase so its characters are not read as FTS5 syntax
+            queries["substring"] = ("SELECT terms.record_id FROM terms_fts JOIN terms ON terms.id = terms_fts.rowid "
+                                    "WHERE terms_fts MATCH ? ORDER BY terms.id",
+                                    ('"' + folded.replace('"', '""') + '"',))
+        else:
+            escaped = folded.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            queries["substring"] = ("SELECT record_id FROM terms WHERE folded LIKE ? ESCAPE '\\' ORDER BY id",
+                                    (f"%{escaped}%",))
+
+        record_ids = {}
+        with self._lock:
+            for level in levels:
+                sql, params = queries[level]
+                for (record_id,) in self._connection.execute(sql, params):
+                    record_ids.setdefault(record_id, None)
+            records = []
+            for record_id in record_ids:
+                row = self._connection.execute("SELECT data FROM records WHERE id = ? AND source = ?",
+                                               (record_id, source)).fetchone()
+                if row is not None:
+                    records.append(json.loads(row[0]))
+        return records
+
+    def get_unterm(self, query, offline=None):
+        """
+        Get the UNTERM rows of a search (see queryUNTerm).
+        In offline mode, a term never searched is answered with the stored rows whose English
+        terms match it exactly or contain it.
+
+        Args:
+            query (str): The searched term
+            offline (bool, optional): Whether nothing will be fetched. Defaults to the offline setting of the store.
+
+        Returns:
+            list: The rows, or None if they have to be fetched
+        """
+        offline = self.offline if offline is None else offline
+        rows = self._get_search("unterm", query, offline)
+        if rows is None and offline:
+            rows = self.find("unterm", query)
+            if rows:
+                with self._lock:
+                    self._stats["index_hits"] += 1
+        return rows
+
+    def put_unterm(self, query, rows):
+        """Store the UNTERM rows of a search, indexed by their English preferred and admitted terms."""
+        self._put_search("unterm", query, rows, [_record_key(row) for row in rows],
+                         [_unterm_english_terms(row) for row in rows])
+
+    def get_faoterm(self, query, offline=None):
+        """
+        Get the FAOTERM results of a search (see queryFAOTerm).
+        In offline mode, a term never searched is answered with the stored results matching it.
+
+        Args:
+            query (str): The searched term
+            offline (bool, optional): Whether nothing will be fetched. Defaults to the offline setting of the store.
+
+        Returns:
+            list: The results, or None if they have to be fetched
+        """
+        offline = self.offline if offline is None else offline
+        results = self._get_search("faoterm", query, offline)
+        if results is None and offline:
+            results = self.find("faoterm", query)
+            if results:
+                with self._lock:
+                    self._stats["index_hits"] += 1
+        return results
+
+    def put_faoterm(self, query, results, complete=True):
+        """
+        Store the FAOTERM results of a search, indexed by their terms.
+        Partial results (complete=False, e.g. when the result rows did not finish loading) are never fresh.
+        """
+        self._put_search("faoterm", query, results, [_record_key(result) for result in results],
+                         [[result[0]] if result and result[0] else [] for result in results], complete)
+
+    def get_faoterm_entry(self, entryID, getMetadata=True, offline=None):
+        """
+        Get a stored FAOTERM entry (see getFAOtermsByEntry).
+        An entry stored with its metadata also answers requests without metadata.
+
+        Args:
+            entryID (str): The entry ID
+            getMetadata (bool): Whether the entry must have its metadata
+            offline (bool, optional): Whether nothing will be fetched. Defaults to the offline setting of the store.
+
+        Returns:
+            dict: The entry, or None if it has to be fetched
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT metadata, data, fetched FROM entries WHERE entry_id = ?",
+                                           (str(entryID),)).fetchone()
+            if row is None or (getMetadata and not row[0]):
+                self._stats["misses"] += 1
+                return None
+            if not self.is_fresh(row[2], offline):
+                self._stats["stale"] += 1
+                return None
+            self._stats["hits"] += 1
+        return json.loads(row[1])
+
+    def put_faoterm_entry(self, entryID, data, getMetadata=True, complete=True):
+        """
+        Store a FAOTERM entry.
+        A partial entry (complete=False, e.g. when a language panel could not be read) is never fresh.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO entries (entry_id, metadata, data, fetched) VALUES (?, ?, ?, ?)",
+                                     (str(entryID), int(bool(getMetadata)), json.dumps(data, ensure_ascii=False),
+                                      time.time() if complete else 0.0))
+            self._stats["writes"] += 1
+
+    def clear(self):
+        """Remove all the stored results."""
+        with self._lock, self._connection:
+            for table in ("searches", "records", "search_records", "terms", "entries"):
+                self._connection.execute(f"DELETE FROM {table}")
+            if self.fts:
+                self._connection.execute("DELETE FROM terms_fts")
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+def get_term_store_path(store_dir) -> str:
+    """Path of the terminology store in a directory."""
+    return os.path.join(store_dir, "termstore.sqlite")
+
+
+def get_term_store(store_dir=DEFAULT_STORE_DIR) -> TermStore:
+    """
+    Get the terminology store shared by all TermSeeker modules for a directory.
+    The lookups use the store only when it is passed to them (e.g. queryUNTerm(term, store=store)),
+    and whether they run offline is an argument of each lookup.
+
+    Args:
+        store_dir (str): Directory of the store. Defaults to the markdown cache directory.
+
+    Returns:
+        TermStore: The shared store
+    """
+    path = get_term_store_path(store_dir)
+    with _term_stores_lock:
+        if path not in term_stores:
+            term_stores[path] = TermStore(path)
+        return term_stores[path]
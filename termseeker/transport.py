@@ -0,0 +1,289 @@
+"""
+HTTP transport for TermSeeker
+
+This module provides the shared HTTP layer used to reach the UN endpoints
+(digitallibrary.un.org, daccess-ods.un.org, ...):
+- A pooled requests session, so connections are kept alive between requests
+- Per-host concurrency limits and a minimum interval between requests to the same host
+- Timeouts, and retries with exponential backoff on connection errors, 429 and 5xx responses
+- Counters for requests, bytes, latency and retries that can be read after a run
+"""
+
+import time
+import random
+import threading
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connect and read timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
+
+# Status codes worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Default limits for the UN hosts: simultaneous requests and minimum seconds between two requests
+DEFAULT_HOST_LIMITS = {
+    "digitallibrary.un.org": {"concurrency": 2, "min_interval": 0.5},
+    "daccess-ods.un.org": {"concurrency": 4, "min_interval": 0.1},
+    "documents.un.org": {"concurrency": 4, "min_interval": 0.1},
+    "unterm.un.org": {"concurrency": 2, "min_interval": 0.5},
+}
+
+# Global variable to store the shared transport
+transport = None
+_transport_lock = threading.Lock()
+
+
+class Transport:
+    """
+    Pooled HTTP client with per-host limits, retries and statistics.
+
+    Args:
+        timeout (tuple or float): Default (connect, read) timeout in seconds
+        max_retries (int): Number of retries after the first attempt
+        backoff_factor (float): Base of the exponential backoff in seconds (1, 2, 4, ... x factor)
+        max_backoff (float): Maximum number of seconds to wait between two attempts
+        max_per_host (int): Default maximum number of simultaneous requests to one host
+        min_interval (float): Default minimum number of seconds between two requests to one host
+        host_limits (dict): Limits for specific hosts, e.g. {"digitallibrary.un.org": {"concurrency": 2, "min_interval": 0.5}}
+        pool_maxsize (int): Maximum number of kept-alive connections per host
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=4, backoff_factor=1.0, max_backoff=60,
+                 max_per_host=4, min_interval=0.0, host_limits=None, pool_maxsize=10):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.host_limits = dict(DEFAULT_HOST_LIMITS if host_limits is None else host_limits)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._host_semaphores = {}
+        self._host_next_request = {}
+        self.reset_stats()
+
+    # =============================================
+    # Host limits
+    # =============================================
+
+    def configure_host(self, host, concurrency=None, min_interval=None):
+        """
+        Change the limits of a host. Only affects hosts that were not contacted yet for concurrency.
+
+        Args:
+            host (str): Host name, e.g. "daccess-ods.un.org"
+            concurrency (int, optional): Maximum number of simultaneous requests
+            min_interval (float, optional): Minimum number of seconds between two requests
+        """
+        with self._lock:
+            limits = self.host_limits.setdefault(host, {})
+            if concurrency is not None:
+                limits["concurrency"] = concurrency
+                self._host_semaphores.pop(host, None)
+            if min_interval is not None:
+                limits["min_interval"] = min_interval
+
+    def _host_semaphore(self, host):
+        with self._lock:
+            if host not in self._host_semaphores:
+                limit = self.host_limits.get(host, {}).get("concurrency", self.max_per_host)
+                self._host_semaphores[host] = threading.BoundedSemaphore(max(1, limit))
+            return self._host_semaphores[host]
+
+    def _wait_for_turn(self, host):
+        """Sleep until the minimum interval since the previous request to the host has passed."""
+        min_interval = self.host_limits.get(host, {}).get("min_interval", self.min_interval)
+        if not min_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._host_next_request.get(host, now))
+            self._host_next_request[host] = start + min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    # =============================================
+    # Statistics
+    # =============================================
+
+    def reset_stats(self):
+        """Reset all the counters."""
+        with self._lock:
+            self._stats = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0,
+                           "bytes": 0, "latency": 0.0, "hosts": {}}
+
+    def _record(self, host, **counters):
+        with self._lock:
+            host_stats = self._stats["hosts"].setdefault(host, {"requests": 0, "attempts": 0, "retries": 0,
+                                                                "failures": 0, "bytes": 0, "latency": 0.0})
+            for key, value in counters.items():
+                self._stats[key] += value
+                host_stats[key] += value
+
+    def get_stats(self) -> dict:
+        """
+        Get the counters accumulated since the creation of the transport or the last reset.
+
+        Returns:
+            dict: Totals (requests, attempts, retries, failures, bytes, latency in seconds,
+                  average_latency) and the same counters for each host under "hosts"
+        """
+        with self._lock:
+            stats = {key: value for key, value in self._stats.items() if key != "hosts"}
+            stats["hosts"] = {host: dict(values) for host, values in self._stats["hosts"].items()}
+        stats["average_latency"] = stats["latency"] / stats["attempts"] if stats["attempts"] else 0.0
+        return stats
+
+    # =============================================
+    # Requests
+    # =============================================
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before the next attempt, honoring the Retry-After header if present."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.strip().isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = self.backoff_factor * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff)
+
+    def request(self, method, url, stream=False, timeout=None, **kwargs) -> requests.Response:
+        """
+        Send an HTTP request, retrying on connection errors, timeouts, 429 and 5xx responses.
+        Without stream, the body is read before returning so it is counted and the connection
+        is released to the pool.
+
+        Args:
+            method (str): HTTP method, e.g. "GET"
+            url (str): The URL to request
+            stream (bool): Whether to leave the body unread (see download for streamed files)
+            timeout (tuple or float, optional): Overrides the default timeout
+            **kwargs: Other arguments of requests.Session.request
+
+        Returns:
+            requests.Response: The last response received, even if its status is an error
+
+        Raises:
+            requests.RequestException: If no response could be obtained after all retries
+        """
+        host = urllib.parse.urlparse(url).netloc
+        timeout = self.timeout if timeout is None else timeout
+        self._record(host, requests=1)
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            error = None
+            with self._host_semaphore(host):
+                self._wait_for_turn(host)
+                start = time.monotonic()
+                try:
+                    response = self.session.request(method, url, stream=stream, timeout=timeout, **kwargs)
+                    if not stream:
+                        self._record(host, bytes=len(response.content))
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                self._record(host, attempts=1, latency=time.monotonic() - start)
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt == self.max_retries:
+                break
+
+            delay = self._backoff(attempt, response)
+            reason = error if error is not None else f"status {response.status_code}"
+            print(f"\t\ttransport.py -> retrying {host} in {delay:.1f}s ({reason})")
+            if response is not None:
+                response.close()
+            self._record(host, retries=1)
+            time.sleep(delay)
+
+        if error is not None or response.status_code >= 400:
+            self._record(host, failures=1)
+        if error is not None:
+            raise error
+        return response
+
+    def get(self, url, **kwargs) -> requests.Response:
+        """Send a GET request, see request."""
+        return self.request("GET", url, **kwargs)
+
+    def download(self, url, file, chunk_size=8192, **kwargs) -> int:
+        """
+        Stream the body of a GET request into a file object.
+
+        Args:
+            url (str): The URL to download
+            file: A binary file object to write to
+            chunk_size (int): Size of the chunks read from the connection
+
+        Returns:
+            int: The number of bytes written
+
+        Raises:
+            requests.HTTPError: If the final response has an error status
+        """
+        host = urllib.parse.urlparse(url).netloc
+        response = self.request("GET", url, stream=True, **kwargs)
+        try:
+            response.raise_for_status()
+            size = 0
+            with self._host_semaphore(host):
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+            self._record(host, bytes=size)
+            return size
+        finally:
+            response.close()
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+
+def get_transport(**kwargs) -> Transport:
+    """
+    Get the transport shared by all TermSeeker modules.
+    Keyword arguments replace the shared transport with a new one using these settings.
+
+    Returns:
+        Transport: The shared transport
+    """
+    global transport
+    with _transport_lock:
+        if transport is None or kwargs:
+            if transport is not None:
+                transport.close()
+            transport = Transport(**kwargs)
+        return transport
+
+
+def http_get(url, **kwargs) -> requests.Response:
+    """
+    Send a GET request through the shared transport.
+
+    Args:
+        url (str): The URL to request
+        **kwargs: Arguments of Transport.request (stream, timeout, params, headers, ...)
+
+    Returns:
+        requests.Response: The response
+    """
+    return get_transport().get(url, **kwargs)
+
+
+def get_transport_stats() -> dict:
+    """
+    Get the counters (requests, bytes, latency, retries, ...) of the shared transport.
+
+    Returns:
+        dict: See Transport.get_stats
+    """
+    return get_transport().get_stats()
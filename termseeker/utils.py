@@ -9,17 +9,25 @@ This module provides various utility functions including:
 """
 
 import re
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from duckduckgo_search import DDGS
-import polars as pl
 import os
-from groq import Groq
 import json
+from .embeddingcache import encode_with_cache
+from .modelregistry import get_model_registry
+from .termscanner import TermScanner
+from .llmcache import make_cache_key
+from .parseddoc import parse_document, SEPARATOR, COMPLETE, NUMBERED, PAGE_NUMBER, FOOTNOTE
 
-# Global variable to store the model
-model = None
+# Base URL of the local OpenAI-compatible server (LM-Studio)
+LMSTUDIO_URL = 'http://localhost:1234/v1'
+
+# Models of the Groq API and of the DuckDuckGo chat
+GROQ_MODEL = "llama-3.3-70b-versatile"
+DDGS_MODEL = 'claude-3-haiku'
+
+# Version of the term extraction prompts, bump it when a prompt template changes so
+# the cached LLM responses of the previous templates are not used anymore
+PROMPT_VERSION = 1
 
 # =============================================
 # Document Symbol Cleaning Functions
@@ -119,6 +127,29 @@ def get_un_document_urls(document_symbol) -> dict:
     return urls
 
 
+# Page numbers, footnotes (job numbers), separators and other notes, compiled once in a single
+# pattern. The name of the alternative that matched gives the label of the paragraph.
+SKIP_PATTERN = re.compile(
+    r'(?P<page_number>\s*\*\*\d+\*\*)'
+    r'|(?P<footnote>\s*K\d{7}\s\d{6})'
+    r'|(?P<separator>\s*-+)'
+    r'|(?P<note>(?:\*\*.*\/.*\*\*|\*\*.*\/.*\d|\d.*\/.*\*\*)$)'
+)
+
+# Start of a numbered paragraph, e.g. "12. The Assembly..."
+NUMBERED_PARAGRAPH_PATTERN = re.compile(r'\s*(\d+)\.\s')
+
+# Common sentence-ending punctuation in multiple languages
+SENTENCE_ENDINGS = ('.', '!', '?', '.)', '».', '.")', ':]', '؟', '।', '。', '．')
+
+# Labels of classify_paragraphs (bit flags, see parseddoc)
+SEPARATOR_LABELS = {
+    "page_number": SEPARATOR | PAGE_NUMBER,
+    "footnote": SEPARATOR | FOOTNOTE,
+    "separator": SEPARATOR,
+    "note": SEPARATOR,
+}
+
 def is_separator_or_note(paragraph):
     """
     Check if a paragraph is a separator, note, or empty paragraph that should be skipped.
@@ -130,16 +161,11 @@ def is_separator_or_note(paragraph):
         bool: True if the paragraph is a separator or note, False otherwise
     """
     # Check if paragraph is empty
-    if len(paragraph.strip()) == 0:
+    if not paragraph.strip():
         return True
     
     # Check for different types of notes or separators
-    is_page_number = re.match(r'\s*\*\*\d+\*\*\s*', paragraph)
-    is_footnote = re.match(r'\s*K\d{7}\s\d{6}\s*', paragraph)
-    is_othernote = re.match(r'^(?:\*\*.*\/.*\*\*|\*\*.*\/.*\d$|\d.*\/.*\*\*)$', paragraph)
-    is_separator = re.match(r'\s*-+\s*', paragraph)
-    
-    return bool(is_page_number or is_footnote or is_othernote or is_separator)
+    return SKIP_PATTERN.match(paragraph) is not None
 
 def is_complete_sentence(text):
     """
@@ -151,25 +177,54 @@ def is_complete_sentence(text):
     Returns:
         bool: True if the text ends with proper punctuation, False otherwise
     """
-    text = text.strip()
-    if not text:
-        return False
+    return text.strip().endswith(SENTENCE_ENDINGS)
+
+def classify_paragraphs(paragraphs):
+    """
+    Label all the paragraphs of a document in one pass.
     
-    # Common sentence-ending punctuation in multiple languages
-    ending_punctuation = ['.', '!', '?', '.)', '.', '».', '.")', ':]', '؟', '।', '。', '．']
+    Each paragraph gets bit flags (see parseddoc): SEPARATOR for paragraphs to skip (empty,
+    separators and notes), with PAGE_NUMBER or FOOTNOTE for these kinds of notes, COMPLETE when
+    it ends with sentence-ending punctuation and NUMBERED when it starts a numbered paragraph.
     
-    # Check for these ending characters
-    for punct in ending_punctuation:
-        if text.endswith(punct):
-            return True
-            
-    return False
+    Args:
+        paragraphs (list): The paragraphs of the document
+        
+    Returns:
+        tuple: (flags, numbers) arrays, numbers holding the paragraph number of numbered
+               paragraphs and -1 for the others
+    """
+    n = len(paragraphs)
+    flags = np.zeros(n, dtype=np.uint8)
+    numbers = np.full(n, -1, dtype=np.int32)
+    max_number = np.iinfo(np.int32).max
+    skip_match = SKIP_PATTERN.match
+    number_match = NUMBERED_PARAGRAPH_PATTERN.match
+
+    for i, paragraph in enumerate(paragraphs):
+        stripped = paragraph.strip()
+        if not stripped:
+            flags[i] = SEPARATOR
+            continue
 
-def find_paragraphs_with_merge(text, search_string, max_paragraphs=1) -> list:
+        flag = COMPLETE if stripped.endswith(SENTENCE_ENDINGS) else 0
+        skip = skip_match(stripped)
+        if skip is not None:
+            flag |= SEPARATOR_LABELS[skip.lastgroup]
+        number = number_match(stripped)
+        if number is not None:
+            flag |= NUMBERED
+            numbers[i] = min(int(number.group(1)), max_number)
+        flags[i] = flag
+
+    return flags, numbers
+
+def find_paragraphs_with_merge(text, search_string, max_paragraphs=1, cache_dir=None) -> list:
     """
     Find paragraphs containing a search string and merge with continuation paragraphs if needed.
     
-    This function splits text into paragraphs and searches for occurrences of the search string.
+    This function splits text into paragraphs and searches for occurrences of the search string,
+    ignoring case, hyphenation and markdown emphasis (see termscanner.normalize_for_matching).
     When a match is found, it checks if the paragraph is complete (ends with proper punctuation)
     and merges with subsequent paragraphs when necessary to form complete thoughts.
     
@@ -178,168 +233,342 @@ def find_paragraphs_with_merge(text, search_string, max_paragraphs=1) -> list:
         search_string (str): The string to search for in paragraphs
         max_paragraphs (int, optional): Maximum number of paragraphs to return. Default is 1.
                                        Set to None to return all matching paragraphs.
+        cache_dir (str, optional): Directory of the markdown cache where the parsed document is saved
     
     Returns:
         list or None: A list of matched paragraphs (possibly merged with continuation text),
                      or None if no matches were found.
     """
-    paragraphs = text.split('\n\n')
-    matched_paragraphs = []
-    found_count = 0
+    document = parse_document(text, cache_dir)
 
-    for i, paragraph in enumerate(paragraphs):
-        # Check if this paragraph contains the search string
-        if search_string.lower() in paragraph.lower():
-            matched_paragraph = paragraph
-            
-            # Check if paragraph is incomplete (doesn't end with proper punctuation)
-            paragraph_needs_continuation = not is_complete_sentence(paragraph)
-            
-            # Continue checking next paragraphs for continuation
-            next_index = i + 1
-            
-            while paragraph_needs_continuation and next_index < len(paragraphs):
-                next_para = paragraphs[next_index].strip()
-                
-                # If it's a separator or note, skip it but continue looking
-                if is_separator_or_note(next_para):
-                    next_index += 1
-                    continue
-                
-                # Found actual content - check if it's not a new numbered paragraph
-                # that would indicate a new thought rather than continuation
-                if not re.match(r'\s*\d+\.\s', next_para):
-                    matched_paragraph = matched_paragraph + " " + next_para
-                    
-                    # Check if we now have a complete sentence
-                    if is_complete_sentence(matched_paragraph):
-                        paragraph_needs_continuation = False
-                    else:
-                        # Continue looking for more text
-                        next_index += 1
-                else:
-                    # It's a new numbered paragraph, stop merging
-                    paragraph_needs_continuation = False
-                
-                # If we've checked too many paragraphs ahead, stop to prevent infinite loops
-                if next_index > i + 5:  # Arbitrary limit to prevent excessive merging
-                    paragraph_needs_continuation = False
-            
-            matched_paragraphs.append(matched_paragraph)
-            found_count += 1
-
-            # Check if we've reached the limit of paragraphs to return
-            if max_paragraphs is not None and found_count >= max_paragraphs:
-                break
+    # Find the paragraphs containing the search string (case and hyphenation insensitive)
+    hits = TermScanner([search_string]).scan_paragraphs(document.paragraphs).get(search_string, [])
+    if max_paragraphs is not None:
+        hits = hits[:max_paragraphs]
+
+    # Merge only the matched paragraphs with their continuation
+    matched_paragraphs = [document.merge_from(i) for i in hits]
 
     return matched_paragraphs if matched_paragraphs else None
 
-def get_model(model_name='distiluse-base-multilingual-cased-v2'):
+def find_paragraphs_for_terms(text, search_strings, max_paragraphs=None, cache_dir=None) -> dict:
+    """
+    Find the paragraphs containing each of several search strings in a single scan of the text.
+
+    The text is scanned once for all the search strings with a multi-pattern automaton
+    (see termscanner.TermScanner), and only the matched paragraphs are merged with their
+    continuation (see find_paragraphs_with_merge).
+
+    Args:
+        text (str): The full text to search within
+        search_strings (list): The strings to search for in paragraphs
+        max_paragraphs (int, optional): Maximum number of paragraphs to return for each string.
+                                       Default is None, which returns all matching paragraphs.
+        cache_dir (str, optional): Directory of the markdown cache where the parsed document is saved
+
+    Returns:
+        dict: Mapping of each search string with at least one match to its list of matched paragraphs
+    """
+    document = parse_document(text, cache_dir)
+    hits = TermScanner(search_strings).scan_paragraphs(document.paragraphs)
+    merged_cache = {}
+    results = {}
+
+    for search_string, indices in hits.items():
+        if max_paragraphs is not None:
+            indices = indices[:max_paragraphs]
+
+        # Paragraphs matched by several strings are only merged once
+        for i in indices:
+            if i not in merged_cache:
+                merged_cache[i] = document.merge_from(i)
+        results[search_string] = [merged_cache[i] for i in indices]
+
+    return results
+
+# Segments compared on each side of a numbered paragraph anchor, and of a relative position anchor
+ANCHOR_WINDOW = 2
+POSITION_WINDOW = 8
+
+# Minimum similarity of the best segment near an anchor, below it the whole target document is searched
+MIN_ANCHOR_SCORE = 0.5
+
+def get_model(model_name='distiluse-base-multilingual-cased-v2', backend=None, device=None):
     """
     Load and return a SentenceTransformer model.
 
-    This function loads a SentenceTransformer model with the specified model name.
-    If the model is already loaded, it returns the existing model instance.
+    This function loads a SentenceTransformer model with the specified model name from the
+    shared model registry (see modelregistry). If the model is already loaded, it returns the
+    existing model instance.
 
     Args:
         model_name (str): The name of the model to load. Default is 'distiluse-base-multilingual-cased-v2'.
+        backend (str, optional): "torch", "torch-int8", "onnx" or "onnx-int8". Defaults to the backend set with configure_models.
+        device (str, optional): Device of a torch model. Defaults to the device set with configure_models.
 
     Returns:
         SentenceTransformer: The loaded SentenceTransformer model.
     """
-    global model
-    if model is None:
-        print("Loading model...")
-        model = SentenceTransformer(model_name)
-    return model
+    return get_model_registry().get(model_name, backend, device)
 
-def find_similar_paragraph_in_target(source_paragraph, target_text, model_name='distiluse-base-multilingual-cased-v2', top_k=1) -> list[tuple[str, float]]:
+def split_target_paragraphs(target_text, cache_dir=None) -> list:
     """
-    Find the most similar paragraph(s) in the target text using multilingual embeddings.
-    Merges incomplete paragraphs to ensure comparison of complete thoughts.
+    Split a target text into paragraphs suitable for alignment.
+    Skips separators and notes, and merges incomplete paragraphs with their continuation
+    so that complete thoughts are compared.
 
     Args:
-        source_paragraph: The source paragraph to match
-        target_text: The target text to search in
+        target_text (str): The target text to split
+        cache_dir (str, optional): Directory of the markdown cache where the parsed document is saved
+
+    Returns:
+        list: The processed paragraphs of the target text
+    """
+    return parse_document(target_text, cache_dir).segment_texts
+
+def encode_paragraphs(paragraphs, model_name='distiluse-base-multilingual-cased-v2', cache_dir=None, doc_key=None) -> np.ndarray:
+    """
+    Compute the embeddings of a list of paragraphs.
+    When cache_dir and doc_key are given, embeddings are read from and written to the
+    persistent embedding cache, and the model is only loaded for paragraphs not cached yet.
+
+    Args:
+        paragraphs: List of paragraphs to embed
         model_name: The name of the multilingual sentence embedding model to use
-        top_k: Number of matching paragraphs to return
+        cache_dir: Directory of the markdown cache (optional)
+        doc_key: Identifier of the document the paragraphs belong to (optional)
 
     Returns:
-        List of top matching paragraphs from the target text
+        np.ndarray: One embedding per paragraph
     """
-    # Load model
-    model = get_model(model_name)
+    if cache_dir and doc_key:
+        return encode_with_cache(paragraphs, lambda texts: encode_texts(texts, model_name),
+                                 cache_dir, doc_key, get_model_registry().cache_name(model_name))
+
+    return encode_texts(paragraphs, model_name)
+
+def encode_texts(texts, model_name='distiluse-base-multilingual-cased-v2') -> np.ndarray:
+    """
+    Compute the embeddings of texts with the model server if it is running (see modelserver),
+    or with the model loaded in this process otherwise.
+
+    Args:
+        texts: List of texts to embed
+        model_name: The name of the multilingual sentence embedding model to use
+
+    Returns:
+        np.ndarray: One embedding per text
+    """
+    from .modelserver import get_model_client, forget_model_client, ModelServerError
+
+    registry = get_model_registry()
+    client = get_model_client()
+    if client is not None:
+        try:
+            return client.encode(texts, model_name, registry.backend)
+        except ModelServerError as e:
+            print(f"\t\tutils.py -> model server failed, loading the model locally: {e}")
+            forget_model_client()
+    return registry.encode(texts, model_name)
+
+def top_similar(source_embeddings, target_embeddings, top_k=1) -> list[list[tuple[int, float]]]:
+    """
+    Get the most similar target embeddings of each source embedding (cosine similarity).
+
+    Returns:
+        List with one entry per source embedding, each a list of (target index, score) tuples
+        sorted from the most to the least similar
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+    similarities = cosine_similarity(source_embeddings, target_embeddings)
+
+    # Get indices of top similar paragraphs for each source paragraph
+    top_indices = np.argsort(similarities, axis=1)[:, ::-1][:, :top_k]
+
+    return [[(int(i), float(similarities[row, i])) for i in indices] for row, indices in enumerate(top_indices)]
+
+def align_paragraphs_to_document(source_paragraphs, target_doc, model_name='distiluse-base-multilingual-cased-v2', top_k=1, source_embeddings=None, cache_dir=None, doc_key=None) -> list[list[tuple[int, float]]]:
+    """
+    Align several source paragraphs against the segments of a parsed target document.
+    The target document is embedded once, all source paragraphs are embedded in a single
+    batch, and the top-k matches of every source paragraph are taken from one similarity matrix.
+
+    Args:
+        source_paragraphs: List of source paragraphs to match
+        target_doc: The parsed target document (see parseddoc.parse_document)
+        model_name: The name of the multilingual sentence embedding model to use
+        top_k: Number of matching segments to return for each source paragraph
+        source_embeddings: Optional precomputed embeddings of source_paragraphs (e.g. when the
+                           same English paragraphs are aligned against several languages)
+        cache_dir: Directory of the markdown cache, enables the persistent embedding cache
+        doc_key: Identifier of the target document in the embedding cache
+
+    Returns:
+        List with one entry per source paragraph, each a list of (segment index, score) tuples
+        sorted from the most to the least similar
+    """
+    if not source_paragraphs:
+        return []
+
+    processed_paragraphs = target_doc.segment_texts
 
-    # Split target text into raw paragraphs
-    raw_paragraphs = target_text.split('\n\n')
-    
-    # Process paragraphs - merge incomplete sentences and skip separators
-    processed_paragraphs = []
-    i = 0
-    while i < len(raw_paragraphs):
-        paragraph = raw_paragraphs[i].strip()
-        
-        # Skip separator or note paragraphs
-        if is_separator_or_note(paragraph):
-            i += 1
-            continue
-            
-        # Check if paragraph is incomplete
-        if not is_complete_sentence(paragraph):
-            merged_paragraph = paragraph
-            next_index = i + 1
-            
-            # Try to find continuation paragraphs
-            while next_index < len(raw_paragraphs) and not is_complete_sentence(merged_paragraph):
-                next_para = raw_paragraphs[next_index].strip()
-                
-                # Skip separators but continue looking
-                if is_separator_or_note(next_para):
-                    next_index += 1
-                    continue
-                
-                # Check if it's not a new numbered paragraph (which would indicate a new thought)
-                if not re.match(r'\s*\d+\.\s', next_para):
-                    merged_paragraph = merged_paragraph + " " + next_para
-                    next_index += 1
-                else:
-                    # It's a new numbered paragraph, stop merging
-                    break
-                
-                # Limit the number of paragraphs to merge to prevent excessive merging
-                if next_index > i + 5:
-                    break
-            
-            processed_paragraphs.append(merged_paragraph)
-            i = next_index  # Skip the paragraphs we've merged
-        else:
-            # It's already a complete paragraph
-            processed_paragraphs.append(paragraph)
-            i += 1
-    
     # Handle empty processed_paragraphs (all were separators/notes)
     if not processed_paragraphs:
-        return []
+        return [[] for _ in source_paragraphs]
+
+    # Compute embeddings, each document only once
+    if source_embeddings is None:
+        source_embeddings = encode_paragraphs(list(source_paragraphs), model_name)
+    target_embeddings = encode_paragraphs(processed_paragraphs, model_name, cache_dir, doc_key)
+
+    # Compute similarities between every source and every target paragraph
+    return top_similar(source_embeddings, target_embeddings, top_k)
+
+def paragraph_anchor(paragraph, source_doc=None) -> tuple:
+    """
+    Get the structural anchor of a source paragraph: its paragraph number, and its relative
+    position when the parsed source document is given. A paragraph that is not numbered itself
+    (e.g. a subparagraph "(a) ...") is anchored to the numbered paragraph before it.
+
+    Args:
+        paragraph (str): The source paragraph (e.g. from find_paragraphs_with_merge)
+        source_doc (ParsedDocument, optional): The parsed source document
 
-    # Compute embeddings
-    source_embedding = model.encode([source_paragraph])
-    target_embeddings = model.encode(processed_paragraphs)
+    Returns:
+        tuple: (paragraph number or -1, number of segments after the numbered paragraph,
+                relative position in the source document or None)
+    """
+    if source_doc is not None and len(source_doc.segments):
+        i = source_doc.find_paragraph(paragraph)
+        if i >= 0:
+            return source_doc.segment_anchor(source_doc.segment_of(i))
 
-    # Compute similarities
-    similarities = cosine_similarity(source_embedding, target_embeddings)[0]
+    number = NUMBERED_PARAGRAPH_PATTERN.match(paragraph)
+    return (int(number.group(1)) if number else -1), 0, None
+
+def align_paragraphs_anchored(source_paragraphs, target_doc, model_name='distiluse-base-multilingual-cased-v2', top_k=1, source_embeddings=None, cache_dir=None, doc_key=None, source_doc=None, window=ANCHOR_WINDOW, min_score=MIN_ANCHOR_SCORE) -> list[list[tuple[int, float]]]:
+    """
+    Align several source paragraphs against the segments of a parsed target document, using
+    the numbered paragraph structure shared by the language versions of UN documents.
+    Each source paragraph is only compared with the target segments around its anchor (the
+    target paragraph of the same number, or the same relative position), so only these segments
+    are embedded. Paragraphs without anchor, or whose best segment near the anchor is less
+    similar than min_score, are aligned against the whole target document
+    (see align_paragraphs_to_document).
 
-    # Get indices of top similar paragraphs
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
+    Args:
+        source_paragraphs: List of source paragraphs to match
+        target_doc: The parsed target document (see parseddoc.parse_document)
+        model_name: The name of the multilingual sentence embedding model to use
+        top_k: Number of matching segments to return for each source paragraph
+        source_embeddings: Optional precomputed embeddings of source_paragraphs
+        cache_dir: Directory of the markdown cache, enables the persistent embedding cache
+        doc_key: Identifier of the target document in the embedding cache
+        source_doc: Optional parsed source document, gives the anchors of the paragraphs that
+                    are not numbered and the relative positions
+        window: Number of target segments compared on each side of a numbered anchor
+        min_score: Minimum similarity of the best segment near the anchor
+
+    Returns:
+        List with one entry per source paragraph, each a list of (segment index, score) tuples
+        sorted from the most to the least similar
+    """
+    if not source_paragraphs:
+        return []
+    if not target_doc.segment_texts:
+        return [[] for _ in source_paragraphs]
+
+    if source_embeddings is None:
+        source_embeddings = encode_paragraphs(list(source_paragraphs), model_name)
+    windows = [target_doc.anchor_window(*paragraph_anchor(paragraph, source_doc), window, POSITION_WINDOW)
+               for paragraph in source_paragraphs]
+
+    # Embed the segments of all the windows in one batch
+    alignments = [None] * len(source_paragraphs)
+    window_segments = np.unique(np.concatenate(windows)).astype(np.int64)
+    if len(window_segments):
+        segment_texts = target_doc.segment_texts
+        window_embeddings = encode_paragraphs([segment_texts[k] for k in window_segments], model_name, cache_dir, doc_key)
+        for j, segments in enumerate(windows):
+            if not len(segments):
+                continue
+            rows = np.searchsorted(window_segments, segments)
+            matches = top_similar(source_embeddings[j:j + 1], window_embeddings[rows], top_k)[0]
+            if matches and matches[0][1] >= min_score:
+                alignments[j] = [(int(segments[i]), score) for i, score in matches]
+
+    unanchored = [j for j, matches in enumerate(alignments) if matches is None]
+    if unanchored:
+        print(f"\t\tutils.py -> {len(unanchored)} of {len(source_paragraphs)} paragraphs not anchored in "
+              f"{doc_key or 'the target document'}, aligning them against the whole document")
+        full = align_paragraphs_to_document([source_paragraphs[j] for j in unanchored], target_doc, model_name=model_name,
+                                            top_k=top_k, source_embeddings=source_embeddings[unanchored],
+                                            cache_dir=cache_dir, doc_key=doc_key)
+        for j, matches in zip(unanchored, full):
+            alignments[j] = matches
+
+    return alignments
+
+def align_paragraphs_in_target(source_paragraphs, target_text, model_name='distiluse-base-multilingual-cased-v2', top_k=1, source_embeddings=None, cache_dir=None, doc_key=None, source_text=None) -> list[list[tuple[str, float]]]:
+    """
+    Align several source paragraphs against one target document.
+    The target document is segmented once and all source paragraphs are embedded in a single
+    batch. Each source paragraph is compared with the target segments around its numbered
+    paragraph anchor, and with the whole target document only when it has no anchor
+    (see align_paragraphs_anchored).
+
+    Args:
+        source_paragraphs: List of source paragraphs to match
+        target_text: The target text to search in
+        model_name: The name of the multilingual sentence embedding model to use
+        top_k: Number of matching paragraphs to return for each source paragraph
+        source_embeddings: Optional precomputed embeddings of source_paragraphs (e.g. when the
+                           same English paragraphs are aligned against several languages)
+        cache_dir: Directory of the markdown cache, enables the persistent embedding cache
+        doc_key: Identifier of the target document in the embedding cache
+        source_text: Optional source text the paragraphs come from, anchors the paragraphs that
+                     are not numbered by their position
+
+    Returns:
+        List with one entry per source paragraph, each a list of (paragraph, score) tuples
+        sorted from the most to the least similar
+    """
+    target_doc = parse_document(target_text, cache_dir)
+    source_doc = parse_document(source_text, cache_dir) if source_text else None
+    alignments = align_paragraphs_anchored(source_paragraphs, target_doc, model_name=model_name, top_k=top_k,
+                                           source_embeddings=source_embeddings, cache_dir=cache_dir, doc_key=doc_key,
+                                           source_doc=source_doc)
 
     # Return top matching paragraphs and their similarity scores
-    results = [(processed_paragraphs[i], similarities[i]) for i in top_indices]
+    return [[(target_doc.segment_texts[i], score) for i, score in matches] for matches in alignments]
 
-    return results
+def find_similar_paragraph_in_target(source_paragraph, target_text, model_name='distiluse-base-multilingual-cased-v2', top_k=1, source_text=None) -> list[tuple[str, float]]:
+    """
+    Find the most similar paragraph(s) in the target text using multilingual embeddings.
+    Merges incomplete paragraphs to ensure comparison of complete thoughts.
+    A numbered source paragraph is only compared with the target paragraphs around the one
+    of the same number (see align_paragraphs_anchored).
+    To match several paragraphs against the same target text, use align_paragraphs_in_target
+    so that the target text is segmented only once.
 
-def askLLM_term_equivalents(source_term, source_paragraphs, target_paragraphs, source_language, target_language, customInference=False, groqToken=None) -> str:
+    Args:
+        source_paragraph: The source paragraph to match
+        target_text: The target text to search in
+        model_name: The name of the multilingual sentence embedding model to use
+        top_k: Number of matching paragraphs to return
+        source_text: Optional source text the paragraph comes from (see align_paragraphs_in_target)
+
+    Returns:
+        List of top matching paragraphs from the target text
     """
-    Query a LLM to extract term equivalents across languages. By default the LLM is claude-haiku from the free service provided by DuckDuckGo.
-    For custom inference, set customInference=True and provide a local server URL for LM-Studio.
+    results = align_paragraphs_in_target([source_paragraph], target_text, model_name=model_name, top_k=top_k,
+                                         source_text=source_text)
+
+    return results[0] if results else []
+
+def build_term_equivalents_prompt(source_term, source_paragraphs, target_paragraphs, source_language, target_language) -> str:
+    """
+    Build the prompt asking a LLM for the equivalents of a term in aligned paragraphs.
 
     Args:
         source_term: The specific source term to find equivalents for
@@ -349,7 +578,7 @@ def askLLM_term_equivalents(source_term, source_paragraphs, target_paragraphs, s
         target_language: Language of the target paragraphs (e.g., "Spanish")
 
     Returns:
-        String of the LLM answer with the term equivalents extracted by the LLM: <SOURCETERM>{source_language}</SOURCETERM> = <EQUIVALENTTERM>{target_language}</EQUIVALENTTERM>
+        str: The prompt
     """
     # Format the source paragraphs as a single string
     source_text = "\n\n".join(source_paragraphs) if isinstance(source_paragraphs, list) else source_paragraphs
@@ -366,7 +595,7 @@ def askLLM_term_equivalents(source_term, source_paragraphs, target_paragraphs, s
     # Join the target paragraphs
     target_text = "\n\n".join(target_texts)
 
-    prompt = f"""
+    return f"""
     I need to extract term equivalents of this single term '{source_term}' from these {source_language} and {target_language} paragraphs.
     Please identify the {target_language} equivalent terms for the {source_language} term: <source>{source_term}</source>, preserving all formatting
     (italics, capitalization, gender, and number).
@@ -383,21 +612,80 @@ def askLLM_term_equivalents(source_term, source_paragraphs, target_paragraphs, s
     Do not modify the tag names <source> and <equivalent>. Do not include other source terms than '{source_term}'.
     Preserve all formatting in both languages.
     """
+
+def llm_backend_model(customInference=False, groqToken=None, lmstudioURL=LMSTUDIO_URL) -> tuple[str, str]:
+    """
+    Get the backend used for term extraction and its model, as chosen by askLLM_term_equivalents.
+
+    Returns:
+        tuple: (backend name, model name or URL of the local server)
+    """
+    if customInference:
+        return "lmstudio", lmstudioURL
+    if groqToken:
+        return "groq", GROQ_MODEL
+    return "ddgs", DDGS_MODEL
+
+def askLLM_term_equivalents(source_term, source_paragraphs, target_paragraphs, source_language, target_language, customInference=False, groqToken=None,
+                            lmstudioURL=LMSTUDIO_URL, llmCache=None, bypassCache=False) -> str:
+    """
+    Query a LLM to extract term equivalents across languages. By default the LLM is claude-haiku from the free service provided by DuckDuckGo.
+    For custom inference, set customInference=True and provide a local server URL for LM-Studio.
+
+    Args:
+        source_term: The specific source term to find equivalents for
+        source_paragraphs: The source paragraphs (context)
+        target_paragraphs: List of target paragraphs or tuples from find_similar_paragraph_in_target
+        source_language: Language of the source paragraph (e.g., "English")
+        target_language: Language of the target paragraphs (e.g., "Spanish")
+        lmstudioURL: Base URL of the local OpenAI-compatible server used with customInference
+        llmCache: LLMResponseCache where the answers are looked up and stored (optional)
+        bypassCache: Whether to ask the LLM even if the answer is in llmCache, without storing the new answer
+
+    Returns:
+        String of the LLM answer with the term equivalents extracted by the LLM: <SOURCETERM>{source_language}</SOURCETERM> = <EQUIVALENTTERM>{target_language}</EQUIVALENTTERM>
+    """
+    key_parts = (source_term, source_language, source_paragraphs, target_language, target_paragraphs)
+    if llmCache is not None:
+        backend, model_name = llm_backend_model(customInference, groqToken, lmstudioURL)
+        response = llmCache.get(make_cache_key(backend, model_name, PROMPT_VERSION, *key_parts), bypass=bypassCache)
+        if response is not None:
+            return response
+
+    response, backend, model_name = ask_term_equivalents_backend(source_term, source_paragraphs, target_paragraphs, source_language,
+                                                                 target_language, customInference, groqToken, lmstudioURL)
+    # Errors are not cached, so they are retried on the next run. The answer is stored under the
+    # backend that gave it, which is DDGS when the local server failed
+    if llmCache is not None and response and "Error" not in response:
+        llmCache.put(make_cache_key(backend, model_name, PROMPT_VERSION, *key_parts), response, backend, model_name,
+                     bypass=bypassCache)
+    return response
+
+def ask_term_equivalents_backend(source_term, source_paragraphs, target_paragraphs, source_language, target_language, customInference=False,
+                                 groqToken=None, lmstudioURL=LMSTUDIO_URL) -> tuple[str, str, str]:
+    """
+    Send the term equivalents request of askLLM_term_equivalents, without cache.
+
+    Returns:
+        tuple: (LLM answer or error message, name of the backend that answered, its model name)
+    """
+    prompt = build_term_equivalents_prompt(source_term, source_paragraphs, target_paragraphs, source_language, target_language)
     if customInference:
         # Try to use local LM-Studio API first
         try:
-            response = lmstudioLocalAPI(prompt)
+            response = lmstudioLocalAPI(prompt, lmstudioURL)
             print("Using local LM-Studio API")
-            return response
+            return response, "lmstudio", lmstudioURL
         except Exception as e:
             print(f"Error extracting term equivalents with local inference server: {str(e)}")
             print("Falling back to DuckDuckGo search...")
             # Fall back to DDGS if local API fails
             try:
-                response = DDGS().chat(prompt, model='claude-3-haiku')
-                return response
+                from duckduckgo_search import DDGS
+                response = DDGS().chat(prompt, model=DDGS_MODEL)
+                return response, "ddgs", DDGS_MODEL
             except Exception as e:
-                return f"Error extracting term equivalents with DDGS-chat after local API failed: {str(e)}"
+                return f"Error extracting term equivalents with DDGS-chat after local API failed: {str(e)}", "ddgs", DDGS_MODEL
     elif groqToken:
         # Use Groq API if token is provided
         try:
@@ -405,18 +693,19 @@ def askLLM_term_equivalents(source_term, source_paragraphs, target_paragraphs, s
                                   target_language, groqToken,
                                   source_language
                                   )
-            return response
+            return response, "groq", GROQ_MODEL
         except Exception as e:
-            return f"Error extracting term equivalents with Groq API: {str(e)}"
+            return f"Error extracting term equivalents with Groq API: {str(e)}", "groq", GROQ_MODEL
     else:
         # Use DDGS directly
         try:
-            response = DDGS().chat(prompt, model='claude-3-haiku')
-            return response
+            from duckduckgo_search import DDGS
+            response = DDGS().chat(prompt, model=DDGS_MODEL)
+            return response, "ddgs", DDGS_MODEL
         except Exception as e:
-            return f"Error extracting term equivalents with DDGS-chat: {str(e)}"
+            return f"Error extracting term equivalents with DDGS-chat: {str(e)}", "ddgs", DDGS_MODEL
 
-def lmstudioLocalAPI(prompt, url='http://localhost:1234/v1'):
+def lmstudioLocalAPI(prompt, url=LMSTUDIO_URL):
     """
     Generates a response from a local language model API based on the given prompt.
     Args:
@@ -467,6 +756,7 @@ def askGroqAPI(sourceTerm, target_paragraphs, TargetLanguage, token, sourceLangu
     """
     
     # Initialize the Groq client with the provided token
+    from groq import Groq
     client = Groq(
         #api_key=os.environ.get("GROQ_API_KEY")
         api_key=token,
@@ -532,7 +822,7 @@ def askGroqAPI(sourceTerm, target_paragraphs, TargetLanguage, token, sourceLangu
         # Create a chat completion
         completion = client.chat.completions.create(
             #model="model-identifier",  # not essential for LM Studio
-            model="llama-3.3-70b-versatile",
+            model=GROQ_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful multilingual assistant that understands English, French, Simplified Chinese, Arabic, Russian and Spanish. You extract accurate translations of a single input term from the provided context. Modify the extracted term to fit the gender and number of the input term."},
                 {"role": "user", "content": final_prompt}
@@ -555,6 +845,152 @@ def askGroqAPI(sourceTerm, target_paragraphs, TargetLanguage, token, sourceLangu
         return f"Error extracting term equivalents with Groq API: {str(e)}"
 
 
+def _paragraphs_text(paragraphs) -> str:
+    """Join paragraphs (or tuples from find_similar_paragraph_in_target) into a single string."""
+    if not isinstance(paragraphs, list):
+        return paragraphs
+    return "\n\n".join(item[0] if isinstance(item, tuple) else item for item in paragraphs)
+
+def build_multilingual_prompt(source_term, source_paragraphs, target_paragraphs_by_lang, source_language="English") -> str:
+    """
+    Build a single prompt asking a LLM for the equivalents of a term in several languages at once.
+
+    Args:
+        source_term: The specific source term to find equivalents for
+        source_paragraphs: The source paragraphs (context)
+        target_paragraphs_by_lang: Mapping of each target language (e.g., "Spanish") to its aligned paragraphs
+        source_language: Language of the source paragraphs (default: "English")
+
+    Returns:
+        str: The prompt, asking for a JSON object with a list of equivalents per language
+    """
+    languages = list(target_paragraphs_by_lang)
+    sections = "\n\n".join(f"{language.upper()} PARAGRAPH(S):\n{_paragraphs_text(paragraphs)}"
+                            for language, paragraphs in target_paragraphs_by_lang.items())
+    example = json.dumps({language: ["INSERT_TERM"] for language in languages}, ensure_ascii=False)
+
+    return f"""
+    I need to extract term equivalents of this single term '{source_term}' from these {source_language} paragraphs and their translations in {", ".join(languages)}.
+    For each language, please identify the equivalent terms for the {source_language} term: <source>{source_term}</source>, preserving all formatting
+    (italics, capitalization, gender, and number).
+
+    {source_language.upper()} PARAGRAPH:
+    {_paragraphs_text(source_paragraphs)}
+
+    {sections}
+
+    Answer only with a JSON object with one list of equivalents of '{source_term}' per language, in this format:
+    {example}
+
+    Do not include other source terms than '{source_term}'. Preserve all formatting in all languages.
+    """
+
+def askGroqAPI_multilingual(sourceTerm, target_paragraphs_by_lang, token, sourceLanguage="English"):
+    """
+    Extract the translations of a source term in several languages with a single structured Groq request.
+
+    Args:
+        sourceTerm (str): The term to translate
+        target_paragraphs_by_lang (dict): Mapping of each target language (e.g., "Spanish") to its aligned paragraphs
+        token (str): Token for accessing the Groq API
+        sourceLanguage (str): The language of the source term (default: "English")
+
+    Returns:
+        dict: JSON response with a list of translations per language, or an error string
+    """
+    from groq import Groq
+    client = Groq(api_key=token)
+
+    # Same context budget as askGroqAPI for each language
+    contexts = {}
+    for language, paragraphs in target_paragraphs_by_lang.items():
+        contexts[language] = str(paragraphs)[:5000] if len(str(paragraphs)) > 5000 else paragraphs
+
+    languages = list(target_paragraphs_by_lang)
+    schema = {
+        "type": "object",
+        "properties": {
+            "terms": {
+                "type": "object",
+                "properties": {
+                    sourceLanguage: {"type": "string", "enum": [sourceTerm]},
+                    **{language: {"type": "array",
+                                  "items": {"type": "string"},
+                                  "minItems": 1,
+                                  "maxItems": 4,
+                                  "description": f"List of {language} translations for the term '{sourceTerm}' based on the {language} context provided"}
+                       for language in languages}
+                },
+                "required": [sourceLanguage] + languages
+            }
+        },
+        "required": ["terms"]
+    }
+    prompt_json = json.dumps({"sourceTerm": sourceTerm,
+                              "sourceLanguage": sourceLanguage,
+                              "Contexts": contexts,
+                              "outputFormat": "JSON",
+                              "outputSchema": schema}, ensure_ascii=False, indent=2)
+
+    try:
+        final_prompt = f"Extract the translations of <sourceterm>{sourceTerm}</sourceterm> in <targetlanguages>{', '.join(languages)}</targetlanguages> languages from the mentions in the provided Contexts of each language." + prompt_json
+        completion = client.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful multilingual assistant that understands English, French, Simplified Chinese, Arabic, Russian and Spanish. You extract accurate translations of a single input term from the provided context. Modify the extracted term to fit the gender and number of the input term."},
+                {"role": "user", "content": final_prompt}
+            ],
+            temperature=0.3,
+            response_format={"type": "json_object"},
+            max_completion_tokens=2230,
+            stream=False,
+            stop=None,
+            top_p=1
+        )
+        response_content = completion.choices[0].message.content
+        return json.loads(response_content) or response_content
+    except Exception as e:
+        return f"Error extracting term equivalents with Groq API: {str(e)}"
+
+def parse_multilingual_equivalents(response, languages) -> dict:
+    """
+    Get the equivalents of each language from the answer to a multilingual prompt.
+
+    Args:
+        response: The LLM answer (JSON string, possibly surrounded by text, or dict from the Groq API)
+        languages (list): The target languages asked for
+
+    Returns:
+        dict: Mapping of each language found in the answer to its unique equivalents (the first one is
+              the main term). Languages missing from the answer, or all of them if it cannot be parsed, are left out.
+    """
+    if isinstance(response, str):
+        start, end = response.find('{'), response.rfind('}')
+        if start == -1 or end <= start:
+            return {}
+        try:
+            response = json.loads(response[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+    if not isinstance(response, dict):
+        return {}
+
+    terms = response.get("terms", response)
+    if not isinstance(terms, dict):
+        return {}
+
+    equivalents = {}
+    for language in languages:
+        values = terms.get(language)
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list):
+            continue
+        values = [value.strip() for value in values if isinstance(value, str) and value.strip()]
+        if values:
+            equivalents[language] = list(dict.fromkeys(values))
+    return equivalents
+
 def getEquivalents_from_response(response) -> list:
     """
     Extract all equivalent terms from the response.
@@ -583,170 +1019,225 @@ def getEquivalents_from_response(response) -> list:
         print(f"Error extracting equivalents from response: {str(e)}")
         return [response]
 
+def parse_term_equivalents(response) -> list:
+    """
+    Get the unique equivalent terms from a LLM answer of askLLM_term_equivalents.
+
+    Args:
+        response: The LLM answer (string, or dict from the Groq API)
+
+    Returns:
+        list: Unique equivalent terms in answer order (the first one is the main term), or an empty list on error
+    """
+    if not response:
+        return []
+    if "Error" in response:
+        print(f"Error in LLM response: {response}")
+        return []
+    # Unique values of list
+    return list(dict.fromkeys(getEquivalents_from_response(response)))
+
+# Metadata columns of the results kept by consolidate_results
+RESULT_METADATA_KEYS = ['docSymbol', 'publicationDate', 'docType', 'docTitle']
+
+
+def _paragraph_text(paragraph):
+    """Text of a result paragraph, which may be a (text, score) tuple."""
+    if isinstance(paragraph, str):
+        return paragraph
+    if isinstance(paragraph, tuple) and len(paragraph) >= 1:
+        return str(paragraph[0])
+    return None
+
+
+def _joined_lists(values, separator, paragraphs):
+    """
+    Join the items of the paragraphs or synonyms values of results, which may be (text, score) tuples.
+
+    Returns:
+        tuple: (joined items, number of items) lists, with None for a None value
+    """
+    joined = []
+    lengths = []
+    for value in values:
+        if value is None:
+            joined.append(None)
+            lengths.append(None)
+        elif not isinstance(value, list):
+            # A single synonym, or paragraphs without text
+            joined.append(None if paragraphs else str(value))
+            lengths.append(0 if paragraphs else 1)
+        elif paragraphs:
+            try:
+                joined.append(separator.join(value))
+                lengths.append(len(value))
+            except TypeError:
+                texts = [text for text in map(_paragraph_text, value) if text is not None]
+                joined.append(separator.join(texts))
+                lengths.append(len(texts))
+        else:
+            joined.append(separator.join(map(str, value)))
+            lengths.append(len(value))
+    return joined, lengths
+
+
+def _results_frame(metadataCleaned):
+    """
+    Build a DataFrame from result dictionaries, one column at a time.
+    Paragraphs and synonyms become lists of strings (null for a None value), and the other values
+    become strings. The _{key}Present columns tell which results have a term or metadata key.
+    """
+    import polars as pl
+
+    # Lists are built by splitting joined strings, much faster than building nested Series from Python lists.
+    # The number of items tells an empty list from a list of one empty string.
+    separator = "\x1f"
+    columns = set().union(*metadataCleaned) - {'docURLs'}
+    data = {}
+    list_columns = []
+    for column in columns:
+        values = [item.get(column) for item in metadataCleaned]
+        if column.endswith('Paragraphs') or column.endswith('Synonyms'):
+            values, lengths = _joined_lists(values, separator, column.endswith('Paragraphs'))
+            data[f"_{column}Length"] = pl.Series(lengths, dtype=pl.Int64)
+            list_columns.append(column)
+        data[column] = pl.Series(column, values, dtype=pl.Utf8, strict=False)
+        if (column.endswith('Term') and column != 'EnglishTerm') or column in RESULT_METADATA_KEYS:
+            # The first result with the key gives the main term or the first value, even if its value is None
+            data[f"_{column}Present"] = pl.Series([column in item for item in metadataCleaned], dtype=pl.Boolean)
+    # Source of the paragraphs, "Unknown" for a missing key and "None" for a None value
+    data['_source'] = pl.Series([f" (Source: {item.get('docSymbol', 'Unknown')} on {item.get('publicationDate', 'Unknown')})"
+                                 for item in metadataCleaned], dtype=pl.Utf8)
+    empty_list = pl.lit([], dtype=pl.List(pl.Utf8))
+    return (pl.DataFrame(data)
+              .with_columns([pl.when(pl.col(f"_{column}Length") == 0).then(empty_list)
+                               .otherwise(pl.col(column).str.split(separator)).alias(column)
+                             for column in list_columns]))
+
+
 def consolidate_results(metadataCleaned, exportExcel=False) -> list:
     """
     Consolidate results by EnglishTerm and format the output according to specified requirements.
-    
+
+    The results are grouped with Polars expressions on a lazy frame:
+    - The term of the first result with a term key in a language is the main term, the terms of the
+      next results and the synonyms are unique synonyms in result order
+    - The paragraphs of each language are joined with their source document and date
+    - The metadata value of the first result with the key is kept, and from the first result with
+      another value on, the values of the next results are added on new lines
+
     Args:
-        metadataCleaned: List of dictionaries containing the metadata
-        
+        metadataCleaned: List of dictionaries containing the metadata, or a DataFrame of results
+                         (e.g. from ResultSink.to_dataframe, where a null term counts as no term key)
+        exportExcel: Whether to export the consolidated results to an Excel file named after the first term
+
     Returns:
-        List of dictionaries with consolidated data that can be easily converted as a DataFrame
+        List of dictionaries with consolidated data that can be easily converted as a DataFrame.
+        All the dictionaries have the same keys, with None for the values not found for a term.
     """
-    if not metadataCleaned:
+    if metadataCleaned is None or len(metadataCleaned) == 0:
         return []
-        
-    # Group by EnglishTerm
-    consolidated = {}
-    for item in metadataCleaned:
-        english_term = item.get('EnglishTerm', '')
-        if not english_term:
-            continue
-            
-        if english_term not in consolidated:
-            consolidated[english_term] = {}
-            
-        # Get source information for this specific item
-        doc_symbol = item.get('docSymbol', 'Unknown')
-        pub_date = item.get('publicationDate', 'Unknown')
-        
-        for key, value in item.items():
-            # Skip docURLs
-            if key == 'docURLs':
-                continue
-                
-            # Process Term keys
-            if key.endswith('Term') and key != 'EnglishTerm':  # Skip EnglishTerm as that's our grouping key
-                lang = key.replace('Term', '')  # Extract language prefix (e.g., "Spanish" from "SpanishTerm")
-                synonyms_key = f"{lang}Synonyms"  # Create corresponding synonyms key
-                
-                if key not in consolidated[english_term]:
-                    # First occurrence - set as the primary term
-                    consolidated[english_term][key] = value
-                else:
-                    # This is a subsequent term value - add it to synonyms
-                    if value:  # Just check if value exists, don't compare with primary term
-                        # Initialize synonyms list if needed
-                        if synonyms_key not in consolidated[english_term]:
-                            consolidated[english_term][synonyms_key] = []
-                        
-                        # Add to synonyms list (as a singleton list or directly)
-                        if isinstance(value, list):
-                            if synonyms_key in consolidated[english_term]:
-                                consolidated[english_term][synonyms_key].extend(value)
-                            else:
-                                consolidated[english_term][synonyms_key] = value
-                        else:
-                            if synonyms_key in consolidated[english_term]:
-                                consolidated[english_term][synonyms_key].append(value)
-                            else:
-                                consolidated[english_term][synonyms_key] = [value]
-                        
-                        # Remove duplicates
-                        consolidated[english_term][synonyms_key] = list(set(consolidated[english_term][synonyms_key]))
-            
-            
-            # Process Synonyms keys
-            elif key.endswith('Synonyms'):
-                if value is None:
-                    continue
-                if key not in consolidated[english_term]:
-                    consolidated[english_term][key] = value if isinstance(value, list) else [value]
-                else:
-                    if isinstance(value, list):
-                        consolidated[english_term][key].extend(value)
-                    else:
-                        consolidated[english_term][key].append(value)
-                    # Remove duplicates
-                    consolidated[english_term][key] = list(set(consolidated[english_term][key]))
-                    
-            # Process Paragraphs keys
-            elif key.endswith('Paragraphs'):
-                if value is None:
-                    continue
-                    
-                # Format paragraphs with source information
-                formatted_paragraphs = []
-                if isinstance(value, list):
-                    for paragraph in value:
-                        if isinstance(paragraph, str):
-                            formatted_paragraphs.append(f"{paragraph} (Source: {doc_symbol} on {pub_date})")
-                        elif isinstance(paragraph, tuple) and len(paragraph) >= 1:
-                            formatted_paragraphs.append(f"{paragraph[0]} (Source: {doc_symbol} on {pub_date})")
-                
-                # Join paragraphs with double newlines
-                formatted_text = "\n\n".join(formatted_paragraphs) if formatted_paragraphs else ""
-                
-                if key not in consolidated[english_term]:
-                    consolidated[english_term][key] = formatted_text
-                elif formatted_text:  # Only add if there's actual text
-                    consolidated[english_term][key] += "\n\n" + formatted_text
-                    
-            # Other metadata keys
-            elif key in ['docSymbol', 'publicationDate', 'docType', 'docTitle']:
-                if key not in consolidated[english_term]:
-                    consolidated[english_term][key] = value
-                elif value and value != consolidated[english_term][key]:
-                    if isinstance(consolidated[english_term][key], str):
-                        consolidated[english_term][key] += "\n" + str(value)
-                    else:
-                        consolidated[english_term][key] = str(consolidated[english_term][key]) + "\n" + str(value)
-    
-    # Convert to list and sort keys in the desired order
-    result = []
-    for term, data in consolidated.items():
-        # Create a new dictionary with ordered keys
-        ordered_data = {}
-        
-        # 1. EnglishTerm
-        ordered_data['EnglishTerm'] = term
-        
-        # 2. Other Term keys
-        term_keys = sorted([k for k in data.keys() if k.endswith('Term') and k != 'EnglishTerm'])
-        for key in term_keys:
-            ordered_data[key] = data[key]
-            
-        # 3. Synonyms keys
-        synonym_keys = sorted([k for k in data.keys() if k.endswith('Synonyms')])
-        for key in synonym_keys:
-            ordered_data[key] = data[key]
-            
-        # 4. EnglishParagraphs
-        if 'EnglishParagraphs' in data:
-            ordered_data['EnglishParagraphs'] = data['EnglishParagraphs']
-            
-        # 5. Other Paragraph keys
-        para_keys = sorted([k for k in data.keys() if k.endswith('Paragraphs') and k != 'EnglishParagraphs'])
-        for key in para_keys:
-            ordered_data[key] = data[key]
-            
-        # 6. Metadata keys
-        meta_keys = ['docSymbol', 'publicationDate', 'docType', 'docTitle']
-        for key in meta_keys:
-            if key in data:
-                ordered_data[key] = data[key]
-        
-        result.append(ordered_data)
-    
+
+    import polars as pl
+    df = metadataCleaned if isinstance(metadataCleaned, pl.DataFrame) else _results_frame(metadataCleaned)
+    if 'EnglishTerm' not in df.columns:
+        return []
+    if 'docURLs' in df.columns:
+        df = df.drop('docURLs')
+
+    # Columns of the output, in order
+    term_keys = sorted(c for c in df.columns if c.endswith('Term') and c != 'EnglishTerm' and not c.startswith('_'))
+    synonym_keys = sorted(set(c for c in df.columns if c.endswith('Synonyms')) |
+                          {key[:-len('Term')] + 'Synonyms' for key in term_keys})
+    para_keys = (['EnglishParagraphs'] if 'EnglishParagraphs' in df.columns else []) + \
+                sorted(c for c in df.columns if c.endswith('Paragraphs') and c != 'EnglishParagraphs')
+    meta_keys = [key for key in RESULT_METADATA_KEYS if key in df.columns]
+
+    empty_list = pl.lit([], dtype=pl.List(pl.Utf8))
+    lf = df.lazy().filter(pl.col('EnglishTerm').is_not_null() & (pl.col('EnglishTerm') != ""))
+
+    # Source of the paragraphs of each result, a null value of a DataFrame is rendered as None
+    if '_source' in df.columns:
+        source = pl.col('_source')
+    else:
+        source = pl.format(" (Source: {} on {})",
+                           pl.col('docSymbol').fill_null('None') if 'docSymbol' in df.columns else pl.lit('Unknown'),
+                           pl.col('publicationDate').fill_null('None') if 'publicationDate' in df.columns else pl.lit('Unknown'))
+
+    row_columns = []
+    for key in term_keys:
+        # Whether each result gives the main term of its group
+        present = pl.col(f"_{key}Present") if f"_{key}Present" in df.columns else pl.col(key).is_not_null()
+        row_columns.append((present & (present.cum_sum().over('EnglishTerm') == 1)).alias(f"_{key}Main"))
+    for key in para_keys:
+        # "p1 (Source: ...)\n\np2 (Source: ...)" for the paragraphs of each result, "" for an empty list
+        row_columns.append(pl.when(pl.col(key).list.len() > 0)
+                           .then(pl.col(key).list.join(pl.concat_str([source, pl.lit("\n\n")])) + source)
+                           .when(pl.col(key).is_not_null())
+                           .then(pl.lit(""))
+                           .alias(key))
+    for key in synonym_keys:
+        synonyms = pl.col(key).fill_null(empty_list) if key in df.columns else empty_list
+        found = pl.col(key).is_not_null() if key in df.columns else pl.lit(False)
+        term_key = key[:-len('Synonyms')] + 'Term'
+        if term_key in term_keys:
+            # Terms found after the main term of the group are synonyms too
+            extra_term = pl.when(~pl.col(f"_{term_key}Main") & (pl.col(term_key) != "")).then(pl.col(term_key))
+            synonyms = pl.when(extra_term.is_not_null()).then(pl.concat_list([extra_term, synonyms])).otherwise(synonyms)
+            found = found | extra_term.is_not_null()
+        # A term has a synonyms list, even empty, if one of its results gives one
+        row_columns += [synonyms.alias(key), found.alias(f"_{key}Found")]
+    lf = lf.with_columns(row_columns[:len(term_keys)]).with_columns(row_columns[len(term_keys):])
+
+    aggregations = [pl.col(key).filter(pl.col(f"_{key}Main")).first().alias(key) for key in term_keys]
+    for key in synonym_keys:
+        aggregations += [pl.col(key).list.explode().drop_nulls().unique(maintain_order=True).alias(key),
+                         pl.col(f"_{key}Found").any().alias(f"_{key}Found")]
+    for key in para_keys:
+        # The paragraphs of the first result with paragraphs (even none), then the paragraphs of the next results
+        present = pl.col(key).is_not_null()
+        first = pl.col(key).filter(present).first()
+        others = pl.col(key).filter(present & (present.cum_sum() > 1) & (pl.col(key) != ""))
+        aggregations.append(pl.when(others.len() > 0)
+                            .then(pl.concat_str([first, pl.lit("\n\n"), others.str.join("\n\n")]))
+                            .otherwise(first)
+                            .alias(key))
+    for key in meta_keys:
+        # The value of the first result with the key, then, from the first different value on, the values of the next results
+        present = pl.col(f"_{key}Present") if f"_{key}Present" in df.columns else pl.col(key).is_not_null()
+        first = pl.col(key).filter(present).first()
+        found = present & pl.col(key).is_not_null() & (pl.col(key) != "")
+        added = found & (pl.col(key) != first).fill_null(True)
+        others = pl.col(key).filter(found & (added.cum_sum() > 0))
+        aggregations.append(pl.when(others.len() > 0)
+                            .then(pl.concat_str([first.fill_null("None"), pl.lit("\n"), others.str.join("\n")]))
+                            .otherwise(first)
+                            .alias(key))
+
+    consolidated = (lf.group_by('EnglishTerm', maintain_order=True)
+                      .agg(aggregations)
+                      .with_columns([pl.when(pl.col(f"_{key}Found")).then(pl.col(key)).alias(key) for key in synonym_keys])
+                      .select(['EnglishTerm'] + term_keys + synonym_keys + para_keys + meta_keys)
+                      .collect())
+    result = consolidated.to_dicts()
+
     # Export to Excel if requested in a try-except block
     if exportExcel and result:
         try:
-            df = pl.DataFrame(result.copy())
-            
             # Use EnglishTerm for the filename
             english_term = result[0]['EnglishTerm']
             base_filename = re.sub(r'[\\/*?:"<>|]', '_', english_term)
             filename = f"{base_filename}.xlsx"
-            
+
             # Check if file exists and append number if needed
             counter = 1
             while os.path.exists(filename):
                 filename = f"{base_filename}_{counter}.xlsx"
                 counter += 1
-                
-            df.write_excel(filename)
+
+            consolidated.write_excel(filename)
             print(f"Exported consolidated results to '{filename}'")
         except Exception as e:
             print(f"Error exporting consolidated results: {str(e)}")
 
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,205 @@
+"""
+Headless Chrome pool for TermSeeker
+
+This module keeps warm headless Chrome instances for the terminology databases that need
+a browser (UNTERM fallback, FAOTERM), instead of starting and quitting Chrome for every lookup:
+- Each browser has its own profile directory, so several lookups can run in parallel
+- Browsers are checked out with a context manager and given back to the pool afterwards
+- Per-browser setup (e.g. the UNTERM display languages) runs once per browser, not per query
+- Browsers are health checked at checkout and recycled when they crashed
+"""
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Directory where the profile directories of the browsers are created
+PROFILE_BASE_DIR = "/tmp/chrome_user_data"
+
+# Default number of browsers of the shared pool
+DEFAULT_POOL_SIZE = 2
+
+# Global variable to store the shared pool
+driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+
+class WebDriverPool:
+    """
+    Pool of headless Chrome WebDrivers.
+
+    Args:
+        size (int): Maximum number of browsers, started when first needed
+        headless (bool): Whether to run Chrome without a window
+        profile_base_dir (str): Directory where each browser gets its own profile directory
+        checkout_timeout (float): Maximum number of seconds to wait for a free browser (None to wait forever)
+
+    Example:
+        pool = WebDriverPool(size=3)
+        with pool.driver("unterm", apply_unterm_settings) as driver:
+            driver.get(search_url)
+        pool.close()
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, headless=True, profile_base_dir=PROFILE_BASE_DIR, checkout_timeout=None):
+        self.size = size
+        self.headless = headless
+        self.profile_base_dir = profile_base_dir
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._profiles = {}
+        self._setups = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_driver(self):
+        """Start a browser with its own profile directory."""
+        from selenium import webdriver
+
+        os.makedirs(self.profile_base_dir, exist_ok=True)
+        profile_dir = tempfile.mkdtemp(prefix="profile-", dir=self.profile_base_dir)
+
+        # Set up Chrome options for Google Colab
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument(f'--user-data-dir={profile_dir}')
+
+        try:
+            driver = webdriver.Chrome(options=options)
+        except Exception:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+        self._profiles[id(driver)] = profile_dir
+        self._setups[id(driver)] = set()
+        return driver
+
+    def _discard(self, driver):
+        """Quit a browser and remove its profile directory."""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        profile_dir = self._profiles.pop(id(driver), None)
+        self._setups.pop(id(driver), None)
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        """Check that a browser still answers."""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        """Get an idle healthy browser, starting one if the pool is not full yet."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    start_new = self._created < self.size
+                    if start_new:
+                        self._created += 1
+                if start_new:
+                    try:
+                        return self._create_driver()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    driver = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    raise TimeoutError("No browser available in the WebDriver pool")
+
+            if self.is_healthy(driver):
+                return driver
+
+            # Recycle the crashed browser
+            print("\t\twebdriverpool.py -> recycling a browser that stopped responding")
+            self._discard(driver)
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def driver(self, setup_key=None, setup=None):
+        """
+        Check out a browser for the duration of a with block.
+
+        Args:
+            setup_key (str, optional): Name of the setup of the browser (e.g. "unterm")
+            setup (callable, optional): Function run once per browser with the driver as argument,
+                                        before its first checkout with this setup_key
+
+        Yields:
+            WebDriver: The browser
+        """
+        if self._closed:
+            raise RuntimeError("The WebDriver pool is closed")
+
+        driver = self._checkout()
+        healthy = True
+        try:
+            if setup is not None and setup_key not in self._setups[id(driver)]:
+                setup(driver)
+                self._setups[id(driver)].add(setup_key)
+            yield driver
+        except Exception:
+            # The browser may have crashed, it is checked before going back to the pool
+            healthy = self.is_healthy(driver)
+            raise
+        finally:
+            if healthy and not self._closed:
+                self._idle.put(driver)
+            else:
+                self._discard(driver)
+                with self._lock:
+                    self._created -= 1
+
+    def close(self):
+        """Quit all the idle browsers. Checked out browsers are quit when they are given back."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+            with self._lock:
+                self._created -= 1
+
+
+def get_driver_pool(size=None) -> WebDriverPool:
+    """
+    Get the WebDriver pool shared by the terminology lookups.
+    A size replaces the shared pool with a new one of that size.
+
+    Args:
+        size (int, optional): Number of browsers of the pool
+
+    Returns:
+        WebDriverPool: The shared pool
+    """
+    global driver_pool
+    with _driver_pool_lock:
+        if driver_pool is None or (size is not None and size != driver_pool.size):
+            if driver_pool is not None:
+                driver_pool.close()
+            driver_pool = WebDriverPool(size=size or DEFAULT_POOL_SIZE)
+        return driver_pool
@@ -0,0 +1,65 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import termseeker.askTermBases as askTermBases
+from termseeker.askTermBases import consolidate_UNTermResults
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "unterm")
+FIXTURES = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith(".json"))
+
+
+def load_unterm_fixture(name) -> dict:
+    """UNTERM rows of a query (as returned by queryUNTerm) with their consolidation by consolidate_UNTermResults."""
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+def test_consolidate_UNTermResults_matches_fixture(name):
+    fixture = load_unterm_fixture(name)
+    assert consolidate_UNTermResults(fixture["rows"], fixture["query"]) == fixture["consolidated"]
+
+
+class FakeElement:
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        pass
+
+
+class NoResultsDriver:
+    """Browser showing the UNTERM page of a search without results."""
+
+    def get(self, url):
+        pass
+
+    def find_element(self, by, value):
+        return FakeElement()
+
+    def find_elements(self, by, value):
+        if value == askTermBases.UNTERM_NO_RESULTS_XPATH or value.startswith("//button[starts-with"):
+            return [FakeElement()]
+        return []
+
+
+class FakePool:
+
+    @contextmanager
+    def driver(self, setup_key=None, setup=None):
+        yield NoResultsDriver()
+
+
+def test_selenium_search_without_results_returns_at_once():
+    pytest.importorskip("selenium")
+    start = time.monotonic()
+    assert askTermBases.queryUNTerm_selenium("glossolalia", pool=FakePool()) == []
+    assert time.monotonic() - start < askTermBases.get_adaptive_timeout("unterm/table").value / 2
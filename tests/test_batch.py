@@ -0,0 +1,66 @@
+import termseeker.batch as batch
+from termseeker.utils import get_un_document_urls
+
+
+class FakePrefetcher:
+    """Prefetcher keeping the scheduled documents like DocumentPrefetcher._futures."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.scheduled = {}
+        self.prefetched = []
+
+    def prefetch(self, url, file_name=None):
+        self.prefetched.append(url)
+        self.scheduled[(url, file_name)] = self.documents[url]
+
+    def get(self, url, file_name=None):
+        self.scheduled.pop((url, file_name), None)
+        return self.documents[url]
+
+    def discard(self, url, file_name=None):
+        self.scheduled.pop((url, file_name), None)
+
+
+def _shared_documents(monkeypatch):
+    monkeypatch.setattr(batch, "encode_paragraphs", lambda paragraphs, *args: None)
+    monkeypatch.setattr(batch, "align_paragraphs_anchored",
+                        lambda paragraphs, target_doc, **kwargs: [[(0, 1.0)] for _ in paragraphs])
+    monkeypatch.setattr(batch, "index_target_document", lambda *args: None)
+    documents = {}
+    for docSymbol in ("A/1", "B/1"):
+        urls = get_un_document_urls(docSymbol)
+        documents[urls["English"]] = f"1. The ozone layer and climate change in {docSymbol}."
+        documents[urls["French"]] = f"1. La couche d'ozone et le changement climatique dans {docSymbol}."
+    prefetcher = FakePrefetcher(documents)
+    return prefetcher, batch.SharedDocuments(prefetcher, {"A/1": ["ozone", "climate"], "B/1": ["ozone"]})
+
+
+def test_prefetch_skips_resolved_versions(monkeypatch):
+    prefetcher, shared = _shared_documents(monkeypatch)
+    items = [{"docSymbol": "A/1"}, {"docSymbol": "B/1"}]
+
+    shared.prefetch(items, ["English", "French"])
+    assert len(prefetcher.prefetched) == 4
+
+    paragraphs = shared.english_paragraphs("A/1", "ozone")
+    shared.alignments("A/1", "French", paragraphs)
+    prefetcher.prefetched.clear()
+    shared.prefetch(items, ["English", "French"])
+    assert all("B/1" in url for url in prefetcher.prefetched) and len(prefetcher.prefetched) == 2
+
+
+def test_release_term_drops_documents_no_term_needs(monkeypatch):
+    prefetcher, shared = _shared_documents(monkeypatch)
+    shared.prefetch([{"docSymbol": "A/1"}, {"docSymbol": "B/1"}], ["French"])
+    for docSymbol in ("A/1", "B/1"):
+        shared.alignments(docSymbol, "French", shared.english_paragraphs(docSymbol, "ozone"))
+
+    shared.release_term("ozone", ["A/1", "B/1"])
+    # A/1 is still needed by "climate"
+    assert "A/1" in shared._english_paragraphs and ("A/1", "French") in shared._alignments
+    assert "B/1" not in shared._english_paragraphs and ("B/1", "French") not in shared._alignments
+
+    shared.release_term("climate", ["A/1"])
+    assert not shared._english_paragraphs and not shared._alignments and not shared._target_docs
+    assert not prefetcher.scheduled
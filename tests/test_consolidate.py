@@ -0,0 +1,33 @@
+from termseeker.utils import consolidate_results
+
+
+def test_paragraph_sources_render_missing_and_none_as_before():
+    results = [{"EnglishTerm": "ozone", "EnglishParagraphs": ["a"], "docSymbol": None, "publicationDate": "2020"},
+               {"EnglishTerm": "ozone", "EnglishParagraphs": [("b", 0.9)]}]
+    [consolidated] = consolidate_results(results)
+    assert consolidated["EnglishParagraphs"] == "a (Source: None on 2020)\n\nb (Source: Unknown on Unknown)"
+
+
+def test_main_term_and_synonyms():
+    results = [{"EnglishTerm": "ozone", "FrenchTerm": "ozone", "FrenchSynonyms": ["O3"]},
+               {"EnglishTerm": "ozone", "FrenchTerm": "trioxygène", "FrenchSynonyms": ["O3"]}]
+    [consolidated] = consolidate_results(results)
+    assert consolidated["FrenchTerm"] == "ozone"
+    assert consolidated["FrenchSynonyms"] == ["O3", "trioxygène"]
+
+
+def test_metadata_from_first_result_with_the_key_without_duplicates():
+    results = [{"EnglishTerm": "ozone", "publicationDate": "2021"},
+               {"EnglishTerm": "ozone", "docSymbol": "A/RES/1"},
+               {"EnglishTerm": "ozone", "docSymbol": "A/RES/1", "publicationDate": "2022"}]
+    [consolidated] = consolidate_results(results)
+    assert consolidated["docSymbol"] == "A/RES/1"
+    assert consolidated["publicationDate"] == "2021\n2022"
+
+
+def test_empty_values_are_kept():
+    results = [{"EnglishTerm": "ozone", "FrenchTerm": "", "FrenchSynonyms": [], "docType": ""}]
+    [consolidated] = consolidate_results(results)
+    assert consolidated["FrenchTerm"] == ""
+    assert consolidated["FrenchSynonyms"] == []
+    assert consolidated["docType"] == ""
@@ -0,0 +1,47 @@
+import json
+import os
+
+import numpy as np
+
+import termseeker.embeddingcache as embeddingcache
+from termseeker.embeddingcache import get_embedding_paths, load_document_embeddings, save_document_embeddings
+
+MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def test_concurrent_saves_keep_each_index_with_its_matrix(monkeypatch, tmp_path):
+    atomic_save = embeddingcache._atomic_save
+    interleaved = []
+
+    def save_between_matrix_and_index(path, write):
+        atomic_save(path, write)
+        # Another writer saves the whole document after the matrix of the first one is written
+        if path.endswith(".npy") and not interleaved:
+            interleaved.append(path)
+            save_document_embeddings(str(tmp_path), "A_French", MODEL, ["b0", "b1"], np.full((2, 4), 2.0))
+    monkeypatch.setattr(embeddingcache, "_atomic_save", save_between_matrix_and_index)
+
+    save_document_embeddings(str(tmp_path), "A_French", MODEL, ["a0", "a1"], np.full((2, 4), 1.0))
+
+    index, matrix = load_document_embeddings(str(tmp_path), "A_French", MODEL)
+    assert index == {"a0": 0, "a1": 1}
+    assert np.all(matrix == 1.0)
+
+
+def test_replaced_matrix_is_removed(tmp_path):
+    for value in (1.0, 2.0):
+        save_document_embeddings(str(tmp_path), "A_French", MODEL, ["a0"], np.full((1, 4), value))
+
+    assert len(list((tmp_path / "embeddings").rglob("*.npy"))) == 1
+    assert np.all(load_document_embeddings(str(tmp_path), "A_French", MODEL)[1] == 2.0)
+
+
+def test_cache_without_generation_is_loaded(tmp_path):
+    matrix_path, index_path = get_embedding_paths(str(tmp_path), "A_French", MODEL)
+    os.makedirs(os.path.dirname(matrix_path))
+    np.save(matrix_path, np.ones((1, 4), dtype=np.float32))
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"model": MODEL, "doc": "A_French", "hashes": ["a0"]}, f)
+
+    index, matrix = load_document_embeddings(str(tmp_path), "A_French", MODEL)
+    assert index == {"a0": 0} and matrix.shape == (1, 4)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import termseeker.extraction as extraction
+
+pytest.importorskip("openai")
+
+ENGLISH = ["The ozone layer must be protected."]
+FRENCH = ["La couche d'ozone doit être protégée."]
+SPANISH = ["La capa de ozono debe protegerse."]
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Minimal OpenAI-compatible chat completions server, recording the prompts and the requests in flight."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(("127.0.0.1", 0), StubLLMHandler)
+        self.delay = delay
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        with server.lock:
+            server.prompts.append(prompt)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if "<source>failure</source>" in prompt:
+                self._send(400, {"error": {"message": "model not loaded", "type": "invalid_request_error"}})
+            elif "Answer only with a JSON object" in prompt:
+                # Multilingual answer missing Spanish
+                self._send(200, self._completion(json.dumps({"French": ["couche d'ozone"]}, ensure_ascii=False)))
+            else:
+                self._send(200, self._completion("<equivalent>capa de ozono</equivalent>"))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _completion(self, content) -> dict:
+        return {"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]}
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(delay=0.0):
+        server = StubLLMServer(delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_multilingual_prompt_with_per_language_fallback(stub_server):
+    server = stub_server()
+    with extraction.ExtractionQueue(localLM=True, lmstudioURL=server.url) as queue:
+        result = queue.submit_languages("ozone", ENGLISH, {"French": FRENCH, "Spanish": SPANISH}).result()
+        stats = queue.get_stats()
+
+    assert result == {"French": ["couche d'ozone"], "Spanish": ["capa de ozono"]}
+    assert len(server.prompts) == 2 and "Answer only with a JSON object" in server.prompts[0]
+    assert stats["requests"] == 2 and stats["multilingual_requests"] == 1
+    assert stats["multilingual_failures"] == 1 and stats["fallback_requests"] == 1
+
+
+def test_requests_stay_within_backend_concurrency(stub_server):
+    server = stub_server(delay=0.2)
+    with extraction.ExtractionQueue(localLM=True, lmstudioURL=server.url,
+                                    backend_limits={"lmstudio": {"concurrency": 2}}) as queue:
+        futures = [queue.submit(f"ozone {i}", ENGLISH, SPANISH, "Spanish") for i in range(6)]
+        assert [future.result() for future in futures] == [["capa de ozono"]] * 6
+
+    assert len(server.prompts) == 6
+    assert server.max_in_flight == 2
+
+
+def test_server_error_falls_back_to_ddgs(monkeypatch, stub_server):
+    server = stub_server()
+    ddgs_prompts = []
+
+    async def ask_ddgs(self, prompt):
+        ddgs_prompts.append(prompt)
+        return "<equivalent>défaillance</equivalent>"
+    monkeypatch.setattr(extraction.ExtractionQueue, "_ask_ddgs", ask_ddgs)
+
+    with extraction.ExtractionQueue(localLM=True, lmstudioURL=server.url) as queue:
+        assert queue.submit("failure", ENGLISH, FRENCH, "French").result() == ["défaillance"]
+
+    assert len(server.prompts) == 1 and ddgs_prompts == server.prompts
+
+
+def test_cancelled_close_leaves_no_pending_task(monkeypatch):
+    started = threading.Event()
+
+    async def ask(self, key_parts, prompt, *args):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Cleanup taking more than one iteration of the event loop
+            await asyncio.sleep(0.05)
+            raise
+    monkeypatch.setattr(extraction.ExtractionQueue, "_ask", ask)
+
+    queue = extraction.ExtractionQueue(localLM=True)
+    futures = [queue.submit(f"ozone {i}", ENGLISH, SPANISH, "Spanish") for i in range(3)]
+    started.wait()
+    queue.close(cancel=True)
+
+    assert all(future.cancelled() for future in futures)
+    assert not asyncio.all_tasks(queue._loop)
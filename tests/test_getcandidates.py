@@ -0,0 +1,112 @@
+import pytest
+
+import termseeker.getcandidates as getcandidates
+
+
+class FakePrefetcher:
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+        FakePrefetcher.instances.append(self)
+
+    def prefetch(self, url, file_name=None):
+        pass
+
+    def get(self, url, file_name=None):
+        return "1. The ozone layer must be protected."
+
+    def close(self):
+        self.closed = True
+
+
+class FakeExtractionQueue:
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.cancelled = None
+        FakeExtractionQueue.instances.append(self)
+
+    def close(self, cancel=False):
+        self.cancelled = cancel
+
+
+def test_interrupted_run_releases_prefetcher_extraction_and_sink(monkeypatch, tmp_path):
+    monkeypatch.setattr(getcandidates, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(getcandidates, "DocumentPrefetcher", FakePrefetcher)
+    monkeypatch.setattr(getcandidates, "ExtractionQueue", FakeExtractionQueue)
+    monkeypatch.setattr(getcandidates, "get_llm_cache", lambda *args, **kwargs: None)
+    monkeypatch.setattr(getcandidates, "report_extraction_stats", lambda extraction: None)
+    monkeypatch.setattr(getcandidates, "search_library_metadata",
+                        lambda *args: [{"docSymbol": "UNEP/EA.1", "publicationDate": "2020"}])
+
+    def interrupt(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(getcandidates, "find_paragraphs_with_merge", interrupt)
+
+    closed_sinks = []
+    original_close = getcandidates.ResultSink.close
+    monkeypatch.setattr(getcandidates.ResultSink, "close", lambda sink: (closed_sinks.append(sink), original_close(sink)))
+
+    with pytest.raises(KeyboardInterrupt):
+        getcandidates.getCandidates("ozone", ["French"], [], 1, 1, True, output_path=str(tmp_path / "results.jsonl"))
+
+    assert FakePrefetcher.instances[-1].closed
+    assert FakeExtractionQueue.instances[-1].cancelled is True
+    assert closed_sinks and closed_sinks[0]._file.closed
+
+
+class RecordingPrefetcher(FakePrefetcher):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.urls = []
+
+    def get(self, url, file_name=None):
+        self.urls.append(url)
+        return super().get(url, file_name)
+
+
+def _library_page(page, count, start=0):
+    return [{"docSymbol": f"A/{page}/{start + i}", "docType": "Reports", "docTitle": "Report", "isMultiple": True,
+             "publicationDate": "2020"} for i in range(count)]
+
+
+def _visited_documents(monkeypatch, tmp_path, pages, maxSearchPages=3):
+    monkeypatch.setattr(getcandidates, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(getcandidates, "DocumentPrefetcher", RecordingPrefetcher)
+    monkeypatch.setattr(getcandidates, "search_un_library", lambda term, symbols, page=1: pages.get(page))
+    # No English paragraph is found, so every document is visited
+    monkeypatch.setattr(getcandidates, "find_paragraphs_with_merge", lambda *args, **kwargs: [])
+
+    getcandidates.getCandidates("ozone", ["French"], [], 2, 1, False, localLM=None, maxSearchPages=maxSearchPages)
+    prefetcher = RecordingPrefetcher.instances[-1]
+    return [url.split("DS=")[1].split("&")[0] for url in prefetcher.urls]
+
+
+def test_every_document_of_a_page_is_visited_before_the_next_page(monkeypatch, tmp_path):
+    pages = {1: _library_page(1, 50), 2: _library_page(2, 50)}
+    assert _visited_documents(monkeypatch, tmp_path, pages) == [item["docSymbol"] for item in pages[1] + pages[2]]
+
+
+def test_next_page_is_fetched_when_the_first_one_has_no_usable_document(monkeypatch, tmp_path):
+    unusable = [dict(item, isMultiple=False) for item in _library_page(1, 50)]
+    pages = {1: unusable, 2: _library_page(2, 5)}
+    assert _visited_documents(monkeypatch, tmp_path, pages) == [item["docSymbol"] for item in pages[2]]
+
+
+@pytest.mark.parametrize("kwargs, expected", [({}, "cache"), ({"store": "given"}, "given"),
+                                              ({"useTermStore": False, "store": "given"}, None)])
+def test_term_store_of_unterm_lookup(monkeypatch, kwargs, expected):
+    lookups = []
+
+    def query(term, store=None, offline=None):
+        lookups.append((store, offline))
+        return []
+    monkeypatch.setattr(getcandidates, "queryUNTerm", query)
+    monkeypatch.setattr(getcandidates, "get_term_store", lambda cache_dir: "cache")
+    monkeypatch.setattr(getcandidates, "consolidate_UNTermResults", lambda results, term: {"EnglishTerm": term})
+    monkeypatch.setattr(getcandidates, "report_missing_translations", lambda consolidated: {})
+
+    assert getcandidates.getTermsAndCandidates("ozone", offline=True, **kwargs) == {"EnglishTerm": "ozone"}
+    assert lookups == [(expected, True)]
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "sklearn", "polars", "selenium", "groq", "duckduckgo_search"]
+
+# Seconds for importing termseeker, its command line and candidate search and the UNTERM consolidation, far above the ~0.2 s measured
+# (mostly requests and bs4) and far below the >2 s of eager imports
+IMPORT_BUDGET = 1.5
+
+SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import termseeker
+import termseeker.__main__
+import termseeker.getcandidates
+from termseeker import consolidate_UNTermResults
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "heavy": [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+"""
+
+
+def test_import_loads_no_heavy_dependency():
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", SCRIPT], capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    assert result["heavy"] == []
+
+    # Lines of -X importtime: "import time: self [us] | cumulative | imported package"
+    slowest = sorted((line for line in process.stderr.splitlines() if line.startswith("import time:")
+                      and not line.endswith("imported package")), key=lambda line: -int(line.split("|")[1]))[:10]
+    assert result["elapsed"] < IMPORT_BUDGET, "\n".join(slowest)
@@ -0,0 +1,57 @@
+import sys
+import types
+
+import termseeker.extraction as extraction
+import termseeker.utils as utils
+from termseeker.llmcache import get_llm_cache, make_cache_key
+from termseeker.utils import DDGS_MODEL, LMSTUDIO_URL, PROMPT_VERSION
+
+KEY_PARTS = ("ozone", "English", ["The ozone layer."], "French", ["La couche d'ozone."])
+ANSWER = "<SOURCETERM>ozone</SOURCETERM> = <EQUIVALENTTERM>ozone</EQUIVALENTTERM>"
+
+
+def test_bypass_is_per_call(tmp_path):
+    cache = get_llm_cache(str(tmp_path))
+    key = make_cache_key("ddgs", DDGS_MODEL, PROMPT_VERSION, *KEY_PARTS)
+    cache.put(key, ANSWER, bypass=True)
+    assert cache.get(key) is None
+
+    cache.put(key, ANSWER)
+    assert cache.get(key, bypass=True) is None
+    # Other callers of the shared cache still use it
+    assert get_llm_cache(str(tmp_path)).get(key) == ANSWER
+
+
+class FakeDDGS:
+    def chat(self, prompt, model=None):
+        return ANSWER
+
+
+def _fail(*args):
+    raise ConnectionError("LM Studio is not running")
+
+
+def test_fallback_answer_is_cached_under_ddgs(monkeypatch, tmp_path):
+    cache = get_llm_cache(str(tmp_path))
+    monkeypatch.setattr(extraction, "lmstudioLocalAPI", _fail)
+
+    async def ask_ddgs(self, prompt):
+        return ANSWER
+    monkeypatch.setattr(extraction.ExtractionQueue, "_ask_ddgs", ask_ddgs)
+
+    with extraction.ExtractionQueue(localLM=True, cache=cache) as queue:
+        queue.submit("ozone", ["The ozone layer."], ["La couche d'ozone."], "French").result()
+
+    assert cache.get(make_cache_key("lmstudio", LMSTUDIO_URL, PROMPT_VERSION, *KEY_PARTS)) is None
+    assert cache.get(make_cache_key("ddgs", DDGS_MODEL, PROMPT_VERSION, *KEY_PARTS)) == ANSWER
+
+
+def test_askLLM_fallback_answer_is_cached_under_ddgs(monkeypatch, tmp_path):
+    cache = get_llm_cache(str(tmp_path))
+    monkeypatch.setattr(utils, "lmstudioLocalAPI", _fail)
+    monkeypatch.setitem(sys.modules, "duckduckgo_search", types.SimpleNamespace(DDGS=FakeDDGS))
+
+    assert utils.askLLM_term_equivalents("ozone", ["The ozone layer."], ["La couche d'ozone."], "English", "French",
+                                         customInference=True, llmCache=cache) == ANSWER
+    assert cache.get(make_cache_key("lmstudio", LMSTUDIO_URL, PROMPT_VERSION, *KEY_PARTS)) is None
+    assert cache.get(make_cache_key("ddgs", DDGS_MODEL, PROMPT_VERSION, *KEY_PARTS)) == ANSWER
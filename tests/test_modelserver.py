@@ -0,0 +1,35 @@
+import os
+import socket
+
+import pytest
+
+import termseeker.getcandidates as getcandidates
+import termseeker.modelserver as modelserver
+
+
+@pytest.fixture
+def socket_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(modelserver, "serving", False)
+    monkeypatch.setattr(getcandidates, "get_language_detector", lambda: None)
+    return str(tmp_path / "models.sock")
+
+
+def test_running_server_socket_is_kept(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as running:
+        running.bind(socket_path)
+        running.listen()
+        with pytest.raises(modelserver.ModelServerError, match="already running"):
+            modelserver.ModelServer(socket_path)
+        assert os.path.exists(socket_path)
+
+
+def test_stale_socket_is_replaced(socket_path):
+    # Socket file left by a server that was killed
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(socket_path)
+
+    with modelserver.ModelServer(socket_path) as server:
+        assert server.socket_path == socket_path
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,44 @@
+import numpy as np
+
+from termseeker.paragraphindex import ParagraphIndex
+
+
+def _embeddings(rows, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+
+
+def test_reopen_and_append_keeps_texts_aligned(tmp_path):
+    index_dir = str(tmp_path / "French")
+    first = _embeddings(2, seed=1)
+    second = _embeddings(2, seed=2)
+
+    index = ParagraphIndex(index_dir)
+    index.add_document("A_French", ["a0", "a1"], first, "A/1")
+
+    # A new instance truncates incomplete rows on open, the end offset of the last row must survive
+    index = ParagraphIndex(index_dir)
+    index.add_document("B_French", ["b0", "b1"], second, "B/1")
+
+    index = ParagraphIndex(index_dir)
+    assert len(index) == 4
+    for text, vector in zip(["a0", "a1", "b0", "b1"], np.vstack([first, second])):
+        match = index.search_vectors(vector[None], top_k=1)[0][0]
+        assert match["text"] == text
+    assert [match["text"] for match in index.search_vectors(second[1][None], top_k=4, documents=["B/"])[0]] == ["b1", "b0"]
+
+
+def test_reopen_drops_rows_written_after_meta(tmp_path):
+    index_dir = str(tmp_path / "French")
+    index = ParagraphIndex(index_dir)
+    index.add_document("A_French", ["a0"], _embeddings(1), "A/1")
+
+    # Rows appended without their meta.json update, as after a crash
+    with open(index._path("vectors.f32"), "ab") as f:
+        f.write(b"\0" * 32)
+    with open(index._path("texts.jsonl"), "ab") as f:
+        f.write(b'"partial')
+
+    index = ParagraphIndex(index_dir)
+    index.add_document("B_French", ["b0"], _embeddings(1, seed=3), "B/1")
+    assert [match["text"] for match in index.search_vectors(_embeddings(1, seed=3), top_k=2)[0]][0] == "b0"
+    assert sorted(match["text"] for match in index.search_vectors(_embeddings(1), top_k=2)[0]) == ["a0", "b0"]
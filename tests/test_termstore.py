@@ -0,0 +1,41 @@
+import os
+
+import termseeker.askTermBases as askTermBases
+from termseeker.termstore import TermStore, get_term_store
+
+UNTERM_ROW = {"English": {"preferred": ["climate change"], "admitted": []}, "French": {"preferred": ["changements climatiques"]}}
+
+
+def test_lookup_without_store_has_no_side_effects(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(askTermBases, "queryUNTerm_http", lambda term: [UNTERM_ROW])
+    assert askTermBases.queryUNTerm("climate change", backend="http") == [UNTERM_ROW]
+    assert not os.listdir(tmp_path)
+
+
+def test_offline_is_per_call(monkeypatch, tmp_path):
+    store = get_term_store(str(tmp_path))
+    fetched = []
+    monkeypatch.setattr(askTermBases, "queryUNTerm_http", lambda term: fetched.append(term) or [UNTERM_ROW])
+
+    assert askTermBases.queryUNTerm("ozone", backend="http", store=store, offline=True) == []
+    assert not fetched and not store.offline
+    # Another caller of the shared store still fetches
+    assert askTermBases.queryUNTerm("ozone", backend="http", store=get_term_store(str(tmp_path))) == [UNTERM_ROW]
+    assert fetched == ["ozone"]
+
+    # Offline lookups are answered from the index
+    assert askTermBases.queryUNTerm("climate", backend="http", store=store, offline=True) == [UNTERM_ROW]
+    assert fetched == ["ozone"]
+
+
+def test_partial_faoterm_results_are_never_fresh(tmp_path):
+    store = TermStore(str(tmp_path / "termstore.sqlite"))
+    store.put_faoterm("soil", [["soil", "1", False, "EN", "Soils", "Agrovoc"]], complete=False)
+    assert store.get_faoterm("soil") is None
+    assert store.get_faoterm("soil", offline=True) == [["soil", "1", False, "EN", "Soils", "Agrovoc"]]
+
+    store.put_faoterm_entry("1", {"entryID": "1"}, complete=False)
+    assert store.get_faoterm_entry("1") is None
+    store.put_faoterm_entry("1", {"entryID": "1"})
+    assert store.get_faoterm_entry("1") == {"entryID": "1"}